@@ -1,8 +1,302 @@
+import threading
+import time
+from collections import deque
+
 import serial
 
 
-ser = serial.Serial('/dev/ttyS3', 115200)
-print("串口已初始化并打开")
+DEFAULT_PORT = '/dev/ttyS3'
+DEFAULT_BAUDRATE = 115200
+
+# 串口对象，调用 open_serial() 后才会打开
+ser = None
+
+
+def open_serial(port=DEFAULT_PORT, baudrate=DEFAULT_BAUDRATE):
+    """打开串口；port 可指向仿真器创建的伪终端"""
+    global ser
+    ser = serial.Serial(port, baudrate)
+    print("串口已初始化并打开")
+    return ser
+
+
+class TxWorker:
+    """
+    异步发送线程
+    视觉循环只把数据包放进有界队列，由后台线程写串口。
+    每次只发送最新的数据包，被新包取代的旧包直接丢弃；
+    写串口超时（电控不读、发送缓冲区满）计为阻塞，不会卡住视觉循环。
+    超时时可能已经写出了半包：清空还没发出的字节，下一包前面补一个换行，
+    电控把残缺的那一行当作格式错误丢弃，下一包从新的一行开始，不会和半包拼在一起。
+    """
+
+    def __init__(self, port, maxlen=4):
+        self.port = port
+        self._pending = deque(maxlen=maxlen)
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        self.sent = 0
+        self.dropped = 0
+        self.blocked = 0
+        self._resync = False
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="uart-tx", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        """停止线程，停止前会把最新的一包发出去"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, data, stamp=None):
+        with self._cond:
+            if len(self._pending) == self._pending.maxlen:
+                # 队列已满，deque 会挤掉最旧的一包
+                self.dropped += 1
+            self._pending.append((data, stamp))
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and not self._pending:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                # 只发最新的一包，其余都已过时
+                data, stamp = self._pending.pop()
+                self.dropped += len(self._pending)
+                self._pending.clear()
+            if self._resync:
+                data = b"\n" + data
+            _expect_ack(stamp)
+            try:
+                self.port.write(data)
+                self.sent += 1
+                self._resync = False
+                _record_send(stamp)
+            except serial.SerialTimeoutException:
+                self.blocked += 1
+                self.port.reset_output_buffer()
+                self._resync = True
+
+    def stats(self):
+        return {"sent": self.sent, "dropped": self.dropped, "blocked": self.blocked}
+
+
+# 异步发送线程，调用 start_tx_thread() 后启用；未启用时同步写串口
+tx_worker = None
+
+
+def start_tx_thread(write_timeout=0.05):
+    """
+    启动异步发送线程
+    write_timeout: 单次写串口的超时时间(秒)，超时的数据包计为阻塞并丢弃
+    """
+    global tx_worker
+    if tx_worker is not None:
+        return tx_worker
+    ser.write_timeout = write_timeout
+    tx_worker = TxWorker(ser)
+    tx_worker.start()
+    print("串口异步发送线程已启动")
+    return tx_worker
+
+
+def stop_tx_thread():
+    """停止异步发送线程并打印发送统计"""
+    global tx_worker
+    if tx_worker is None:
+        return
+    tx_worker.stop()
+    stats = tx_worker.stats()
+    print(f"串口发送统计: 已发送={stats['sent']} 丢弃={stats['dropped']} 阻塞={stats['blocked']}")
+    tx_worker = None
+
+
+def get_tx_stats():
+    """返回异步发送统计，未启用异步发送时返回 None"""
+    return tx_worker.stats() if tx_worker else None
+
+
+# 延迟追踪器(latency.LatencyTracker)，调用 enable_latency_trace() 后启用
+latency_tracker = None
+
+# 电控应答格式: "ack:<序号>\n"，回传数据包中的 seq 字段
+ACK_PREFIX = b"ack:"
+ACK_MAX_LEN = 16
+
+# 批量数据包中候选目标的颜色代码
+BATCH_COLOR_CODES = {"red": "r", "blue": "b", "yellow": "y", "black": "k"}
+BATCH_COLOR_NAMES = {code: name for name, code in BATCH_COLOR_CODES.items()}
+
+# 接收缓冲区，保存尚未处理的字节（可能包含不完整的应答行）
+_rx_buffer = bytearray()
+# 已从接收缓冲区分离出来、等待主循环读取的指令
+_commands = deque()
+# 接收线程和主循环共用接收缓冲区和指令队列
+_rx_lock = threading.Lock()
+
+
+def enable_latency_trace(tracker):
+    """
+    启用延迟追踪
+    启用后数据包末尾追加 " seq:<帧序号>"，电控按 scanf 解析 dx/dy/dis 时会忽略该字段
+    """
+    global latency_tracker
+    latency_tracker = tracker
+
+
+def _expect_ack(stamp):
+    if latency_tracker is not None:
+        latency_tracker.expect_ack(stamp)
+
+
+def _record_send(stamp):
+    if latency_tracker is not None:
+        latency_tracker.record_send(stamp)
+
+
+def _write(data, stamp=None):
+    if tx_worker is not None:
+        tx_worker.submit(data, stamp)
+    else:
+        _expect_ack(stamp)
+        ser.write(data)
+        _record_send(stamp)
+
+
+def _format_packet(dx, dy, distance, stamp=None, fields=None, candidates=None):
+    msg = f"dx:{dx} dy:{dy} dis:{distance}"
+    if fields:
+        msg += "".join(f" {key}:{value}" for key, value in fields.items())
+    if latency_tracker is not None and stamp is not None:
+        msg += f" seq:{stamp.seq}"
+    if candidates is not None:
+        msg += _format_candidates(candidates)
+    return msg + "\n"
+
+
+def _format_candidates(candidates):
+    """
+    候选目标列表放在数据包最后: " n:<个数> t:<字节数>:<颜色>,<dx>,<dy>,<dis>,<置信度>;..."
+    电控读到 t: 后先取字节数，再按字节数读取内容，不用在内容里找结束符
+    """
+    payload = ";".join(f"{BATCH_COLOR_CODES.get(color, color[0])},{dx},{dy},{dis},{conf}"
+                       for color, dx, dy, dis, conf in candidates)
+    return f" n:{len(candidates)} t:{len(payload)}:{payload}"
+
+
+def decode_candidates(text, count=None):
+    """
+    解码 t: 字段的内容 "<字节数>:<候选>;<候选>..."（测试和电控仿真用）
+    返回 [(颜色, dx, dy, dis, 置信度), ...]，长度或个数不符时抛出 ValueError
+    """
+    length, sep, payload = text.partition(":")
+    if not sep or not length.isdigit() or len(payload) != int(length):
+        raise ValueError(f"候选目标长度不符: {text!r}")
+    candidates = []
+    for item in payload.split(";") if payload else []:
+        code, dx, dy, dis, conf = item.split(",")
+        candidates.append((BATCH_COLOR_NAMES.get(code, code), int(dx), int(dy), int(dis), int(conf)))
+    if count is not None and len(candidates) != count:
+        raise ValueError(f"候选目标个数不符: n={count}, 实际 {len(candidates)}")
+    return candidates
+
+
+def _drain_rx(now):
+    """
+    处理接收缓冲区：应答行交给延迟追踪器（到达时间为 now），其余字节逐个放进指令队列
+    调用方持有 _rx_lock
+    """
+    while _rx_buffer:
+        if ACK_PREFIX.startswith(bytes(_rx_buffer[:len(ACK_PREFIX)])):
+            end = _rx_buffer.find(b"\n", 0, ACK_MAX_LEN)
+            if end >= 0:
+                line = bytes(_rx_buffer[len(ACK_PREFIX):end]).strip()
+                del _rx_buffer[:end + 1]
+                if latency_tracker is not None and line.isdigit():
+                    latency_tracker.record_ack(int(line), now)
+                continue
+            if len(_rx_buffer) < ACK_MAX_LEN:
+                return  # 等待应答行剩余部分
+            # 过长仍没有换行，不是应答，按普通字节处理
+        _commands.append(bytes(_rx_buffer[:1]))
+        del _rx_buffer[:1]
+
+
+class RxWorker:
+    """
+    接收线程
+    串口字节一到就读出并记下到达时间：应答的时间戳是真正收到的时间，
+    不会因为主循环下一次调用 read_ecu_command() 才处理而多算一个循环周期。
+    指令字节放进队列，主循环照常用 read_ecu_command() 每次取一条。
+    """
+
+    def __init__(self, port, timeout=0.05):
+        self.port = port
+        self.timeout = timeout
+        self._running = False
+        self._thread = None
+        self.received = 0
+
+    def start(self):
+        self.port.timeout = self.timeout
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="uart-rx", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while self._running:
+            try:
+                # 有数据时立即返回，没有数据时最多等 timeout 秒，便于检查是否停止
+                data = self.port.read(max(1, self.port.in_waiting))
+            except (serial.SerialException, OSError):
+                return
+            if not data:
+                continue
+            now = time.monotonic()
+            with _rx_lock:
+                _rx_buffer.extend(data)
+                self.received += len(data)
+                _drain_rx(now)
+
+
+# 接收线程，调用 start_rx_thread() 后启用；未启用时主循环调用 read_ecu_command() 时才读串口
+rx_worker = None
+
+
+def start_rx_thread():
+    """启动接收线程（启用延迟追踪时需要，应答才能按到达时间计时）"""
+    global rx_worker
+    if rx_worker is not None:
+        return rx_worker
+    rx_worker = RxWorker(ser)
+    rx_worker.start()
+    print("串口接收线程已启动")
+    return rx_worker
+
+
+def stop_rx_thread():
+    global rx_worker
+    if rx_worker is None:
+        return
+    rx_worker.stop()
+    rx_worker = None
+
 
 def read_ecu_command():
     """读取电控发送的数组信号"""
@@ -11,33 +305,56 @@ def read_ecu_command():
     if  not ser or not  ser.is_open:
         print("警告: 串口未初始化或已关闭，无法接收数据")
         return None
-        
-    if ser.in_waiting > 0:
-        cmd = ser.read(1).decode('utf-8').strip()  # 读取一个字节
-        print(f"收到电控信号: {cmd}")
-        return cmd
-    return None
+
+    with _rx_lock:
+        if rx_worker is None and ser.in_waiting > 0:
+            _rx_buffer.extend(ser.read(ser.in_waiting))
+            _drain_rx(time.monotonic())
+        if not _commands:
+            return None
+        cmd = _commands.popleft().decode('utf-8', errors='ignore').strip()  # 读取一个字节
+    print(f"收到电控信号: {cmd}")
+    return cmd
     
-def send_data(dx, dy, distance):
+def send_data(dx, dy, distance, stamp=None, **fields):
     """
     发送 ASCII 字符串给 STM32
     格式: "dx:100 dy:200 dis:200 id:1"
+    stamp: 该帧的 latency.FrameStamp，启用延迟追踪时追加 seq 字段
+    fields: 追加在 dis 之后的其他整数字段（如 cam:1），电控按 scanf 解析时会忽略
     """
     # 构造严格匹配 scanf 的字符串
-    msg = f"dx:{dx} dy:{dy} dis:{distance}\n"
+    msg = _format_packet(dx, dy, distance, stamp, fields)
     
     # 发送 ASCII 字节
-    ser.write(msg.encode('ascii'))
+    _write(msg.encode('ascii'), stamp)
+    print(f"发送: '{msg.strip()}'")
+    return msg.strip()
+
+def send_batch(candidates, stamp=None, **fields):
+    """
+    批量发送一帧中的多个候选目标
+    candidates: [(颜色, dx, dy, dis, 置信度), ...]，第一个是首选目标
+    首选目标仍按原格式放在 dx/dy/dis 字段，只按 scanf 解析前三个字段的电控不受影响；
+    全部候选目标（含首选）放在最后的 t 字段，格式见 _format_candidates
+    """
+    _, dx, dy, dis, _ = candidates[0]
+    msg = _format_packet(dx, dy, dis, stamp, fields, candidates)
+    _write(msg.encode('ascii'), stamp)
     print(f"发送: '{msg.strip()}'")
+    return msg.strip()
 
-def send_no_target():
+def send_no_target(stamp=None):
     """没有看到目标时发送0"""
-    msg = "dx:0 dy:0 dis:0\n"
-    ser.write(msg.encode('ascii'))
+    msg = _format_packet(0, 0, 0, stamp)
+    _write(msg.encode('ascii'), stamp)
     print(f"发送: '{msg}' (无目标)")
+    return msg.strip()
 
 def close_serial():
     """关闭串口"""
+    stop_tx_thread()
+    stop_rx_thread()
     if ser and ser.is_open:
         ser.close()
         print("串口已关闭")
@@ -0,0 +1,243 @@
+"""
+批量检测（离线评估、回放和数据集标注用）
+vision.find_balls / find_safe_zones 每次处理一帧、一种颜色，逐帧调用时 Python 开销和 HSV 转换次数都随颜色数增加。
+这里把帧按块(chunk)叠成一张 (块大小×高, 宽) 的大图：HSV 转换和各颜色的阈值掩码每块只调用一次，
+形态学、轮廓和安全区判断仍然逐帧做（按帧取大图的视图，不复制），结果与逐帧调用 vision 完全相同。
+每块的中间图像放在缓冲池中复用，内存占用由块大小决定，与总帧数无关。
+
+结果是紧凑的 numpy 结构化数组，按帧号、颜色顺序排列（同帧同色的小球按半径降序）：
+    BALL_DTYPE: frame 帧号, color 颜色在 colors 中的下标, x, y, r
+    ZONE_DTYPE: frame 帧号, color 颜色在 zone_colors 中的下标, x, y
+
+用法:
+    # 检测数据集目录或录像文件中的所有帧，结果保存为 npz
+    python src/batch.py 数据集目录或视频 --colors red blue yellow black --zones red blue --out result.npz
+
+    # 同时逐帧调用 vision，检查结果一致并对比耗时
+    python src/batch.py 数据集目录 --compare
+"""
+
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+import dataset
+import vision
+
+BALL_COLORS = ["red", "blue", "yellow", "black"]
+ZONE_COLORS = ["red", "blue"]
+DEFAULT_CHUNK = 32
+
+BALL_DTYPE = np.dtype([("frame", np.int32), ("color", np.uint8), ("x", np.int16), ("y", np.int16),
+                       ("r", np.int16)])
+ZONE_DTYPE = np.dtype([("frame", np.int32), ("color", np.uint8), ("x", np.int16), ("y", np.int16)])
+
+
+def iter_chunks(frames, chunk_size=DEFAULT_CHUNK, pool=None):
+    """
+    把帧分块，逐块返回 (第一帧的帧号, (n, 高, 宽, 3) 的连续数组)
+    frames: (N, 高, 宽, 3) 数组（直接按块切片，不复制）或可迭代的单帧图像；分辨率变化时提前结束当前块
+    迭代器输入时块数组是缓冲池中的缓冲区，取下一块时会被覆盖
+    """
+    if isinstance(frames, np.ndarray):
+        if frames.ndim == 3:
+            frames = frames[None]
+        for start in range(0, len(frames), chunk_size):
+            yield start, np.ascontiguousarray(frames[start:start + chunk_size])
+        return
+
+    if pool is None:
+        pool = vision.get_buffer_pool()
+    buf, n, start = None, 0, 0
+    for i, frame in enumerate(frames):
+        if buf is not None and (n == chunk_size or frame.shape != buf.shape[1:]):
+            yield start, buf[:n]
+            start, n = i, 0
+        if buf is None or frame.shape != buf.shape[1:]:
+            buf = pool.get("batch_frames", (chunk_size,) + frame.shape)
+        buf[n] = frame
+        n += 1
+    if n:
+        yield start, buf[:n]
+
+
+def _chunk_masks(hsv, colors, pool):
+    """对整块的HSV大图计算各颜色的掩码，返回 {颜色: (n×高, 宽) 掩码}"""
+    masks = {}
+    scratch = pool.get("batch_scratch", hsv.shape[:2])
+    for color in colors:
+        masks[color] = vision.create_color_mask(hsv, color, dst=pool.get(f"batch_mask_{color}", hsv.shape[:2]),
+                                                scratch=scratch)
+    return masks
+
+
+def _detect_chunk(start, chunk, colors, zone_colors, params, pool=None):
+    """检测一块帧，返回 (小球列表, 安全区列表)"""
+    if pool is None:
+        pool = vision.get_buffer_pool()
+    ball_kernel = vision.get_kernel(params["kernel_size"])
+    zone_kernel = vision.get_kernel(params["zone_kernel_size"])
+    fence_color = params["fence_color"]
+    mask_colors = list(colors) + ([fence_color] if zone_colors else [])
+    balls, zones = [], []
+
+    n, h, w = chunk.shape[:3]
+    # 整块叠成一张 (n×h, w) 的大图，HSV 转换和阈值掩码每块只做一次
+    hsv = cv2.cvtColor(chunk.reshape(n * h, w, 3), cv2.COLOR_BGR2HSV, dst=pool.get("batch_hsv", (n * h, w, 3)))
+    masks = _chunk_masks(hsv, mask_colors, pool)
+    morph = pool.get("batch_morph", (h, w))
+
+    # 形态学按帧做（跨帧做会让相邻两帧的边缘互相影响），掩码是大图中该帧的视图
+    for i in range(n):
+        rows = slice(i * h, (i + 1) * h)
+        for ci, color in enumerate(colors):
+            mask = masks[color][rows]
+            cv2.morphologyEx(mask, cv2.MORPH_OPEN, ball_kernel, dst=morph)
+            cv2.morphologyEx(morph, cv2.MORPH_CLOSE, ball_kernel, dst=mask)
+            for x, y, r in vision.balls_from_mask(mask, params["min_area"], params["min_circularity"],
+                                                  params["min_radius"]):
+                balls.append((start + i, ci, x, y, r))
+        if zone_colors:
+            fence = masks[fence_color][rows]
+            cv2.morphologyEx(fence, cv2.MORPH_CLOSE, zone_kernel, dst=morph)
+            cv2.morphologyEx(morph, cv2.MORPH_OPEN, zone_kernel, dst=fence)
+            for ci, color in enumerate(zone_colors):
+                for x, y in vision.zones_in_fences(hsv[rows], fence, color, params["zone_min_area"],
+                                                   params["zone_kernel_size"], pool):
+                    zones.append((start + i, ci, x, y))
+    return balls, zones
+
+
+def detect_batch(frames, colors=BALL_COLORS, zone_colors=(), chunk_size=DEFAULT_CHUNK, workers=1,
+                 min_area=10, min_circularity=0.7, min_radius=5, kernel_size=3,
+                 zone_min_area=1000, zone_kernel_size=5, fence_color="purple"):
+    """
+    批量检测小球和安全区，参数含义与 vision.find_balls / find_safe_zones 相同（zone_ 前缀为安全区参数）
+    frames: 见 iter_chunks；colors: 要找的小球颜色；zone_colors: 要找的安全区颜色（red/blue）
+    workers: 大于 1 时用线程池并行处理多个块（OpenCV 计算时释放GIL），同时最多有 2×workers 块在内存中
+    返回 (小球数组 BALL_DTYPE, 安全区数组 ZONE_DTYPE)
+    """
+    params = {"min_area": min_area, "min_circularity": min_circularity, "min_radius": min_radius,
+              "kernel_size": kernel_size, "zone_min_area": zone_min_area, "zone_kernel_size": zone_kernel_size,
+              "fence_color": fence_color}
+    balls, zones = [], []
+
+    def collect(result):
+        balls.extend(result[0])
+        zones.extend(result[1])
+
+    if workers <= 1:
+        for start, chunk in iter_chunks(frames, chunk_size):
+            collect(_detect_chunk(start, chunk, colors, zone_colors, params))
+    else:
+        # 每个工作线程使用自己的缓冲池；迭代器输入的块缓冲区会被下一块覆盖，提交前复制
+        pending = deque()
+        with ThreadPoolExecutor(workers) as executor:
+            for start, chunk in iter_chunks(frames, chunk_size, vision.BufferPool()):
+                if not isinstance(frames, np.ndarray):
+                    chunk = chunk.copy()
+                pending.append(executor.submit(_detect_chunk, start, chunk, colors, zone_colors, params))
+                if len(pending) >= 2 * workers:
+                    collect(pending.popleft().result())
+            while pending:
+                collect(pending.popleft().result())
+
+    return np.array(balls, BALL_DTYPE), np.array(zones, ZONE_DTYPE)
+
+
+def find_balls_batch(frames, colors=BALL_COLORS, chunk_size=DEFAULT_CHUNK, **filters):
+    """批量找球，返回 BALL_DTYPE 数组；filters 为 vision.find_balls 的筛选参数"""
+    balls, _ = detect_batch(frames, colors, (), chunk_size, **filters)
+    return balls
+
+
+def find_safe_zones_batch(frames, colors=ZONE_COLORS, chunk_size=DEFAULT_CHUNK, min_area=1000, kernel_size=5):
+    """批量找安全区，返回 ZONE_DTYPE 数组"""
+    _, zones = detect_batch(frames, (), colors, chunk_size, zone_min_area=min_area, zone_kernel_size=kernel_size)
+    return zones
+
+
+def detect_per_frame(frames, colors=BALL_COLORS, zone_colors=()):
+    """逐帧调用 vision 得到同样格式的结果（对比用）"""
+    balls, zones = [], []
+    for i, frame in enumerate(frames):
+        for ci, color in enumerate(colors):
+            balls.extend((i, ci, x, y, r) for x, y, r in vision.find_balls(frame, color))
+        for ci, color in enumerate(zone_colors):
+            zones.extend((i, ci, x, y) for x, y in vision.find_safe_zones(frame, color))
+    return np.array(balls, BALL_DTYPE), np.array(zones, ZONE_DTYPE)
+
+
+def read_frames(path):
+    """逐帧读取数据集目录（格式见 dataset.py）或录像文件"""
+    if os.path.isdir(path):
+        for frame, _ in dataset.iter_frames(path):
+            yield frame
+        return
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"无法打开录像 {path}")
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame
+    finally:
+        cap.release()
+
+
+def _counted(frames, counter):
+    """逐帧转发，顺便计数"""
+    for frame in frames:
+        counter[0] += 1
+        yield frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量检测数据集或录像")
+    parser.add_argument("input", help="数据集目录或录像文件")
+    parser.add_argument("--colors", nargs="*", default=BALL_COLORS, help="小球颜色")
+    parser.add_argument("--zones", nargs="*", default=ZONE_COLORS, help="安全区颜色")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK, help="每块的帧数，决定内存占用")
+    parser.add_argument("--workers", type=int, default=1, help="并行处理的线程数")
+    parser.add_argument("--fps", type=float, default=30.0, help="录制帧率，用于计算相对实时的倍数")
+    parser.add_argument("--out", help="结果保存为 npz（balls、zones、colors、zone_colors）")
+    parser.add_argument("--compare", action="store_true", help="同时逐帧调用 vision，检查结果一致并对比耗时")
+    args = parser.parse_args()
+
+    # 逐块读取和检测，内存占用与录像长度无关；计时包含读图/解码
+    counter = [0]
+    start = time.perf_counter()
+    balls, zones = detect_batch(_counted(read_frames(args.input), counter), args.colors, args.zones, args.chunk,
+                                args.workers)
+    elapsed = time.perf_counter() - start
+    count = counter[0]
+    if not count:
+        print("没有读到任何帧")
+        return
+    rate = count / elapsed
+    print(f"{count} 帧: 小球 {len(balls)} 个, 安全区 {len(zones)} 个, 用时 {elapsed:.2f}s "
+          f"({rate:.0f} 帧/秒, 实时的 {rate / args.fps:.1f} 倍)")
+
+    if args.compare:
+        start = time.perf_counter()
+        ref_balls, ref_zones = detect_per_frame(read_frames(args.input), args.colors, args.zones)
+        ref_elapsed = time.perf_counter() - start
+        same = np.array_equal(balls, ref_balls) and np.array_equal(zones, ref_zones)
+        print(f"逐帧调用 vision: 用时 {ref_elapsed:.2f}s ({count / ref_elapsed:.0f} 帧/秒), "
+              f"批量加速 {ref_elapsed / elapsed:.2f} 倍, 结果{'一致' if same else '不一致'}")
+
+    if args.out:
+        np.savez_compressed(args.out, balls=balls, zones=zones, colors=np.array(args.colors),
+                            zone_colors=np.array(args.zones))
+        print(f"结果已保存到: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
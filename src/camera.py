@@ -0,0 +1,391 @@
+"""
+摄像头打开与预热，多摄像头采集管理
+每个摄像头有独立的采集线程(CameraSource)和检测线程，
+CaptureManager 让所有摄像头并行检测各自的最新帧，再把结果交给主循环合并。
+摄像头配置了 replay 时改为循环回放数据集或录像(ReplayCapture)，不需要真实摄像头就能跑完整主循环。
+"""
+
+import glob
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+import dataset
+
+# 单个摄像头的检测结果；stamp 为 None 表示超时没有拿到新帧
+CameraResult = namedtuple("CameraResult", ["source", "stamp", "targets"])
+
+# 摄像头参数档案的项 -> OpenCV 属性，按此顺序设置（先关自动曝光/白平衡再设数值）
+# V4L2 下 auto_exposure: 1 手动曝光, 3 自动曝光；auto_white_balance: 0 关, 1 开
+PROFILE_PROPS = {
+    "fps": cv2.CAP_PROP_FPS,
+    "auto_exposure": cv2.CAP_PROP_AUTO_EXPOSURE,
+    "exposure": cv2.CAP_PROP_EXPOSURE,
+    "gain": cv2.CAP_PROP_GAIN,
+    "auto_white_balance": cv2.CAP_PROP_AUTO_WB,
+    "white_balance": cv2.CAP_PROP_WB_TEMPERATURE,
+}
+# 实测帧率低于设置值的这个比例时报警
+FPS_TOLERANCE = 0.8
+
+
+def _fourcc_str(value):
+    value = int(value)
+    return "".join(chr((value >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00")
+
+
+def apply_profile(cap, profile):
+    """
+    设置摄像头参数档案中的属性，值为 None 或不写的项保持驱动默认
+    format(如 "MJPG")需要在设置分辨率之前设置，由 open_camera 处理
+    返回 set() 被驱动拒绝的项名列表
+    """
+    rejected = []
+    for key, prop in PROFILE_PROPS.items():
+        value = profile.get(key)
+        if value is not None and not cap.set(prop, value):
+            rejected.append(key)
+    return rejected
+
+
+def read_profile(cap, profile):
+    """读回档案中设置过的各项的实际值"""
+    actual = {}
+    if profile.get("format") is not None:
+        actual["format"] = _fourcc_str(cap.get(cv2.CAP_PROP_FOURCC))
+    for key, prop in PROFILE_PROPS.items():
+        if profile.get(key) is not None:
+            actual[key] = cap.get(prop)
+    return actual
+
+
+def profile_mismatches(profile, actual):
+    """返回读回值与设置值不一致的项 [(项, 设置值, 读回值), ...]"""
+    mismatches = []
+    for key, got in actual.items():
+        want = profile[key]
+        if key == "format":
+            same = got == want
+        else:
+            # 驱动会把曝光等取整到支持的档位，允许小误差
+            same = abs(got - want) <= max(0.5, abs(want) * 0.05)
+        if not same:
+            mismatches.append((key, want, got))
+    return mismatches
+
+
+def measure_fps(cap, frames=20, timeout=3.0):
+    """连续读取 frames 帧，返回实际帧率（读不到帧时为 0）"""
+    frame = None
+    got = 0
+    start = time.monotonic()
+    first = None
+    while got < frames and time.monotonic() - start < timeout:
+        ret, frame = cap.read(frame)
+        if not ret:
+            continue
+        if first is None:
+            # 第一帧可能是驱动缓存里的旧帧，从读到它之后开始计时
+            first = time.monotonic()
+        else:
+            got += 1
+    if first is None or got == 0:
+        return 0.0
+    return got / (time.monotonic() - first)
+
+
+def open_camera(index, width=640, height=480, warmup_frames=5, warmup_timeout=3.0, profile=None):
+    """
+    打开摄像头并预热
+    profile: 摄像头参数档案（格式、帧率、曝光、增益、白平衡），在预热之前设置
+    丢弃开头的 warmup_frames 帧（自动曝光尚未稳定），失败时抛出 RuntimeError 并给出排查提示
+    返回 (已就绪的 VideoCapture, 被驱动拒绝的档案项列表)
+    """
+    cap = cv2.VideoCapture(index)
+    if not cap.isOpened():
+        devices = sorted(glob.glob("/dev/video*"))
+        raise RuntimeError(f"摄像头 {index} 打开失败，当前设备: {devices or '无'}，"
+                           f"请检查 config.json 中的 camera.index")
+
+    profile = profile or {}
+    rejected = []
+    if profile.get("format") is not None:
+        if not cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*profile["format"])):
+            rejected.append("format")
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    rejected += apply_profile(cap, profile)
+
+    # 预热：丢弃自动曝光稳定前的帧，同时确认确实能读到图像
+    deadline = time.monotonic() + warmup_timeout
+    good = 0
+    frame = None
+    while good < max(1, warmup_frames):
+        ret, frame = cap.read(frame)
+        if ret:
+            good += 1
+        elif time.monotonic() > deadline:
+            cap.release()
+            raise RuntimeError(f"摄像头 {index} 已打开但 {warmup_timeout}s 内读不到图像")
+    return cap, rejected
+
+
+def read_replay_frames(path, max_frames=None):
+    """读取数据集目录（格式见 dataset.py）或录像文件的前 max_frames 帧（None 为全部）"""
+    frames = []
+    if os.path.isdir(path):
+        for frame, _ in dataset.iter_frames(path):
+            if max_frames is not None and len(frames) >= max_frames:
+                break
+            frames.append(frame)
+        return frames
+    cap = cv2.VideoCapture(path)
+    try:
+        while max_frames is None or len(frames) < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+    finally:
+        cap.release()
+    return frames
+
+
+class ReplayCapture:
+    """
+    循环回放内存中的帧，接口与 cv2.VideoCapture 的 read/get/set/release 相同
+    按 fps 控制节奏（0 表示不限速）；帧在启动时全部读入内存，回放时只复制到调用方的缓冲区，不再分配
+    """
+
+    def __init__(self, path, fps=30.0, max_frames=None):
+        self.path = path
+        self.fps = fps
+        self.frames = read_replay_frames(path, max_frames)
+        self._index = 0
+        self._next_time = None
+
+    def isOpened(self):
+        return bool(self.frames)
+
+    def set(self, prop, value):
+        return False
+
+    def get(self, prop):
+        if not self.frames:
+            return 0
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.frames[0].shape[1]
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.frames[0].shape[0]
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        return 0
+
+    def read(self, image=None):
+        if not self.frames:
+            return False, image
+        if self.fps > 0:
+            now = time.monotonic()
+            if self._next_time is None:
+                self._next_time = now
+            if self._next_time > now:
+                time.sleep(self._next_time - now)
+            # 落后太多时不追赶，与真实摄像头只给最新帧一致
+            self._next_time = max(self._next_time, now - 1.0) + 1.0 / self.fps
+        frame = self.frames[self._index]
+        self._index = (self._index + 1) % len(self.frames)
+        if image is None or image.shape != frame.shape:
+            return True, frame.copy()
+        np.copyto(image, frame)
+        return True, image
+
+    def release(self):
+        self.frames = []
+
+
+class CameraSource:
+    """
+    单个摄像头的采集线程
+    采集线程不停读取最新帧，检测线程通过 acquire()/release() 取用；
+    帧缓冲区轮流复用（最新帧、检测中的帧、正在写入的帧各占一块），不会覆盖正在检测的帧。
+    """
+
+    SLOTS = 3
+
+    def __init__(self, name, index, counter, width=640, height=480, flip=None,
+                 warmup_frames=5, priority=0, profile=None, measure_frames=20, replay=None, replay_fps=30.0,
+                 replay_frames=None):
+        self.name = name
+        self.index = index
+        self.replay = replay  # 数据集目录或录像文件，给出时循环回放它而不打开摄像头
+        self.replay_fps = replay_fps
+        self.replay_frames = replay_frames  # 回放时最多读入内存的帧数，None 为全部
+        self.width = width
+        self.height = height
+        self.flip = flip  # cv2.flip 的参数：0 上下翻转，1 左右翻转，-1 旋转180°，None 不翻转
+        self.warmup_frames = warmup_frames
+        self.priority = priority  # 数值越小越优先
+        self.profile = profile or {}
+        self.measure_frames = measure_frames  # 启动时测量实际帧率用的帧数，0 表示不测
+        self.counter = counter
+        self.cap = None
+
+        # 启动时读回的设置和实测帧率
+        self.settings = {}
+        self.rejected = []
+        self.mismatches = []
+        self.measured_fps = None
+
+        self._slots = [None] * self.SLOTS
+        self._latest = None
+        self._latest_stamp = None
+        self._held = set()
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+        self.frames = 0
+        self.dropped = 0
+        self.read_failures = 0
+        self._consumed = True
+
+    def open(self):
+        """打开并预热摄像头，读回参数档案并测量实际帧率（启动时可与其他初始化步骤并行）"""
+        if self.replay:
+            self.cap = ReplayCapture(self.replay, self.replay_fps, self.replay_frames)
+            if not self.cap.isOpened():
+                raise RuntimeError(f"回放 {self.replay} 读不到任何帧")
+            return self
+        self.cap, self.rejected = open_camera(self.index, self.width, self.height, self.warmup_frames,
+                                              profile=self.profile)
+        self.settings = read_profile(self.cap, self.profile)
+        self.mismatches = profile_mismatches(self.profile, self.settings)
+        if self.measure_frames:
+            self.measured_fps = measure_fps(self.cap, self.measure_frames)
+        return self
+
+    def profile_report(self):
+        """启动检查结果，返回要打印的提示行（没有问题时只有一行实测帧率）"""
+        lines = []
+        for key in self.rejected:
+            lines.append(f"警告: 摄像头[{self.name}] 驱动拒绝设置 {key}={self.profile[key]}")
+        for key, want, got in self.mismatches:
+            if key not in self.rejected:
+                lines.append(f"警告: 摄像头[{self.name}] {key} 设置为 {want!r}，读回 {got!r}，驱动可能忽略了该设置")
+        if self.measured_fps is not None:
+            expected = self.profile.get("fps") or self.cap.get(cv2.CAP_PROP_FPS)
+            line = f"摄像头[{self.name}] 实测帧率 {self.measured_fps:.1f} fps"
+            if expected and self.measured_fps < expected * FPS_TOLERANCE:
+                line = (f"警告: {line}，低于设置的 {expected:.0f} fps"
+                        f"（检查自动曝光是否在暗处延长了曝光时间，或格式/USB带宽是否不足）")
+            lines.append(line)
+        return lines
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"capture-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(1.0)
+            self._thread = None
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def _free_slot(self):
+        for i in range(self.SLOTS):
+            if i != self._latest and i not in self._held:
+                return i
+        return None
+
+    def _run(self):
+        while self._running:
+            with self._cond:
+                slot = self._free_slot()
+            ret, buf = self.cap.read(self._slots[slot])
+            if not ret:
+                self.read_failures += 1
+                time.sleep(0.005)
+                continue
+            stamp = self.counter.stamp()
+            if self.flip is not None:
+                buf = cv2.flip(buf, self.flip, dst=buf)
+            with self._cond:
+                self._slots[slot] = buf
+                if not self._consumed:
+                    self.dropped += 1
+                self._latest = slot
+                self._latest_stamp = stamp
+                self._consumed = False
+                self.frames += 1
+                self._cond.notify_all()
+
+    def acquire(self, after_seq=0, timeout=0.5):
+        """
+        等待并取出序号大于 after_seq 的最新帧
+        返回 (槽位, 图像, FrameStamp)，超时返回 (None, None, None)；用完必须 release(槽位)
+        """
+        with self._cond:
+            ok = self._cond.wait_for(
+                lambda: self._latest_stamp is not None and self._latest_stamp.seq > after_seq, timeout)
+            if not ok:
+                return None, None, None
+            slot = self._latest
+            self._held.add(slot)
+            self._consumed = True
+            return slot, self._slots[slot], self._latest_stamp
+
+    def release(self, slot):
+        with self._cond:
+            self._held.discard(slot)
+
+
+class CaptureManager:
+    """管理多个摄像头，每个摄像头一个检测线程，各摄像头的检测并行进行"""
+
+    def __init__(self, sources, frame_timeout=0.5):
+        self.sources = sorted(sources, key=lambda s: s.priority)
+        self.frame_timeout = frame_timeout
+        self._executors = {}
+        self._last_seq = {}
+
+    def start(self):
+        for source in self.sources:
+            # 每个摄像头固定一个检测线程，vision 的缓冲池按线程复用
+            self._executors[source.name] = ThreadPoolExecutor(max_workers=1,
+                                                              thread_name_prefix=f"detect-{source.name}")
+            self._last_seq[source.name] = 0
+            source.start()
+
+    def stop(self):
+        for executor in self._executors.values():
+            executor.shutdown(wait=True)
+        self._executors.clear()
+        for source in self.sources:
+            source.stop()
+
+    def _process(self, source, detect):
+        slot, frame, stamp = source.acquire(self._last_seq[source.name], self.frame_timeout)
+        if slot is None:
+            return CameraResult(source, None, [])
+        try:
+            self._last_seq[source.name] = stamp.seq
+            return CameraResult(source, stamp, detect(frame, source, stamp))
+        finally:
+            source.release(slot)
+
+    def detect(self, detect):
+        """
+        让每个摄像头用 detect(frame, source, stamp) 处理各自的最新帧
+        返回按摄像头优先级排列的 [CameraResult, ...]
+        """
+        futures = [self._executors[s.name].submit(self._process, s, detect) for s in self.sources]
+        return [f.result() for f in futures]
@@ -0,0 +1,204 @@
+"""
+直方图反向投影颜色模型
+HSV阈值是一个轴对齐的盒子，范围宽的颜色（紫色围栏 S≥7、黑色 V≤52）会把阴影和背景也分进掩码，
+每个多余的轮廓都要在 find_balls / find_safe_zones 里花 Python 时间。
+这里从带标注的样本帧学习每种颜色的 H-S 二维直方图，与背景直方图相比得到每个 (H,S) 属于该颜色的置信度，
+检测时反向投影并按置信度阈值得到掩码。
+学到的模型保存在 config/hist_<颜色>.json，config.json 的 color_engine.hist_colors 中列出的颜色使用它，
+其余颜色仍用HSV阈值。H-S 直方图不含亮度，黑色这类主要靠亮度区分的颜色不适合。
+
+学习样本（数据集格式见 dataset.py）：
+  - balls 标注：圆内（0.8 倍半径）的像素
+  - safe_zones 标注：中心附近 SAFE_ZONE_PATCH 大小的方块
+  - 可选的 samples 标注 [{"color": "purple", "x": .., "y": .., "w": .., "h": ..}]：矩形内的像素，用于围栏等没有其他标注的颜色
+  - 背景：帧内所有不属于任何样本的像素
+
+用法:
+    python src/color_hist.py 数据集目录 --colors red blue yellow purple [--min-prob 0.5]
+"""
+
+import argparse
+import json
+import os
+
+import cv2
+import numpy as np
+
+import dataset
+import vision
+
+HIST_BINS = [30, 32]
+HIST_RANGES = [0, 180, 0, 256]
+SAFE_ZONE_PATCH = 15
+BALL_SAMPLE_RATIO = 0.8
+MATCH_PX = 15
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config")
+
+
+def histogram_path(color_name):
+    return os.path.join(CONFIG_DIR, f"hist_{color_name}.json")
+
+
+class HistogramEngine:
+    """
+    反向投影掩码，作为 vision.set_mask_engine 的 engine
+    hist: H-S 置信度直方图（0~255）；min_prob: 置信度阈值（0~1）
+    """
+
+    def __init__(self, hist, min_prob=0.5):
+        self.hist = np.asarray(hist, np.float32)
+        self.min_prob = min_prob
+        self._threshold = min_prob * 255
+
+    def __call__(self, hsv, dst=None, scratch=None):
+        prob = cv2.calcBackProject([hsv], [0, 1], self.hist, HIST_RANGES, 1, dst=scratch)
+        _, mask = cv2.threshold(prob, self._threshold, 255, cv2.THRESH_BINARY, dst=dst)
+        return mask
+
+
+def _sample_masks(shape, entry):
+    """返回 {颜色: 样本掩码} 和所有样本的并集"""
+    h, w = shape[:2]
+    masks = {}
+
+    def mask_for(color):
+        if color not in masks:
+            masks[color] = np.zeros((h, w), np.uint8)
+        return masks[color]
+
+    for ball in entry.get("balls", []):
+        radius = max(1, int(ball["r"] * BALL_SAMPLE_RATIO))
+        cv2.circle(mask_for(ball["color"]), (int(ball["x"]), int(ball["y"])), radius, 255, -1)
+    for zone in entry.get("safe_zones", []):
+        half = SAFE_ZONE_PATCH // 2
+        x, y = int(zone["x"]), int(zone["y"])
+        cv2.rectangle(mask_for(zone["color"]), (x - half, y - half), (x + half, y + half), 255, -1)
+    for sample in entry.get("samples", []):
+        x, y = int(sample["x"]), int(sample["y"])
+        cv2.rectangle(mask_for(sample["color"]), (x, y), (x + int(sample["w"]) - 1, y + int(sample["h"]) - 1),
+                      255, -1)
+
+    union = np.zeros((h, w), np.uint8)
+    for mask in masks.values():
+        cv2.bitwise_or(union, mask, dst=union)
+    return masks, union
+
+
+def learn_histograms(frames, colors, bins=HIST_BINS, blur=3):
+    """
+    frames: [(图像, 标注), ...]
+    返回 ({颜色: 置信度直方图}, {颜色: 样本像素数})
+    置信度 = p(H,S|颜色) / (p(H,S|颜色) + p(H,S|背景))，缩放到 0~255
+    """
+    counts = {color: np.zeros(bins, np.float32) for color in colors}
+    background = np.zeros(bins, np.float32)
+    pixels = {color: 0 for color in colors}
+    for frame, entry in frames:
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        masks, union = _sample_masks(frame.shape, entry)
+        for color, mask in masks.items():
+            if color in counts:
+                counts[color] += cv2.calcHist([hsv], [0, 1], mask, bins, HIST_RANGES)
+                pixels[color] += int(cv2.countNonZero(mask))
+        background += cv2.calcHist([hsv], [0, 1], cv2.bitwise_not(union), bins, HIST_RANGES)
+
+    def density(hist):
+        # 轻微平滑，让相邻的 (H,S) 格子也有置信度，光照稍变时不至于断开
+        if blur:
+            hist = cv2.GaussianBlur(hist, (blur, blur), 0)
+        total = hist.sum()
+        return hist / total if total > 0 else hist
+
+    bg = density(background)
+    hists = {}
+    for color in colors:
+        if pixels[color] == 0:
+            continue
+        fg = density(counts[color])
+        hists[color] = (fg / (fg + bg + 1e-9) * 255).astype(np.float32)
+    return hists, pixels
+
+
+def save_histogram(color_name, hist):
+    path = histogram_path(color_name)
+    with open(path, "w") as f:
+        json.dump({"bins": list(hist.shape), "hist": np.round(hist, 1).tolist()}, f)
+    return path
+
+
+def load_histogram(color_name):
+    path = histogram_path(color_name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"没有 {color_name} 的直方图模型 {path}，先运行 python src/color_hist.py 数据集目录 "
+                                f"--colors {color_name} 学习")
+    with open(path, "r") as f:
+        data = json.load(f)
+    return np.array(data["hist"], np.float32)
+
+
+def install(colors, min_prob=0.5):
+    """加载 colors 的直方图模型，替换这些颜色在 vision 中的掩码计算方式"""
+    for color in colors:
+        vision.set_mask_engine(color, HistogramEngine(load_histogram(color), min_prob))
+
+
+def _evaluate(frames, color):
+    """统计当前掩码方式下的平均掩码面积、平均候选轮廓数和小球召回率"""
+    coverage, contours, found, total = 0.0, 0, 0, 0
+    for frame, entry in frames:
+        mask = vision.ball_mask(frame, color)
+        coverage += cv2.countNonZero(mask) / mask.size
+        contours += len(cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0])
+        balls = vision.balls_from_mask(mask)
+        for ball in entry.get("balls", []):
+            if ball["color"] != color:
+                continue
+            total += 1
+            if any(np.hypot(x - ball["x"], y - ball["y"]) <= MATCH_PX for x, y, _ in balls):
+                found += 1
+    n = max(1, len(frames))
+    return {"coverage": coverage / n, "contours": contours / n,
+            "recall": found / total if total else None}
+
+
+def compare_engines(frames, color, hist, min_prob=0.5):
+    """对比HSV阈值和直方图反向投影，返回 (阈值统计, 直方图统计)"""
+    vision.set_mask_engine(color, None)
+    box = _evaluate(frames, color)
+    vision.set_mask_engine(color, HistogramEngine(hist, min_prob))
+    try:
+        hist_stats = _evaluate(frames, color)
+    finally:
+        vision.set_mask_engine(color, None)
+    return box, hist_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从数据集学习 H-S 直方图颜色模型")
+    parser.add_argument("dataset", help="数据集目录（格式见 dataset.py）")
+    parser.add_argument("--colors", nargs="+", default=["red", "blue", "yellow"])
+    parser.add_argument("--min-prob", type=float, default=0.5, help="对比时使用的置信度阈值")
+    parser.add_argument("--bins", nargs=2, type=int, default=HIST_BINS, help="H、S 的分格数")
+    args = parser.parse_args()
+
+    frames = dataset.load_frames(args.dataset)
+    print(f"读取 {len(frames)} 帧")
+    hists, pixels = learn_histograms(frames, args.colors, args.bins)
+
+    def fmt(stats):
+        recall = "-" if stats["recall"] is None else f"{stats['recall']:.2f}"
+        return f"掩码 {stats['coverage'] * 100:5.1f}%  候选轮廓 {stats['contours']:6.1f}  召回 {recall}"
+
+    for color in args.colors:
+        if color not in hists:
+            print(f"{color}: 没有样本像素，跳过")
+            continue
+        path = save_histogram(color, hists[color])
+        box, hist_stats = compare_engines(frames, color, hists[color], args.min_prob)
+        print(f"{color}: 样本 {pixels[color]} 像素，已保存到 {path}")
+        print(f"  HSV阈值  {fmt(box)}")
+        print(f"  直方图   {fmt(hist_stats)}")
+
+
+if __name__ == "__main__":
+    main()
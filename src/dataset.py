@@ -0,0 +1,75 @@
+"""
+带标注的帧数据集（离线评估/回放共用）
+
+目录结构:
+    dataset/
+    ├── labels.json
+    ├── 000000.jpg
+    └── 000001.jpg
+
+labels.json 格式:
+{
+  "frames": [
+    {
+      "file": "000000.jpg",
+      "balls": [{"color": "red", "x": 320, "y": 240, "r": 20}],
+      "safe_zones": [{"color": "blue", "x": 100, "y": 300}],
+      "samples": [{"color": "purple", "x": 80, "y": 280, "w": 200, "h": 10}]
+    }
+  ]
+}
+坐标均为该帧原始分辨率下的像素坐标
+samples 可选，是颜色样本矩形（左上角和宽高），只用于学习颜色模型(color_hist.py)
+synth.py 生成的数据集中，被遮挡的小球带 visible（可见比例），每帧带 synth（光照、噪声、模糊参数），其他工具忽略这些字段
+"""
+
+import json
+import os
+
+import cv2
+
+LABELS_FILE = "labels.json"
+
+
+def load_labels(dataset_dir):
+    """读取数据集的标注列表"""
+    with open(os.path.join(dataset_dir, LABELS_FILE), 'r') as f:
+        labels = json.load(f)
+    return labels["frames"]
+
+
+def iter_frames(dataset_dir):
+    """逐帧读取数据集，返回 (图像, 标注) ；读不到的图片直接跳过"""
+    for entry in load_labels(dataset_dir):
+        frame = cv2.imread(os.path.join(dataset_dir, entry["file"]))
+        if frame is None:
+            print(f"警告: 读取图片失败 {entry['file']}")
+            continue
+        yield frame, entry
+
+
+def load_frames(dataset_dir):
+    """一次性把整个数据集读入内存"""
+    return list(iter_frames(dataset_dir))
+
+
+def write_dataset(dataset_dir, entries):
+    """
+    写出数据集
+    entries: 可迭代的 (图像或JPEG字节, 标注字典)，标注里不需要 file 字段
+    """
+    os.makedirs(dataset_dir, exist_ok=True)
+    frames = []
+    for i, (image, entry) in enumerate(entries):
+        name = f"{i:06d}.jpg"
+        path = os.path.join(dataset_dir, name)
+        if isinstance(image, (bytes, bytearray)):
+            with open(path, 'wb') as f:
+                f.write(image)
+        else:
+            cv2.imwrite(path, image)
+        frames.append(dict(entry, file=name))
+
+    with open(os.path.join(dataset_dir, LABELS_FILE), 'w') as f:
+        json.dump({"frames": frames}, f, indent=2, ensure_ascii=False)
+    return len(frames)
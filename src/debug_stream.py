@@ -0,0 +1,230 @@
+"""
+MJPEG 调试视频流
+在视觉进程内开一个本地 HTTP 服务，浏览器打开 http://127.0.0.1:8080/ 即可看到
+缩小后的画面，叠加该摄像头检测器实际的小球颜色掩码、紫色围栏轮廓，主循环本帧得到的小球/安全区目标和最近发送的数据包，
+能直接看出某个目标为什么没检测到（掩码不全、围栏断开、被筛选参数滤掉……）。
+默认只监听本机，从其他机器查看时用 ssh 端口转发，或在配置中把 host 改为 0.0.0.0。
+没有客户端连接时 publish() 立即返回，正常运行没有额外开销；
+有客户端时掩码的取得和缩放在检测线程中完成（用检测器自己的流程、阈值和缓冲区），叠加绘制和JPEG编码在单独线程中按帧率上限进行。
+"""
+
+import html
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlparse
+
+import cv2
+
+# 掩码叠加和目标标签颜色(BGR)
+MASK_COLORS = {
+    "red": (0, 0, 255),
+    "blue": (255, 0, 0),
+    "yellow": (0, 255, 255),
+    "black": (80, 80, 80),
+}
+FENCE_COLOR = (255, 0, 255)
+
+INDEX_HTML = """<html><head><meta charset="utf-8"><title>rescue robot</title></head>
+<body style="background:#222;color:#ddd">{links}<br><img src="/stream?cam={cam_url}"></body></html>"""
+
+
+class DebugStream:
+    """
+    调试视频流服务
+    cameras: 可查看的摄像头名称列表；host: 监听地址，默认只允许本机访问
+    fps: 编码帧率上限；scale: 画面缩放比例；mask_colors: 叠加掩码的小球颜色
+    """
+
+    def __init__(self, cameras, host="127.0.0.1", port=8080, fps=5, scale=0.5, quality=70,
+                 mask_colors=("red", "blue", "yellow", "black")):
+        self.host = host
+        self.port = port
+        self.interval = 1.0 / fps
+        self.scale = scale
+        self.quality = quality
+        self.mask_colors = list(mask_colors)
+
+        self._cond = threading.Condition()
+        self._clients = 0
+        self._running = False
+        self._pending = {}       # 摄像头名称 -> (缩小的帧, 检测结果, 掩码叠加)
+        self._jpegs = {}         # 摄像头名称 -> (序号, JPEG字节)
+        self._last_publish = {}
+        self._packet = ""
+        self._server = None
+        self._threads = []
+        self.cameras = list(cameras)
+
+    @property
+    def active(self):
+        """是否有客户端在看"""
+        return self._clients > 0
+
+    def start(self):
+        stream = self
+
+        class Handler(_StreamHandler):
+            debug_stream = stream
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self._running = True
+        for target, name in ((self._server.serve_forever, "debug-http"), (self._encode_loop, "debug-encode")):
+            t = threading.Thread(target=target, name=name, daemon=True)
+            t.start()
+            self._threads.append(t)
+        print(f"调试视频流: http://{self.host}:{self.port}/")
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+        for t in self._threads:
+            t.join(1.0)
+        self._threads = []
+
+    def publish(self, name, frame, targets, detector=None):
+        """
+        检测线程调用：提交一帧和该帧的检测结果
+        detector: 本帧检测用的检测器，给出时取它的小球掩码和围栏掩码缩小后叠加（本帧没有检测时不给）
+        没有客户端或未到帧率间隔时直接返回；frame 只在本函数内使用，可以是复用的缓冲区
+        """
+        if not self._clients:
+            return
+        now = time.monotonic()
+        if now - self._last_publish.get(name, 0.0) < self.interval:
+            return
+        self._last_publish[name] = now
+        small = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        overlay = self._masks(detector, frame, small) if detector is not None else None
+        with self._cond:
+            self._pending[name] = (small, list(targets), overlay)
+            self._cond.notify_all()
+
+    def _masks(self, detector, frame, small):
+        """
+        在检测线程中取检测器的掩码（在它的缓冲区里，下次检测会被覆盖），缩小到 small 的尺寸复制出来
+        检测器降级时掩码是缩小画面上的，同样缩放到 small 的尺寸
+        返回 ([(颜色, 小球掩码), ...], 围栏轮廓列表)；围栏按检测器的最小面积筛选，与实际检测一致
+        """
+        size = (small.shape[1], small.shape[0])
+        balls = [(color, cv2.resize(detector.ball_mask(frame, color), size, interpolation=cv2.INTER_NEAREST))
+                 for color in self.mask_colors]
+        fence = cv2.resize(detector.fence_mask(frame)[0], size, interpolation=cv2.INTER_NEAREST)
+        contours, _ = cv2.findContours(fence, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        # filters() 是原始分辨率下的值，换算到显示画面
+        min_area = detector.filters()["zone_min_area"] * self.scale * self.scale
+        return balls, [c for c in contours if cv2.contourArea(c) >= min_area]
+
+    def set_packet(self, text):
+        """主循环调用：记录最近发送的数据包文本"""
+        self._packet = text
+
+    def _encode_loop(self):
+        while self._running:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or not self._running, timeout=1.0)
+                if not self._pending:
+                    continue
+                name, (small, targets, overlay) = self._pending.popitem()
+            image = self._draw(small, targets, overlay)
+            ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            if not ok:
+                continue
+            with self._cond:
+                seq = self._jpegs.get(name, (0, None))[0] + 1
+                self._jpegs[name] = (seq, jpeg.tobytes())
+                self._cond.notify_all()
+
+    def _draw(self, small, targets, overlay=None):
+        """
+        在缩小的帧上叠加掩码、围栏轮廓、检测结果和数据包
+        overlay: publish 取得的 (小球掩码, 围栏轮廓)，本帧没有检测时为 None，只画目标
+        """
+        image = small
+        if overlay is not None:
+            balls, fences = overlay
+            tinted = small.copy()
+            for color, mask in balls:
+                tinted[mask > 0] = MASK_COLORS.get(color, (255, 255, 255))
+            image = cv2.addWeighted(small, 0.6, tinted, 0.4, 0)
+            cv2.drawContours(image, fences, -1, FENCE_COLOR, 1)
+
+        for t in targets:
+            center = (int(t.x * self.scale), int(t.y * self.scale))
+            color = MASK_COLORS.get(t.color, (255, 255, 255))
+            if t.kind == "ball":
+                cv2.circle(image, center, max(2, int(t.radius * self.scale)), (0, 255, 0), 2)
+            else:
+                cv2.drawMarker(image, center, (0, 255, 0), cv2.MARKER_CROSS, 12, 2)
+            label = t.color if t.track_id is None else f"{t.color}#{t.track_id}"
+            cv2.putText(image, label, (center[0] + 4, center[1] - 4),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
+
+        cv2.putText(image, self._packet, (4, image.shape[0] - 6),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
+        return image
+
+    def _client_connected(self, delta):
+        with self._cond:
+            self._clients += delta
+
+    def _wait_jpeg(self, name, last_seq, timeout=2.0):
+        with self._cond:
+            self._cond.wait_for(
+                lambda: not self._running or self._jpegs.get(name, (0, None))[0] > last_seq, timeout)
+            return self._jpegs.get(name, (0, None))
+
+
+class _StreamHandler(BaseHTTPRequestHandler):
+    debug_stream = None
+    BOUNDARY = "frame"
+
+    def log_message(self, format, *args):
+        pass  # 不打印每个请求
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        stream = self.debug_stream
+        cam = parse_qs(url.query).get("cam", [None])[0] or (stream.cameras[0] if stream.cameras else "main")
+        if url.path in ("/", "/stream") and cam not in stream.cameras:
+            self.send_error(404, "unknown camera")
+            return
+        if url.path == "/":
+            links = " ".join(f'<a href="/?cam={quote(c)}">{html.escape(c)}</a>' for c in stream.cameras)
+            body = INDEX_HTML.format(links=links, cam_url=html.escape(quote(cam))).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif url.path == "/stream":
+            self._stream(stream, cam)
+        else:
+            self.send_error(404)
+
+    def _stream(self, stream, cam):
+        self.send_response(200)
+        self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={self.BOUNDARY}")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        stream._client_connected(1)
+        last_seq = 0
+        try:
+            while stream._running:
+                seq, jpeg = stream._wait_jpeg(cam, last_seq)
+                if jpeg is None or seq == last_seq:
+                    continue
+                last_seq = seq
+                self.wfile.write(f"--{self.BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                 f"Content-Length: {len(jpeg)}\r\n\r\n".encode("ascii"))
+                self.wfile.write(jpeg)
+                self.wfile.write(b"\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            stream._client_connected(-1)
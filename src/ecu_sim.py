@@ -0,0 +1,316 @@
+"""
+电控(ECU)仿真器
+创建一个伪终端(pty)代替 /dev/ttyS3，按脚本或随机发送指令("1"~"4"或空闲)，
+解析视觉端发回的数据包，统计包速率、格式错误包数量、指令响应延迟，
+并可选地回传 "ack:<序号>" 用于端到端延迟测试。
+
+用法:
+    # 只创建伪终端，供其他程序通过 UART.open_serial(端口) 连接
+    python src/ecu_sim.py --random --duration 60
+
+    # 同时在本进程内用 UART 模块以 2000 包/秒 的速率压测串口链路
+    python src/ecu_sim.py --random --load-rate 2000 --ack --duration 10
+
+    # 按脚本发送指令: "延时秒数:指令"，指令为空表示空闲
+    python src/ecu_sim.py --script "0.5:1,2.0:3,1.0:,1.0:2"
+"""
+
+import argparse
+import contextlib
+import os
+import pty
+import random
+import select
+import threading
+import time
+import tty
+from collections import deque
+
+import numpy as np
+
+import latency
+import UART
+
+COMMANDS = ["1", "2", "3", "4"]
+
+# 数据包必须以这三个字段开头，后面可以跟其他 "键:值" 字段（如 seq）
+REQUIRED_FIELDS = ("dx", "dy", "dis")
+
+
+def parse_packet(line):
+    """
+    解析一行数据包，如 "dx:10 dy:-5 dis:40 seq:12"
+    返回 {字段: 整数值}，格式错误返回 None
+    批量数据包最后的 t 字段解码为 fields["candidates"] = [(颜色, dx, dy, dis, 置信度), ...]
+    """
+    fields = {}
+    line, batch_sep, batch = line.partition(" t:")
+    if batch_sep:
+        try:
+            candidates = UART.decode_candidates(batch.rstrip("\r"))
+        except ValueError:
+            return None
+    tokens = line.split()
+    if len(tokens) < len(REQUIRED_FIELDS):
+        return None
+    for i, token in enumerate(tokens):
+        key, sep, value = token.partition(":")
+        if not sep:
+            return None
+        if i < len(REQUIRED_FIELDS) and key != REQUIRED_FIELDS[i]:
+            return None
+        try:
+            fields[key] = int(value)
+        except ValueError:
+            return None
+    if batch_sep:
+        if fields.get("n") != len(candidates):
+            return None
+        fields["candidates"] = candidates
+    return fields
+
+
+def parse_script(text):
+    """把 "0.5:1,2.0:3,1.0:" 解析成 [(延时, 指令或None), ...]"""
+    script = []
+    for item in text.split(","):
+        delay, _, cmd = item.strip().partition(":")
+        script.append((float(delay), cmd or None))
+    return script
+
+
+def random_script(count, min_interval=0.2, max_interval=2.0, idle_ratio=0.2, seed=None):
+    """生成随机指令序列，idle_ratio 为空闲(不发指令)的比例"""
+    rng = random.Random(seed)
+    script = []
+    for _ in range(count):
+        cmd = None if rng.random() < idle_ratio else rng.choice(COMMANDS)
+        script.append((rng.uniform(min_interval, max_interval), cmd))
+    return script
+
+
+class EcuSimulator:
+    """
+    在伪终端主端扮演电控
+    stats_window: 计算包间隔、指令响应 p50 时保留的最近样本数；最大值在整个运行期间累计，长时间运行内存不增长
+    """
+
+    def __init__(self, script=None, ack=False, stats_window=10000):
+        self.script = script or []
+        self.ack = ack
+        self.master_fd, self._slave_fd = pty.openpty()
+        # 原始模式，避免终端行规程回显或转换换行符
+        tty.setraw(self._slave_fd)
+        self.port_name = os.ttyname(self._slave_fd)
+
+        self._running = False
+        self._threads = []
+        self._lock = threading.Lock()
+        self.packets = 0
+        self.malformed = 0
+        self.commands_sent = 0
+        self.batch_packets = 0
+        self.candidates = 0
+        self.last_packet = None
+        self._intervals = deque(maxlen=stats_window)
+        self._response_latencies = deque(maxlen=stats_window)
+        self._interval_max = 0.0
+        self._response_max = 0.0
+        self._last_packet_time = None
+        self._pending_command_time = None
+        self._start_time = None
+
+    def start(self):
+        self._running = True
+        self._start_time = time.monotonic()
+        for target, name in ((self._read_loop, "ecu-rx"), (self._command_loop, "ecu-cmd")):
+            t = threading.Thread(target=target, name=name, daemon=True)
+            t.start()
+            self._threads.append(t)
+        print(f"电控仿真器已启动，伪终端: {self.port_name}")
+
+    def stop(self):
+        self._running = False
+        for t in self._threads:
+            t.join(1.0)
+        self._threads = []
+        os.close(self.master_fd)
+        os.close(self._slave_fd)
+
+    def send_command(self, cmd):
+        os.write(self.master_fd, cmd.encode("ascii"))
+        with self._lock:
+            self.commands_sent += 1
+            self._pending_command_time = time.monotonic()
+
+    def _command_loop(self):
+        for delay, cmd in self.script:
+            end = time.monotonic() + delay
+            while self._running and time.monotonic() < end:
+                time.sleep(min(0.05, max(0.0, end - time.monotonic())))
+            if not self._running:
+                return
+            if cmd is not None:
+                self.send_command(cmd)
+
+    def _read_loop(self):
+        buffer = b""
+        while self._running:
+            ready, _, _ = select.select([self.master_fd], [], [], 0.1)
+            if not ready:
+                continue
+            try:
+                chunk = os.read(self.master_fd, 65536)
+            except OSError:
+                return
+            now = time.monotonic()
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                self._handle_line(line, now)
+
+    def _handle_line(self, line, now):
+        if not line.strip():
+            # 视觉端写串口超时后会先补一个换行再发下一包，空行不算格式错误
+            return
+        try:
+            fields = parse_packet(line.decode("ascii"))
+        except UnicodeDecodeError:
+            fields = None
+        with self._lock:
+            if fields is None:
+                self.malformed += 1
+                return
+            self.packets += 1
+            self.last_packet = fields
+            if "candidates" in fields:
+                self.batch_packets += 1
+                self.candidates += len(fields["candidates"])
+            if self._last_packet_time is not None:
+                interval = now - self._last_packet_time
+                self._intervals.append(interval)
+                self._interval_max = max(self._interval_max, interval)
+            self._last_packet_time = now
+            if self._pending_command_time is not None:
+                response = now - self._pending_command_time
+                self._response_latencies.append(response)
+                self._response_max = max(self._response_max, response)
+                self._pending_command_time = None
+        if self.ack and "seq" in fields:
+            os.write(self.master_fd, f"ack:{fields['seq']}\n".encode("ascii"))
+
+    def stats(self):
+        with self._lock:
+            elapsed = time.monotonic() - self._start_time if self._start_time else 0.0
+            intervals = np.array(self._intervals) * 1000
+            responses = np.array(self._response_latencies) * 1000
+            return {
+                "elapsed": elapsed,
+                "packets": self.packets,
+                "malformed": self.malformed,
+                "commands": self.commands_sent,
+                "batch_packets": self.batch_packets,
+                "candidates_per_batch": self.candidates / self.batch_packets if self.batch_packets else None,
+                "rate": self.packets / elapsed if elapsed > 0 else 0.0,
+                "interval_p50_ms": float(np.percentile(intervals, 50)) if intervals.size else None,
+                "interval_max_ms": self._interval_max * 1000 if intervals.size else None,
+                "response_p50_ms": float(np.percentile(responses, 50)) if responses.size else None,
+                "response_max_ms": self._response_max * 1000 if responses.size else None,
+            }
+
+    def format_stats(self):
+        s = self.stats()
+
+        def ms(v):
+            return "-" if v is None else f"{v:.2f}"
+
+        return (f"用时 {s['elapsed']:.1f}s: 收到 {s['packets']} 包 ({s['rate']:.0f} 包/秒), "
+                f"格式错误 {s['malformed']} 包, 发出指令 {s['commands']} 条\n"
+                f"包间隔(ms): p50={ms(s['interval_p50_ms'])} max={ms(s['interval_max_ms'])}; "
+                f"指令响应(ms): p50={ms(s['response_p50_ms'])} max={ms(s['response_max_ms'])}"
+                + (f"\n批量数据包 {s['batch_packets']} 包, 平均每包 {s['candidates_per_batch']:.1f} 个候选目标"
+                   if s["batch_packets"] else ""))
+
+
+def run_load(port_name, rate, duration, ack, batch=0):
+    """在本进程内通过 UART 模块以指定速率发包，压测串口链路；batch>0 时发送带 batch 个候选目标的批量数据包"""
+    UART.open_serial(port_name)
+    UART.start_tx_thread()
+    tracker = latency.LatencyTracker()
+    if ack:
+        UART.enable_latency_trace(tracker)
+        UART.start_rx_thread()
+    counter = latency.FrameCounter()
+
+    period = 1.0 / rate
+    next_time = time.monotonic()
+    end = next_time + duration
+    # UART 模块每包都会打印，高速压测时屏蔽输出
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        i = _drive_load(UART, counter, period, next_time, end, batch)
+        # 等待最后的应答
+        time.sleep(0.2)
+        UART.read_ecu_command()
+        tx_stats = UART.get_tx_stats()
+        UART.close_serial()
+    print(f"视觉端共生成 {i} 包, 发送统计: {tx_stats}")
+    print(tracker.format_report())
+
+
+def _drive_load(uart, counter, period, next_time, end, batch=0):
+    """按固定周期调用 UART 发包，返回发出的包数"""
+    colors = list(uart.BATCH_COLOR_CODES)
+    i = 0
+    while time.monotonic() < end:
+        uart.read_ecu_command()
+        stamp = counter.stamp()
+        if i % 10 == 0:
+            uart.send_no_target(stamp)
+        elif batch:
+            uart.send_batch([(colors[(i + k) % len(colors)], i % 256 - 128, k * 10 - 50, i % 200 + k, 100 - k)
+                             for k in range(batch)], stamp)
+        else:
+            uart.send_data(i % 256 - 128, -(i % 256) + 127, i % 200, stamp)
+        i += 1
+        next_time += period
+        delay = next_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+    return i
+
+
+def main():
+    parser = argparse.ArgumentParser(description="电控串口仿真器")
+    parser.add_argument("--script", help='指令脚本，如 "0.5:1,2.0:3,1.0:"')
+    parser.add_argument("--random", action="store_true", help="随机发送指令")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--duration", type=float, default=10.0, help="运行时长(秒)")
+    parser.add_argument("--ack", action="store_true", help="对带 seq 的包回传 ack")
+    parser.add_argument("--load-rate", type=float, default=0,
+                        help="在本进程内以该速率(包/秒)驱动 UART 模块发包，0 表示不压测")
+    parser.add_argument("--batch", type=int, default=0, help="压测时每包带的候选目标数，0 表示普通数据包")
+    args = parser.parse_args()
+
+    if args.script:
+        script = parse_script(args.script)
+    elif args.random:
+        script = random_script(int(args.duration / 0.2) + 1, seed=args.seed)
+    else:
+        script = []
+
+    sim = EcuSimulator(script, ack=args.ack)
+    sim.start()
+    try:
+        if args.load_rate > 0:
+            run_load(sim.port_name, args.load_rate, args.duration, args.ack, args.batch)
+        else:
+            time.sleep(args.duration)
+    except KeyboardInterrupt:
+        print("\n用户中断")
+    finally:
+        print(sim.format_stats())
+        sim.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+电控指令状态机
+UART.read_ecu_command() 只在指令字节到达的那一次循环返回指令，之后返回 None。
+这里把指令锁存成工作模式，直到收到新指令或超时，每帧都按当前模式检测并给电控发坐标：
+
+    wait   第一次抓取完成前、没有指令：不找目标，发 0
+    ball   指令 1/2：找红/蓝球
+    zone   指令 3/4：找红/蓝安全区（第一次进入时完成 first_grab 切换）
+    multi  第一次抓取完成后、没有指令：按优先级找所有颜色的球
+
+ball/zone 超过 timeout 秒没有再收到指令时回到 wait 或 multi；同一条指令重复发送只刷新超时时间。
+所有状态切换记录时间和原因。update() 的时间可以由调用方传入，不依赖串口，方便单独测试。
+"""
+
+import time
+from collections import Counter, deque, namedtuple
+
+# 指令 -> (模式, 颜色)
+COMMAND_MODES = {
+    "1": ("ball", "red"),
+    "2": ("ball", "blue"),
+    "3": ("zone", "red"),
+    "4": ("zone", "blue"),
+}
+MODE_COMMANDS = {mode: cmd for cmd, mode in COMMAND_MODES.items()}
+
+# mode: 模式名；color: ball/zone 模式的颜色；since: 进入该模式的时间
+State = namedtuple("State", ["mode", "color", "since"])
+# 一次状态切换：time 为相对状态机创建的秒数，reason 为 "cmd:<指令>"、"timeout" 或 "first_grab"
+Transition = namedtuple("Transition", ["time", "old", "new", "reason"])
+
+
+def describe_state(state):
+    return f"{state.mode}({state.color})" if state.color else state.mode
+
+
+class EcuStateMachine:
+    """
+    timeout: ball/zone 模式没有新指令时保持的秒数，0 表示一直保持到收到新指令
+    history: 保留最近多少次状态切换
+    verbose: 状态切换时打印
+    """
+
+    def __init__(self, timeout=5.0, history=100, verbose=True, now=None):
+        self.timeout = timeout
+        self.verbose = verbose
+        now = time.monotonic() if now is None else now
+        self._start = now
+        self.first_grab = True
+        self.state = State("wait", None, now)
+        self._last_command = now
+        self.changed = False
+        self.transitions = deque(maxlen=history)
+        self.counts = Counter()
+        self.ignored = 0
+        self.timeouts = 0
+        self._mode_time = Counter()
+
+    @property
+    def cmd(self):
+        """当前模式对应的指令("1"~"4")，wait/multi 为 None，与 main.detect_targets 的 cmd 参数相同"""
+        return MODE_COMMANDS.get((self.state.mode, self.state.color))
+
+    def update(self, cmd, now=None):
+        """
+        每帧调用一次，cmd 为 UART.read_ecu_command() 的返回值（没有指令时为 None）
+        返回当前状态；本帧状态有变化时 changed 为 True
+        """
+        now = time.monotonic() if now is None else now
+        self.changed = False
+        if cmd in COMMAND_MODES:
+            self._last_command = now
+            mode, color = COMMAND_MODES[cmd]
+            if mode == "zone" and self.first_grab:
+                # 电控开始找安全区，说明第一次抓取已完成
+                self.first_grab = False
+                self._log(now, self.state, self.state, "first_grab")
+            if (mode, color) != (self.state.mode, self.state.color):
+                self._enter(State(mode, color, now), f"cmd:{cmd}")
+            return self.state
+
+        if cmd:
+            self.ignored += 1
+        if (self.state.mode in ("ball", "zone") and self.timeout
+                and now - self._last_command > self.timeout):
+            self.timeouts += 1
+            self._enter(State("wait" if self.first_grab else "multi", None, now), "timeout")
+        return self.state
+
+    def _enter(self, new, reason):
+        old = self.state
+        self._mode_time[old.mode] += new.since - old.since
+        self.state = new
+        self.changed = True
+        self.counts[new.mode] += 1
+        self._log(new.since, old, new, reason)
+
+    def _log(self, now, old, new, reason):
+        transition = Transition(round(now - self._start, 3), describe_state(old), describe_state(new), reason)
+        self.transitions.append(transition)
+        if self.verbose:
+            if reason == "first_grab":
+                print(f"[电控状态 {transition.time:.2f}s] 第一次抓取完成，之后无指令时多目标识别")
+            else:
+                print(f"[电控状态 {transition.time:.2f}s] {transition.old} -> {transition.new} ({reason})")
+
+    def stats(self, now=None):
+        """各模式累计时间(秒)、进入次数、超时次数和忽略的未知指令数"""
+        now = time.monotonic() if now is None else now
+        mode_time = Counter(self._mode_time)
+        mode_time[self.state.mode] += now - self.state.since
+        return {"mode": describe_state(self.state),
+                "mode_seconds": {mode: round(t, 1) for mode, t in mode_time.items()},
+                "entered": dict(self.counts), "timeouts": self.timeouts, "ignored": self.ignored}
@@ -0,0 +1,96 @@
+"""
+端到端延迟追踪
+每帧在采集时分配序号和采集时间戳(FrameStamp)，随检测结果一起传到 UART.send_data。
+数据包写入串口时记录 采集→发送 延迟；电控回传 "ack:<序号>" 时记录 采集→应答 延迟。
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+
+import numpy as np
+
+# seq: 帧序号; t_capture: 采集完成时刻(time.monotonic)
+FrameStamp = namedtuple("FrameStamp", ["seq", "t_capture"])
+
+
+class FrameCounter:
+    """为每帧生成递增序号和采集时间戳（多个采集线程可共用）"""
+
+    def __init__(self):
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def stamp(self):
+        with self._lock:
+            self._seq += 1
+            return FrameStamp(self._seq, time.monotonic())
+
+
+class LatencyTracker:
+    """统计 采集→发送 和 采集→应答 延迟分布（只保留最近 maxlen 个样本）"""
+
+    def __init__(self, maxlen=2000):
+        self._lock = threading.Lock()
+        # 已发送但尚未应答的帧: seq -> t_capture
+        self._in_flight = OrderedDict()
+        self._maxlen = maxlen
+        self.send_latencies = deque(maxlen=maxlen)
+        self.ack_latencies = deque(maxlen=maxlen)
+        self.unknown_acks = 0
+
+    def expect_ack(self, stamp):
+        """写串口前登记待应答的帧，避免接收线程先收到应答时当作未知序号"""
+        if stamp is None:
+            return
+        with self._lock:
+            self._in_flight[stamp.seq] = stamp.t_capture
+            while len(self._in_flight) > self._maxlen:
+                self._in_flight.popitem(last=False)
+
+    def record_send(self, stamp, t_send=None):
+        if stamp is None:
+            return
+        t_send = time.monotonic() if t_send is None else t_send
+        self.expect_ack(stamp)
+        with self._lock:
+            self.send_latencies.append(t_send - stamp.t_capture)
+
+    def record_ack(self, seq, t_ack=None):
+        t_ack = time.monotonic() if t_ack is None else t_ack
+        with self._lock:
+            t_capture = self._in_flight.pop(seq, None)
+            if t_capture is None:
+                self.unknown_acks += 1
+                return
+            self.ack_latencies.append(t_ack - t_capture)
+
+    @staticmethod
+    def _summary(samples):
+        if not samples:
+            return None
+        ms = np.array(samples) * 1000
+        return {
+            "count": len(ms),
+            "p50": float(np.percentile(ms, 50)),
+            "p90": float(np.percentile(ms, 90)),
+            "p99": float(np.percentile(ms, 99)),
+            "max": float(ms.max()),
+        }
+
+    def report(self):
+        with self._lock:
+            send = list(self.send_latencies)
+            ack = list(self.ack_latencies)
+        return {"capture_to_send": self._summary(send), "capture_to_ack": self._summary(ack)}
+
+    def format_report(self):
+        lines = []
+        for name, label in (("capture_to_send", "采集→发送"), ("capture_to_ack", "采集→应答")):
+            s = self.report()[name]
+            if s is None:
+                lines.append(f"{label}: 无数据")
+            else:
+                lines.append(f"{label}(ms): n={s['count']} p50={s['p50']:.1f} p90={s['p90']:.1f} "
+                             f"p99={s['p99']:.1f} max={s['max']:.1f}")
+        return "\n".join(lines)
@@ -1,108 +1,607 @@
-import cv2
 import json
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
 import UART
 import vision
+import latency
+import camera
+import motion
+import debug_stream
+import recorder
+import scheduler
+import tracker
+import pipeline
+import color_hist
+import presence
+import quality
+import ecu_state
+import metrics
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_PATH = os.path.join(ROOT_DIR, 'config', 'config.json')
+
+# config.json 缺少的项使用这些默认值
+DEFAULT_CONFIG = {
+    "serial": {"port": UART.DEFAULT_PORT, "baudrate": UART.DEFAULT_BAUDRATE},
+    "cameras": [
+        {"name": "main", "index": 9, "width": 640, "height": 480, "flip": 0,
+         "warmup_frames": 5, "priority": 0, "profile": "auto"},
+    ],
+    # 摄像头参数档案，摄像头配置中的 profile 按名称引用
+    "camera_profiles": {"auto": {}},
+    "colors": ["red", "blue", "yellow", "black", "purple"],
+    # hist_colors 中的颜色用直方图反向投影(color_hist.py)代替HSV阈值，min_prob 为置信度阈值
+    "color_engine": {"hist_colors": [], "min_prob": 0.5},
+    "motion_gate": {"enabled": True, "scale": 8, "tile": 32, "threshold": 8.0, "refresh_interval": 30},
+    "debug_stream": {"enabled": True, "host": "127.0.0.1", "port": 8080, "fps": 5, "scale": 0.5},
+    "recorder": {"enabled": True, "output_dir": "recordings", "seconds": 10, "fps": 10,
+                 "no_target_trigger": 0},
+    "scheduler": {"enabled": True, "period_ms": 66, "levels": scheduler.DEFAULT_LEVELS},
+    "tracker": {"enabled": True, "max_distance": 80, "min_hits": 2, "max_misses": 5},
+    # 检测流程，ball/zone 不写时使用 pipeline.DEFAULT_PIPELINES；未启用时直接用 vision 的固定流程
+    "pipelines": {"enabled": True},
+    "presence_filter": {"enabled": True, "step": 4, "min_pixels": 2},
+    # batch 大于 1 时一帧最多发送 batch 个候选小球（UART.send_batch），电控可一次规划抓取顺序
+    "packet": {"batch": 1},
+    # 电控指令锁存：ball/zone 模式超过 latch_timeout 秒没有新指令时回到等待/多目标识别，0 表示一直保持
+    "ecu": {"latch_timeout": 5.0},
+    # 本地监控指标 http://<host>:<port>/metrics（Prometheus 文本格式）
+    "metrics": {"enabled": True, "host": "127.0.0.1", "port": 9100},
+    # 帧质量门控：模糊或过曝的帧跳过检测或降级（距离不进入平滑），参数见 quality.QualityGate
+    "quality_gate": {"enabled": True, "size": [160, 120], "window": 60, "blur_skip": 0.35, "blur_downgrade": 0.6,
+                     "glare_skip": 0.4, "glare_downgrade": 0.15, "dark_downgrade": 25, "max_skips": 3},
+}
+
+# 多色识别模式下按此顺序查找小球
+MULTI_COLORS = ["red", "blue", "yellow", "black"]
+COLOR_NAMES = {"red": "红", "blue": "蓝", "yellow": "黄", "black": "黑"}
+
+# kind: "ball" 小球 / "zone" 安全区；dx/dy 为相对该摄像头画面中心的偏移
+# track_id: 启用跟踪时小球的跟踪编号，否则为 None；confidence: 跟踪置信度(0~100)，未启用跟踪时为 None
+Target = namedtuple("Target", ["kind", "color", "x", "y", "radius", "dx", "dy", "track_id", "confidence"],
+                    defaults=(None, None))
+
+LATENCY_REPORT_INTERVAL = 300  # 每隔多少帧打印一次延迟统计
+
+# 进程启动时刻，用于统计 启动→首包 时间
+_PROCESS_START = time.perf_counter()
+
+
+def load_config(path=CONFIG_PATH):
+    """读取 config.json，文件不存在时使用默认配置"""
+    config = {key: dict(value) if isinstance(value, dict) else value
+              for key, value in DEFAULT_CONFIG.items()}
+    if not os.path.exists(path):
+        print(f"警告: 未找到 {path}，使用默认配置")
+        return config
+    with open(path, 'r') as f:
+        user_config = json.load(f)
+    for key, value in user_config.items():
+        if isinstance(value, dict) and isinstance(config.get(key), dict):
+            config[key].update(value)
+        else:
+            config[key] = value
+    # 兼容旧的单摄像头配置 "camera": {...}
+    if "camera" in user_config and "cameras" not in user_config:
+        config["cameras"] = [dict(DEFAULT_CONFIG["cameras"][0], **user_config["camera"])]
+    return config
 
-with open('config/config.json', 'r') as f:
-    config = json.load(f)
 
-first_grab = True
+def load_color_models(config):
+    """预加载HSV阈值和形态学核，并为指定的颜色装上直方图模型"""
+    vision.preload_colors(config["colors"])
+    engine_cfg = config["color_engine"]
+    color_hist.install(engine_cfg["hist_colors"], engine_cfg["min_prob"])
 
-cap = cv2.VideoCapture(9)
-if not cap.isOpened():
-    print("摄像头打开失败")
-    exit(1)
 
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
 
-print(" 开始!!!!!!!!!!!!")
-print("等待电控指令.........................................")
 
-try:
-    while True:
-        cmd = UART.read_ecu_command()
-        print(f"收到指令: cmd={cmd}")
-        ret, frame = cap.read()
-        if not ret:
-            print("读取帧失败")
+def startup(config, counter):
+    """
+    并行初始化串口、所有摄像头（含预热）和颜色模型
+    打印各步骤耗时；任一步骤失败时打印原因并退出
+    返回 (摄像头列表, 启动耗时字典)
+    """
+    start = time.perf_counter()
+    serial_cfg = config["serial"]
+    profiles = config["camera_profiles"]
+    sources = []
+    for cam in config["cameras"]:
+        if not cam.get("enabled", True):
             continue
-        frame = cv2.flip(frame, 0)
-
-        target_found = False
-
-        if cmd == "1":
-            # 找红球
-            balls = vision.find_balls(frame, "red")
-            if balls:
-                x, y, r = max(balls, key=lambda b: b[2])
-                dx, dy = vision.calculate_offset(x, y)
-                raw_dist = vision.calculate_distance(r)
-                dist = vision.smooth_distance(raw_dist)
-                UART.send_data(dx, dy, dist)
-                target_found = True
-                print(f"找到红球: dx={dx}, dy={dy}, dist={dist}")
-
-        elif cmd == "2":
-            # 找蓝球
-            balls = vision.find_balls(frame, "blue")
-            if balls:
-                x, y, r = max(balls, key=lambda b: b[2])
-                dx, dy = vision.calculate_offset(x, y)
-                raw_dist = vision.calculate_distance(r)
-                dist = vision.smooth_distance(raw_dist)
-                UART.send_data(dx, dy, dist)
-                target_found = True
-                print(f"找到蓝球: dx={dx}, dy={dy}, dist={dist}")
-
-        elif cmd == "3":
-            centers = vision.find_safe_zones(frame, "red")
-            if centers:
-                x, y = centers[0]
-                dx, dy = vision.calculate_offset(x, y)
-                UART.send_data(dx, dy, 0)
-                target_found = True
-                print(f"找到红安全区: dx={dx}, dy={dy}")
-            if first_grab:
-                first_grab = False
-                print("第一次抓取完成，切换到多目标识别模式")
-        elif cmd == "4":
-            centers = vision.find_safe_zones(frame, "blue")
-            if centers:
-                x, y = centers[0]
-                dx, dy = vision.calculate_offset(x, y)
-                UART.send_data(dx, dy, 0)
-                target_found = True
-                print(f"找到蓝安全区: dx={dx}, dy={dy}")
-            if first_grab:
-                first_grab = False
-                print("第一次抓取完成，切换到多目标识别模式")
-
-        elif not first_grab:
-            # 多色球识别
-            colors_to_check = ["red", "blue", "yellow", "black"]
-            for color in colors_to_check:
-                if color in ["red", "blue"]:
-                    balls = vision.find_balls(frame, color)
+        profile_name = cam.get("profile")
+        if profile_name is not None and profile_name not in profiles:
+            print(f"启动失败 [摄像头[{cam['name']}]]: 参数档案 {profile_name} 不存在，"
+                  f"可用: {', '.join(profiles)}")
+            sys.exit(1)
+        sources.append(camera.CameraSource(
+            cam["name"], cam["index"], counter, cam["width"], cam["height"], cam.get("flip"),
+            cam.get("warmup_frames", 5), cam.get("priority", 0), profiles.get(profile_name),
+            cam.get("measure_frames", 20), cam.get("replay"), cam.get("replay_fps", 30.0),
+            cam.get("replay_frames")))
+    steps = {
+        "串口": (UART.open_serial, (serial_cfg["port"], serial_cfg["baudrate"])),
+        "颜色模型": (load_color_models, (config,)),
+    }
+    for source in sources:
+        steps[f"摄像头[{source.name}]"] = (source.open, ())
+
+    with ThreadPoolExecutor(max_workers=len(steps)) as executor:
+        futures = {name: executor.submit(_timed, func, *args) for name, (func, args) in steps.items()}
+
+    timings, errors = {}, {}
+    for name, future in futures.items():
+        try:
+            _, timings[name] = future.result()
+        except Exception as e:
+            errors[name] = e
+    timings["总计"] = time.perf_counter() - start
+
+    print("启动耗时: " + ", ".join(f"{name} {t * 1000:.0f}ms" for name, t in timings.items()))
+    if not sources:
+        errors["摄像头"] = RuntimeError("config.json 中没有启用的摄像头")
+    if errors:
+        for name, e in errors.items():
+            print(f"启动失败 [{name}]: {type(e).__name__}: {e}")
+        if "串口" in errors:
+            print(f"提示: 检查串口 {serial_cfg['port']} 是否存在以及当前用户是否有读写权限")
+        if "颜色模型" in errors:
+            print("提示: 检查 config/ 下的 hsv_thresholds_*.json 是否完整，"
+                  "color_engine.hist_colors 中的颜色是否已学习 hist_*.json")
+        for source in sources:
+            source.stop()
+        UART.close_serial()
+        sys.exit(1)
+
+    for source in sources:
+        for line in source.profile_report():
+            print(line)
+    return sources, timings
+
+
+def _balls(detector, frame, colors, limit=1):
+    """按 colors 顺序找球，同色按半径从大到小，最多返回 limit 个；找够了就不再检测后面的颜色"""
+    targets = []
+    for color in colors:
+        for x, y, r in sorted(detector.find_balls(frame, color), key=lambda b: -b[2]):
+            dx, dy = vision.calculate_offset(x, y, frame.shape[1], frame.shape[0])
+            targets.append(Target("ball", color, x, y, r, dx, dy))
+            if len(targets) >= limit:
+                return targets
+    return targets
+
+
+def _tracked_balls(detector, frame, colors, ball_tracker, limit=1, wanted=None):
+    """
+    检测 colors 中所有颜色的小球交给跟踪器，返回跟踪器选定的目标，其后是其他可见的已确认轨迹，最多 limit 个
+    wanted: 当前指令要找的全部颜色（colors 是调度器本帧轮转到的部分时传入）
+    """
+    detections = [(color, x, y, r) for color in colors for x, y, r in detector.find_balls(frame, color)]
+    committed = ball_tracker.update(detections, colors, wanted)
+    if committed is None:
+        return []
+    tracks = [committed] + [t for t in ball_tracker.visible(colors) if t is not committed][:limit - 1]
+    targets = []
+    for track in tracks:
+        dx, dy = vision.calculate_offset(track.x, track.y, frame.shape[1], frame.shape[0])
+        targets.append(Target("ball", track.color, track.x, track.y, track.r, dx, dy, track.id,
+                              ball_tracker.confidence(track)))
+    return targets
+
+
+def detect_targets(frame, cmd, first_grab, detector=vision, colors=MULTI_COLORS, ball_tracker=None,
+                   max_targets=1):
+    """
+    按电控指令检测一帧，返回目标列表（首选目标在前，找不到时为空）
+    1/2: 红/蓝球  3/4: 红/蓝安全区  无指令且已完成第一次抓取: 按 colors 顺序找球
+    detector: 提供 find_balls/find_safe_zones 的检测器，默认直接用 vision 模块
+    ball_tracker: 给出时小球目标由跟踪器选定（选定后一直跟到丢失或被抓取）
+    max_targets: 最多返回几个小球（批量发送时大于 1），安全区只返回一个
+    """
+    if cmd in ("1", "2"):
+        color = "red" if cmd == "1" else "blue"
+        if ball_tracker is not None:
+            return _tracked_balls(detector, frame, [color], ball_tracker, max_targets)
+        return _balls(detector, frame, [color], max_targets)
+
+    if cmd in ("3", "4"):
+        color = "red" if cmd == "3" else "blue"
+        centers = detector.find_safe_zones(frame, color)
+        if centers:
+            x, y = centers[0]
+            dx, dy = vision.calculate_offset(x, y, frame.shape[1], frame.shape[0])
+            return [Target("zone", color, x, y, 0, dx, dy)]
+        return []
+
+    if not first_grab:
+        # 多色球识别
+        if ball_tracker is not None:
+            return _tracked_balls(detector, frame, colors, ball_tracker, max_targets, MULTI_COLORS)
+        return _balls(detector, frame, colors, max_targets)
+    return []
+
+
+def make_detectors(config, sources, loop_scheduler=None):
+    """
+    为每个摄像头创建检测器：最内层是该摄像头自己的 vision.Detector（颜色配置、缓冲区、测距平滑互不影响），
+    启用检测流程时在它上面按配置的流程检测；
+    启用运动门控时外面包一层增量分割，启用存在性预筛时跳过画面中没有的颜色，启用调度器时再按质量等级降级；
+    启用帧质量门控时也包这一层，降级的帧按最低质量等级检测
+    """
+    gate_cfg = dict(config["motion_gate"])
+    gate_enabled = gate_cfg.pop("enabled", False)
+    presence_cfg = dict(config["presence_filter"])
+    presence_enabled = presence_cfg.pop("enabled", False)
+    pipeline_cfg = dict(config["pipelines"])
+    compiled = None
+    if pipeline_cfg.pop("enabled", False):
+        compiled = pipeline.compile_pipelines(pipeline_cfg)
+        print(compiled.summary())
+    if loop_scheduler is None and config["quality_gate"].get("enabled", False):
+        # 没有启用调度器时用一个不运行的调度器（一直是最高等级），只提供降级帧用的最低等级
+        loop_scheduler = scheduler.LoopScheduler(levels=config["scheduler"]["levels"])
+    detectors = {}
+    for source in sources:
+        # 复制启动时已加载到默认检测器的颜色配置和直方图模型
+        detector = vision.Detector(frame_size=(source.width, source.height), base=vision.default_detector())
+        if compiled is not None:
+            detector = pipeline.PipelineDetector(compiled, backend=detector)
+        if gate_enabled:
+            detector = motion.IncrementalSegmenter(motion.MotionGate(**gate_cfg), backend=detector)
+        if presence_enabled:
+            detector = presence.PresenceFilter(detector, **presence_cfg)
+        if loop_scheduler is not None:
+            detector = scheduler.QualityDetector(detector, loop_scheduler)
+        detectors[source.name] = detector
+    return detectors
+
+
+# 各层检测器的统计名称
+LAYER_NAMES = [
+    (presence.PresenceFilter, "存在性预筛"),
+    (motion.IncrementalSegmenter, "运动门控"),
+    (pipeline.PipelineDetector, "检测流程"),
+]
+
+
+def detector_layers(detector):
+    """从外到内依次返回 make_detectors 组装的各层检测器"""
+    while detector is not None and detector is not vision:
+        yield detector
+        detector = getattr(detector, "detector", None) or getattr(detector, "backend", None)
+
+
+def base_detector(detector):
+    """make_detectors 组装的最内层 vision.Detector（测距和距离平滑用），没有时为默认检测器"""
+    for layer in detector_layers(detector):
+        if isinstance(layer, vision.Detector):
+            return layer
+    return vision.default_detector()
+
+
+def print_detector_stats(name, detector, layer_types=None):
+    for layer in detector_layers(detector):
+        for cls, label in LAYER_NAMES:
+            if isinstance(layer, cls) and (layer_types is None or cls in layer_types):
+                print(f"{label}[{name}]: {layer.stats()}")
+
+
+def make_trackers(config, sources):
+    """为每个摄像头创建小球跟踪器；未启用时返回 None"""
+    tracker_cfg = dict(config["tracker"])
+    if not tracker_cfg.pop("enabled", False):
+        return None
+    return {source.name: tracker.BallTracker(**tracker_cfg) for source in sources}
+
+
+def release_grabbed(ecu, trackers):
+    """电控本帧刚进入安全区模式，说明已抓到当前目标：各摄像头的跟踪器放弃它，之后也不再选它"""
+    if ecu.changed and ecu.state.mode == "zone":
+        for ball_tracker in (trackers or {}).values():
+            ball_tracker.mark_grabbed()
+
+
+def make_gates(config, sources):
+    """为每个摄像头创建帧质量门控；未启用时返回 None"""
+    gate_cfg = dict(config["quality_gate"])
+    if not gate_cfg.pop("enabled", False):
+        return None
+    return {source.name: quality.QualityGate(**gate_cfg) for source in sources}
+
+
+def make_scheduler(config):
+    sched_cfg = dict(config["scheduler"])
+    if not sched_cfg.pop("enabled", False):
+        return None
+    period = sched_cfg.pop("period_ms") / 1000.0
+    return scheduler.LoopScheduler(period, **sched_cfg)
+
+
+def select_target(results):
+    """合并各摄像头的结果：按摄像头优先级取第一个有目标的摄像头，返回 (目标, 摄像头序号, 帧时间戳)"""
+    for i, result in enumerate(results):
+        if result.targets:
+            return result.targets[0], i, result.stamp
+    return None, None, None
+
+
+def label_entry(targets, source, stamp):
+    """把检测结果转换成 dataset 标注格式，供黑匣子录像保存"""
+    entry = {"balls": [], "safe_zones": [], "camera": source.name, "seq": stamp.seq}
+    for t in targets:
+        if t.kind == "ball":
+            entry["balls"].append({"color": t.color, "x": t.x, "y": t.y, "r": t.radius})
+        else:
+            entry["safe_zones"].append({"color": t.color, "x": t.x, "y": t.y})
+    return entry
+
+
+def register_collectors(registry, sources, ecu, latency_tracker, loop_scheduler=None, gates=None):
+    """把各模块已有的统计注册为监控指标（只在抓取时读取）"""
+    prefix = metrics.PREFIX
+
+    def collect(out):
+        for source in sources:
+            out.counter(prefix + "capture_frames_total", source.frames, "采集到的帧数", camera=source.name)
+            out.counter(prefix + "capture_dropped_total", source.dropped, "未被检测就被新帧覆盖的帧数",
+                        camera=source.name)
+            out.counter(prefix + "capture_read_failures_total", source.read_failures, "读帧失败次数",
+                        camera=source.name)
+        tx = UART.get_tx_stats() or {}
+        for key in ("sent", "dropped", "blocked"):
+            out.counter(prefix + f"packets_{key}_total", tx.get(key), f"串口异步发送 {key} 的数据包数")
+        out.gauge(prefix + "ecu_mode", 1, "电控状态机当前模式", mode=ecu.state.mode, color=ecu.state.color or "")
+        out.counter(prefix + "ecu_timeouts_total", ecu.timeouts, "指令锁存超时次数")
+        for path, summary in latency_tracker.report().items():
+            for q in metrics.QUANTILES:
+                key = f"p{q * 100:g}"
+                out.gauge(prefix + "latency_ms", summary[key] if summary else None, "端到端延迟分位数(ms)",
+                          path=path, quantile=q)
+        if loop_scheduler is not None:
+            sched = loop_scheduler.stats()
+            out.gauge(prefix + "quality_level", sched["level"], "调度器当前质量等级(0 最高)")
+            out.counter(prefix + "deadline_misses_total", sched["misses"], "超过循环周期的帧数")
+        for name, gate in (gates or {}).items():
+            for decision in (quality.RUN, quality.DOWNGRADE, quality.SKIP):
+                out.counter(prefix + "frame_quality_total", gate.decisions[decision], "帧质量门控的判定次数",
+                            camera=name, decision=decision)
+
+    registry.add_collector(collect)
+
+
+def batch_candidates(targets, dist, estimate=vision.calculate_distance):
+    """
+    批量数据包的候选目标 [(颜色, dx, dy, dis, 置信度), ...]
+    首选目标用平滑后的距离 dist，其余用 estimate(半径) 估算；未启用跟踪时置信度为 100
+    """
+    candidates = []
+    for i, t in enumerate(targets):
+        dis = dist if i == 0 else estimate(t.radius)
+        candidates.append((t.color, t.dx, t.dy, dis, 100 if t.confidence is None else t.confidence))
+    return candidates
+
+
+def describe(target, dist):
+    name = COLOR_NAMES.get(target.color, target.color)
+    if target.kind == "zone":
+        return f"找到{name}安全区: dx={target.dx}, dy={target.dy}"
+    track = f" #{target.track_id}" if target.track_id is not None else ""
+    return f"找到{name}球{track}: dx={target.dx}, dy={target.dy}, dist={dist}"
+
+
+def main(config=None, stop=None):
+    """
+    config: 配置字典，默认读取 config.json；stop: threading.Event，设置后主循环退出（soak.py 用）
+    """
+    if config is None:
+        config = load_config()
+    ecu = ecu_state.EcuStateMachine(config["ecu"]["latch_timeout"])
+
+    # 各摄像头共用帧序号，保证数据包中的 seq 唯一
+    frame_counter = latency.FrameCounter()
+    sources, _ = startup(config, frame_counter)
+    manager = camera.CaptureManager(sources)
+    manager.start()
+    multi_camera = len(sources) > 1
+    # 固定周期调度，超时过多时降低检测质量
+    loop_scheduler = make_scheduler(config)
+    detectors = make_detectors(config, sources, loop_scheduler)
+    # 各摄像头负责测距和距离平滑的检测器
+    rangers = {name: base_detector(detector) for name, detector in detectors.items()}
+    trackers = make_trackers(config, sources)
+    # 帧质量门控：每个摄像头本帧的判定，以及跳过检测时沿用的上一帧目标 (指令, 目标列表, 已沿用的帧数)
+    gates = make_gates(config, sources)
+    frame_quality = {}
+    held_targets = {}
+    batch = config["packet"]["batch"]
+
+    # 调试视频流：只有浏览器连接时才缩放和编码
+    stream = None
+    stream_cfg = dict(config["debug_stream"])
+    if stream_cfg.pop("enabled", False):
+        stream = debug_stream.DebugStream([s.name for s in sources], **stream_cfg)
+        try:
+            stream.start()
+        except OSError as e:
+            print(f"警告: 调试视频流启动失败: {e}")
+            stream = None
+
+    # 黑匣子录像：内存中保留最近几秒画面，出问题时写盘
+    black_box = None
+    recorder_cfg = dict(config["recorder"])
+    if recorder_cfg.pop("enabled", False):
+        recorder_cfg["output_dir"] = os.path.join(ROOT_DIR, recorder_cfg["output_dir"])
+        black_box = recorder.BlackBoxRecorder(cameras=len(sources), **recorder_cfg)
+        black_box.start()
+
+    def detect(frame, source, stamp):
+        detector = detectors[source.name]
+        # 驱动可能没有采用配置的分辨率，按实际画面尺寸计算偏移和换算焦距
+        rangers[source.name].frame_size = (frame.shape[1], frame.shape[0])
+        decision = gates[source.name].check(frame) if gates else quality.RUN
+        frame_quality[source.name] = decision
+        if decision == quality.SKIP:
+            # 画面模糊或过曝，不检测，沿用上一帧的目标（电控模式变了则没有目标）；发送时标记为过时
+            held_cmd, targets, stale = held_targets.get(source.name, (None, [], 0))
+            if held_cmd != ecu.cmd:
+                targets = []
+            held_targets[source.name] = (held_cmd, targets, stale + 1)
+        else:
+            colors = MULTI_COLORS
+            ball_tracker = trackers[source.name] if trackers else None
+            if isinstance(detector, scheduler.QualityDetector):
+                # 降级的帧按最低质量等级检测，减少计算量
+                detector.new_frame(degraded=decision == quality.DOWNGRADE)
+                committed = ball_tracker.committed if ball_tracker is not None else None
+                colors = detector.ball_colors(MULTI_COLORS, committed.color if committed is not None else None)
+            elif hasattr(detector, "new_frame"):
+                detector.new_frame()
+            targets = detect_targets(frame, ecu.cmd, ecu.first_grab, detector, colors, ball_tracker, batch)
+            held_targets[source.name] = (ecu.cmd, targets, 0)
+            if registry is not None:
+                registry.record_targets(targets)
+        if stream is not None:
+            # 跳过检测的帧没有本帧的掩码，只画沿用的目标
+            stream.publish(source.name, frame, targets, detector if decision != quality.SKIP else None)
+        if black_box is not None:
+            black_box.record(frame, label_entry(targets, source, stamp))
+        return targets
+
+    # 串口异步发送，避免电控不读数据时卡住视觉循环
+    UART.start_tx_thread()
+
+    # 端到端延迟追踪：每帧带序号和采集时间戳，随数据包发给电控
+    latency_tracker = latency.LatencyTracker()
+    UART.enable_latency_trace(latency_tracker)
+    # 接收线程：电控应答按到达时间计时，不受主循环周期影响
+    UART.start_rx_thread()
+    frames_done = 0
+
+    # 本地监控指标：主循环只记录计数和耗时样本，统计在抓取时才计算
+    registry = None
+    metrics_server = None
+    metrics_cfg = dict(config["metrics"])
+    if metrics_cfg.pop("enabled", False):
+        registry = metrics.Metrics()
+        register_collectors(registry, sources, ecu, latency_tracker, loop_scheduler, gates)
+        metrics_server = metrics.MetricsServer(registry, **metrics_cfg)
+        try:
+            metrics_server.start()
+        except OSError as e:
+            print(f"警告: 监控指标服务启动失败: {e}")
+            metrics_server = None
+
+    print(" 开始!!!!!!!!!!!!")
+    print("等待电控指令.........................................")
+
+    try:
+        while stop is None or not stop.is_set():
+            if loop_scheduler is not None:
+                loop_scheduler.begin()
+            t_loop = time.perf_counter()
+            cmd = UART.read_ecu_command()
+            print(f"收到指令: cmd={cmd}")
+            # 指令锁存为工作模式，之后每帧按该模式检测，直到新指令或超时
+            ecu.update(cmd)
+            release_grabbed(ecu, trackers)
+            t_detect = time.perf_counter()
+            results = manager.detect(detect)
+            t_send = time.perf_counter()
+            stamps = [r.stamp for r in results if r.stamp is not None]
+            if not stamps:
+                print("读取帧失败")
+                if loop_scheduler is not None:
+                    loop_scheduler.end()
+                continue
+
+            target, cam_index, stamp = select_target(results)
+            if target:
+                dist = 0
+                # 测距和平滑用目标所在摄像头的检测器（按该摄像头分辨率换算焦距，各摄像头的平滑历史分开）
+                cam_name = results[cam_index].source.name
+                ranger = rangers[cam_name]
+                if target.kind == "ball":
+                    if frame_quality.get(cam_name, quality.RUN) == quality.RUN:
+                        dist = ranger.smooth_distance(ranger.calculate_distance(target.radius))
+                    else:
+                        # 模糊/过曝帧的半径不可靠，不进入平滑，沿用之前平滑好的距离
+                        dist = ranger.current_distance()
+                        if dist is None:
+                            dist = ranger.calculate_distance(target.radius)
+                # 多摄像头时追加 cam 字段，告诉电控坐标来自哪个摄像头；启用跟踪时追加 id 字段
+                fields = {"cam": cam_index} if multi_camera else {}
+                if target.track_id is not None:
+                    fields["id"] = target.track_id
+                if frame_quality.get(cam_name, quality.RUN) == quality.SKIP:
+                    # 本帧没有检测，坐标是 stale 帧之前的，电控可以按需要降低权重
+                    fields["stale"] = held_targets[cam_name][2]
+                if batch > 1 and target.kind == "ball":
+                    candidates = batch_candidates(results[cam_index].targets, dist, ranger.calculate_distance)
+                    packet = UART.send_batch(candidates, stamp, **fields)
                 else:
-                    balls = vision.find_balls(frame, color)
-                if balls:
-                    x, y, r = max(balls, key=lambda b: b[2])
-                    dx, dy = vision.calculate_offset(x, y)
-                    raw_dist = vision.calculate_distance(r)
-                    dist = vision.smooth_distance(raw_dist)
-                    UART.send_data(dx, dy, dist)
-                    target_found = True
-                    print(f"识别到{color}色小球: dx={dx}, dy={dy}, dist={dist}")
-                    break
-
-        if not target_found:
-            UART.send_no_target()
-            print("未找到目标")
-
-except KeyboardInterrupt:
-    print("\n用户中断")
-finally:
-    cap.release()
-    UART.close_serial()
-    print("程序结束")
\ No newline at end of file
+                    packet = UART.send_data(target.dx, target.dy, dist, stamp, **fields)
+                print(describe(target, dist) + (f" [{results[cam_index].source.name}]" if multi_camera else ""))
+            else:
+                packet = UART.send_no_target(stamps[0])
+                print("未找到目标")
+            if stream is not None:
+                stream.set_packet(packet)
+            if black_box is not None:
+                black_box.note_result(target is not None)
+            if registry is not None:
+                t_end = time.perf_counter()
+                registry.observe("command", t_detect - t_loop)
+                registry.observe("detect", t_send - t_detect)
+                registry.observe("send", t_end - t_send)
+                registry.observe("loop", t_end - t_loop)
+                registry.frame_done()
+
+            frames_done += 1
+            if frames_done == 1:
+                print(f"启动到首包: {(time.perf_counter() - _PROCESS_START) * 1000:.0f}ms")
+            if frames_done % LATENCY_REPORT_INTERVAL == 0:
+                print(latency_tracker.format_report())
+                print(f"电控状态: {ecu.stats()}")
+                if loop_scheduler is not None:
+                    print(f"调度统计: {loop_scheduler.stats()}")
+                for name, detector in detectors.items():
+                    print_detector_stats(name, detector, (presence.PresenceFilter,))
+                for name, gate in (gates or {}).items():
+                    print(f"帧质量[{name}]: {gate.stats()}")
+            if loop_scheduler is not None:
+                loop_scheduler.end()
+
+    except KeyboardInterrupt:
+        print("\n用户中断")
+    finally:
+        manager.stop()
+        if stream is not None:
+            stream.stop()
+        if black_box is not None:
+            black_box.stop()
+        if metrics_server is not None:
+            metrics_server.stop()
+        UART.close_serial()
+        print(latency_tracker.format_report())
+        print(f"电控状态: {ecu.stats()}")
+        if loop_scheduler is not None:
+            print(f"调度统计: {loop_scheduler.stats()}")
+        for name, detector in detectors.items():
+            print_detector_stats(name, detector)
+        for name, ball_tracker in (trackers or {}).items():
+            print(f"跟踪[{name}]: {ball_tracker.stats()}")
+        for name, gate in (gates or {}).items():
+            print(f"帧质量[{name}]: {gate.stats()}")
+        print("程序结束")
+
+
+if __name__ == "__main__":
+    main()
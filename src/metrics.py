@@ -0,0 +1,215 @@
+"""
+本地监控指标（Prometheus 文本格式）
+在视觉进程内开一个 HTTP 服务，`curl http://127.0.0.1:9100/metrics` 或由 Prometheus 抓取，
+查看循环帧率、各阶段耗时分位数、采集丢帧、串口发包/丢包、电控当前模式、各颜色检测数、CPU和内存占用。
+
+主循环每帧只做几次计数和追加样本（deque），分位数计算、读取各模块统计、读 /proc 和格式化
+都在有人请求 /metrics 时才做；没有人抓取时几乎没有开销。
+"""
+
+import os
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+PREFIX = "rescue_"
+QUANTILES = (0.5, 0.9, 0.99)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class Exposition:
+    """按指标名分组输出 Prometheus 文本格式，同名指标的 HELP/TYPE 只写一次"""
+
+    def __init__(self):
+        self._families = {}
+
+    def add(self, name, kind, help_text, value, labels=None, suffix=""):
+        """kind: gauge/counter/summary；suffix 用于 summary 的 _sum/_count"""
+        family = self._families.setdefault(name, (kind, help_text, []))
+        if value is None:
+            return
+        text = str(value) if isinstance(value, int) else repr(float(value))
+        family[2].append(f"{name}{suffix}{_format_labels(labels)} {text}")
+
+    def gauge(self, name, value, help_text, **labels):
+        self.add(name, "gauge", help_text, value, labels)
+
+    def counter(self, name, value, help_text, **labels):
+        self.add(name, "counter", help_text, value, labels)
+
+    def summary(self, name, samples, total, count, help_text, **labels):
+        """samples: 最近的样本（算分位数）；total/count: 累计总和与次数"""
+        if len(samples):
+            values = np.percentile(np.asarray(samples), [q * 100 for q in QUANTILES])
+            for q, v in zip(QUANTILES, values):
+                self.add(name, "summary", help_text, v, dict(labels, quantile=q))
+        self.add(name, "summary", help_text, total, labels, "_sum")
+        self.add(name, "summary", help_text, count, labels, "_count")
+
+    def text(self):
+        lines = []
+        for name, (kind, help_text, samples) in self._families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+def rss_bytes():
+    """当前常驻内存(字节)，读 /proc/self/statm，不可用时返回 None"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Metrics:
+    """
+    指标登记表，主循环和检测线程记录，HTTP 线程读取
+    window: 各阶段耗时保留最近多少个样本用于计算分位数；fps_window: 计算循环帧率的时间窗口(秒)
+    """
+
+    def __init__(self, window=1000, fps_window=5.0):
+        self.fps_window = fps_window
+        self._lock = threading.Lock()
+        self._frame_times = deque(maxlen=window)
+        self.frames = 0
+        self._stages = {}
+        self._detections = Counter()
+        self._collectors = []
+        self._start = time.monotonic()
+        self._last_cpu = None
+
+    def frame_done(self, now=None):
+        """主循环每完成一帧调用一次"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.frames += 1
+            self._frame_times.append(now)
+
+    def observe(self, stage, seconds):
+        """记录一个阶段的耗时"""
+        with self._lock:
+            stage_stats = self._stages.get(stage)
+            if stage_stats is None:
+                stage_stats = self._stages[stage] = [deque(maxlen=self._frame_times.maxlen), 0.0, 0]
+            stage_stats[0].append(seconds)
+            stage_stats[1] += seconds
+            stage_stats[2] += 1
+
+    def record_targets(self, targets):
+        """记录一帧的检测结果（main.Target 列表），按类型和颜色计数"""
+        if not targets:
+            return
+        with self._lock:
+            for t in targets:
+                self._detections[(t.kind, t.color)] += 1
+
+    def add_collector(self, collect):
+        """collect(exposition) 在每次抓取时调用，用于读取其他模块已有的统计"""
+        self._collectors.append(collect)
+
+    def loop_fps(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            recent = [t for t in self._frame_times if now - t <= self.fps_window]
+        if len(recent) < 2:
+            return 0.0
+        return (len(recent) - 1) / (recent[-1] - recent[0]) if recent[-1] > recent[0] else 0.0
+
+    def render(self):
+        """生成 Prometheus 文本格式（在抓取线程中调用）"""
+        out = Exposition()
+        now = time.monotonic()
+        out.gauge(PREFIX + "loop_fps", self.loop_fps(now), f"最近 {self.fps_window:.0f} 秒的主循环帧率")
+        with self._lock:
+            frames = self.frames
+            stages = {name: (list(s[0]), s[1], s[2]) for name, s in self._stages.items()}
+            detections = dict(self._detections)
+        out.counter(PREFIX + "frames_total", frames, "主循环处理的帧数")
+        for name, (samples, total, count) in stages.items():
+            out.summary(PREFIX + "stage_seconds", samples, total, count, "各阶段耗时(秒)", stage=name)
+        for (kind, color), n in sorted(detections.items()):
+            out.counter(PREFIX + "detections_total", n, "检测到的目标数", kind=kind, color=color)
+
+        for collect in self._collectors:
+            collect(out)
+        self._process_metrics(out, now)
+        return out.text()
+
+    def _process_metrics(self, out, now):
+        times = os.times()
+        cpu = times.user + times.system
+        out.counter("process_cpu_seconds_total", cpu, "进程累计CPU时间(秒)")
+        last = self._last_cpu or (self._start, 0.0)
+        if now > last[0]:
+            out.gauge(PREFIX + "cpu_percent", (cpu - last[1]) / (now - last[0]) * 100,
+                      "距上次抓取(首次为进程启动)的平均CPU占用(%，多核可超过100)")
+        self._last_cpu = (now, cpu)
+        out.gauge("process_resident_memory_bytes", rss_bytes(), "常驻内存(字节)")
+
+
+class MetricsServer:
+    """在 host:port 上提供 /metrics"""
+
+    def __init__(self, metrics, host="127.0.0.1", port=9100):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+        self.scrapes = 0
+
+    def start(self):
+        server = self
+
+        class Handler(_MetricsHandler):
+            metrics_server = server
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+        print(f"监控指标: http://{self.host}:{self.port}/metrics")
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+        if self._thread:
+            self._thread.join(1.0)
+            self._thread = None
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    metrics_server = None
+
+    def log_message(self, format, *args):
+        pass  # 不打印每个请求
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        server = self.metrics_server
+        server.scrapes += 1
+        body = server.metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
@@ -0,0 +1,209 @@
+"""
+运动门控的增量分割
+机器人静止（等待电控指令、对准夹爪）时相邻帧几乎一样。
+MotionGate 在下采样的灰度图上做帧差，找出发生变化的图块；
+IncrementalSegmenter 只重新分割变化的图块，画面没有变化时直接复用上次的检测结果。
+"""
+
+import cv2
+import numpy as np
+
+import vision
+
+# 变化图块向周围 8 个图块扩展
+NEIGHBOURS = np.ones((3, 3), np.uint8)
+
+
+class MotionGate:
+    """
+    下采样帧差，按图块判断画面是否变化
+    每个检测项(key)各自记录上次分割时的参考图，检测项之间互不影响
+    scale: 下采样倍数; tile: 图块边长(原始分辨率像素)
+    threshold: 灰度差阈值，图块内任一下采样像素的差值超过它就算变化（小球只移动几个像素时，
+               整块的平均差值很小，按平均值判断会漏掉）
+    refresh_interval: 每隔多少次强制整帧刷新一次，防止缓慢变化累积
+    """
+
+    def __init__(self, scale=8, tile=32, threshold=8.0, refresh_interval=30):
+        self.scale = scale
+        self.tile = tile
+        self.threshold = threshold
+        self.refresh_interval = refresh_interval
+        self._small = None
+        self._gray = None
+        self._moved = None
+        self._refs = {}
+        self._ages = {}
+
+    def prepare(self, frame):
+        """每帧调用一次：计算下采样灰度图"""
+        h, w = frame.shape[:2]
+        size = (max(1, w // self.scale), max(1, h // self.scale))
+        self._small = cv2.resize(frame, size, dst=self._small, interpolation=cv2.INTER_AREA)
+        self._gray = cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        self.frame_shape = (h, w)
+
+    def grid_shape(self):
+        h, w = self.frame_shape
+        return (h + self.tile - 1) // self.tile, (w + self.tile - 1) // self.tile
+
+    def changed_tiles(self, key):
+        """返回该检测项变化图块的布尔网格（行, 列）"""
+        rows, cols = self.grid_shape()
+        ref = self._refs.get(key)
+        age = self._ages.get(key, 0)
+        if ref is None or ref.shape != self._gray.shape or age >= self.refresh_interval:
+            return np.ones((rows, cols), bool)
+        diff = cv2.absdiff(self._gray, ref)
+        # 先逐像素阈值化，再缩放到图块网格：INTER_AREA 得到每个图块中超过阈值的像素比例，大于 0 即有像素变化
+        moved = cv2.threshold(diff, self.threshold, 255, cv2.THRESH_BINARY, dst=diff)[1]
+        self._moved = cv2.resize(moved, (cols, rows), dst=self._moved, interpolation=cv2.INTER_AREA)
+        # 相邻图块也算变化：下采样会冲淡压在图块边上的细小变化（如小球边缘），
+        # 相邻图块的掩码在形态学边距内也受变化图块影响
+        return cv2.dilate(self._moved, NEIGHBOURS) > 0
+
+    def commit(self, key, changed):
+        """检测项每次检测后调用：把变化图块的参考图更新为当前帧，并累计距上次整帧刷新的次数"""
+        ref = self._refs.get(key)
+        if ref is None or ref.shape != self._gray.shape or changed.all():
+            self._refs[key] = self._gray.copy()
+            self._ages[key] = 0 if changed.all() else self._ages.get(key, 0) + 1
+            return
+        self._ages[key] = self._ages.get(key, 0) + 1
+        step = self.tile / self.scale
+        for r, c in zip(*np.nonzero(changed)):
+            y0, y1 = int(r * step), int((r + 1) * step)
+            x0, x1 = int(c * step), int((c + 1) * step)
+            ref[y0:y1, x0:x1] = self._gray[y0:y1, x0:x1]
+
+    def reset(self):
+        self._refs.clear()
+        self._ages.clear()
+
+
+class IncrementalSegmenter:
+    """
+    与 vision.find_balls / find_safe_zones 接口相同的增量检测器
+    小球：保存每种颜色的完整掩码，只重新分割变化的图块（向外扩展形态学所需的边距），
+    有变化时在完整掩码上重新找轮廓，没有变化时直接复用上次结果。
+    安全区：围栏内部检测依赖整块ROI，有变化时整帧重新检测，没有变化时复用。
+    full_ratio: 变化图块比例超过该值时直接整帧分割
+    backend: 实际做分割的检测器，默认 vision 模块，也可以是 pipeline.PipelineDetector
+    """
+
+    def __init__(self, gate=None, full_ratio=0.5, backend=vision):
+        self.gate = gate or MotionGate()
+        self.full_ratio = full_ratio
+        self.backend = backend
+        self._prepared = False
+        self._masks = {}
+        self._results = {}
+        self.calls = 0
+        self.reused = 0
+        self.tiles_total = 0
+        self.tiles_segmented = 0
+
+    def new_frame(self):
+        """每帧开始时调用；同一帧检测多种颜色时只计算一次下采样图"""
+        self._prepared = False
+        if hasattr(self.backend, "new_frame"):
+            self.backend.new_frame()
+
+    def filters(self):
+        return self.backend.filters()
+
+    def create_color_mask(self, hsv, color_name, dst=None, scratch=None):
+        return self.backend.create_color_mask(hsv, color_name, dst=dst, scratch=scratch)
+
+    def ball_mask(self, frame, color_name):
+        return self.backend.ball_mask(frame, color_name)
+
+    def fence_mask(self, frame):
+        return self.backend.fence_mask(frame)
+
+    def _prepare(self, frame):
+        if not self._prepared:
+            self.gate.prepare(frame)
+            self._prepared = True
+
+    def _changed(self, key):
+        changed = self.gate.changed_tiles(key)
+        self.calls += 1
+        self.tiles_total += changed.size
+        return changed
+
+    def find_balls(self, frame, color_name, min_area=None, min_circularity=None, min_radius=None, kernel_size=3):
+        """筛选参数为 None 时使用 backend 的默认值"""
+        self._prepare(frame)
+        key = ("ball", color_name, kernel_size)
+        result_key = key + (min_area, min_circularity, min_radius)
+        changed = self._changed(key)
+        count = int(changed.sum())
+        if count == 0 and result_key in self._results:
+            self.reused += 1
+            self.gate.commit(key, changed)
+            return list(self._results[result_key])
+
+        h, w = frame.shape[:2]
+        mask = self._masks.get(key)
+        if mask is None or mask.shape != (h, w) or count > self.full_ratio * changed.size:
+            if mask is None or mask.shape != (h, w):
+                mask = self._masks[key] = np.empty((h, w), np.uint8)
+            np.copyto(mask, self.backend.ball_mask(frame, color_name, kernel_size))
+            changed[:] = True
+            self.tiles_segmented += changed.size
+        else:
+            self._segment_tiles(frame, color_name, kernel_size, mask, changed)
+            self.tiles_segmented += count
+        self.gate.commit(key, changed)
+
+        filters = {"min_area": min_area, "min_circularity": min_circularity, "min_radius": min_radius}
+        balls = self.backend.balls_from_mask(mask, **{k: v for k, v in filters.items() if v is not None})
+        self._results[result_key] = balls
+        return list(balls)
+
+    def _segment_tiles(self, frame, color_name, kernel_size, mask, changed):
+        """只重新分割变化的图块；同一行相邻的变化图块合并成一段处理"""
+        h, w = frame.shape[:2]
+        tile = self.gate.tile
+        # 开运算+闭运算的影响范围，图块向外扩展这么多再计算，只写回图块本身
+        margin = self.backend.mask_margin(kernel_size)
+        for r in range(changed.shape[0]):
+            c = 0
+            while c < changed.shape[1]:
+                if not changed[r, c]:
+                    c += 1
+                    continue
+                start = c
+                while c < changed.shape[1] and changed[r, c]:
+                    c += 1
+                y0, y1 = r * tile, min(h, (r + 1) * tile)
+                x0, x1 = start * tile, min(w, c * tile)
+                ey0, ey1 = max(0, y0 - margin), min(h, y1 + margin)
+                ex0, ex1 = max(0, x0 - margin), min(w, x1 + margin)
+                part = self.backend.ball_mask(frame[ey0:ey1, ex0:ex1], color_name, kernel_size, base_shape=(h, w))
+                mask[y0:y1, x0:x1] = part[y0 - ey0:y1 - ey0, x0 - ex0:x1 - ex0]
+
+    def find_safe_zones(self, frame, safe_zone_color=None, min_area=None, kernel_size=5):
+        self._prepare(frame)
+        key = ("zone", safe_zone_color, min_area, kernel_size)
+        changed = self._changed(key)
+        if not changed.any() and key in self._results:
+            self.reused += 1
+            self.gate.commit(key, changed)
+            return list(self._results[key])
+        if min_area is None:
+            centers = self.backend.find_safe_zones(frame, safe_zone_color, kernel_size=kernel_size)
+        else:
+            centers = self.backend.find_safe_zones(frame, safe_zone_color, min_area, kernel_size)
+        self.tiles_segmented += changed.size
+        self.gate.commit(key, np.ones_like(changed))
+        self._results[key] = centers
+        return list(centers)
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "reused": self.reused,
+            "segmented_ratio": self.tiles_segmented / self.tiles_total if self.tiles_total else 0.0,
+        }
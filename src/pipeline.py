@@ -0,0 +1,266 @@
+"""
+声明式检测流程
+config.json 的 pipelines 按目标类型(ball 小球 / zone 安全区)给出有序的处理阶段和参数，例如
+    {"op": "cvt", "code": "HSV"}, {"op": "threshold"}, {"op": "open", "kernel": 3}, ...
+compile_pipelines() 检查并编译这些阶段：
+  - 合并多余的阶段：连续相同的开/闭运算只做一次，腐蚀+膨胀(同一个核)合并成一次开运算，膨胀+腐蚀合并成闭运算
+  - 所有流程共享相同的前缀：同一帧上各颜色小球和安全区共用一次HSV转换，安全区的紫色围栏掩码也只算一次
+  - 每个阶段的输出写到缓冲池中固定的缓冲区，稳定运行后不再分配内存
+PipelineDetector 提供与 vision.find_balls / find_safe_zones 相同的接口，可直接替换 vision 模块使用。
+"""
+
+import cv2
+
+import vision
+
+CVT_CODES = {"HSV": cv2.COLOR_BGR2HSV}
+KERNEL_SHAPES = {"rect": cv2.MORPH_RECT, "ellipse": cv2.MORPH_ELLIPSE, "cross": cv2.MORPH_CROSS}
+MORPH_OPS = {"open": cv2.MORPH_OPEN, "close": cv2.MORPH_CLOSE, "erode": cv2.MORPH_ERODE, "dilate": cv2.MORPH_DILATE}
+# trace 回调中的阶段名（与 vision 的中间结果同名，其余阶段用 op 名）
+TRACE_NAMES = {"cvt": "hsv", "threshold": "mask"}
+# 各目标类型的最后一个阶段（从掩码得到结果）
+FINAL_OPS = {"ball": "contours", "zone": "safe_zones"}
+FINAL_DEFAULTS = {
+    "contours": {"min_area": 10, "min_circularity": 0.7, "min_radius": 5},
+    "safe_zones": {"min_area": 1000, "kernel": 5},
+}
+
+# 与 vision.find_balls / find_safe_zones 结果完全相同的默认流程
+DEFAULT_PIPELINES = {
+    "ball": [
+        {"op": "cvt", "code": "HSV"},
+        {"op": "threshold"},
+        {"op": "open", "kernel": 3},
+        {"op": "close", "kernel": 3},
+        {"op": "contours", "min_area": 10, "min_circularity": 0.7, "min_radius": 5},
+    ],
+    "zone": [
+        {"op": "cvt", "code": "HSV"},
+        {"op": "threshold", "color": "purple"},
+        {"op": "close", "kernel": 5},
+        {"op": "open", "kernel": 5},
+        {"op": "safe_zones", "min_area": 1000, "kernel": 5},
+    ],
+}
+
+
+class _Node:
+    """处理树中的一个阶段；color_dependent 表示结果与要检测的颜色有关（不能跨颜色复用）"""
+
+    def __init__(self, node_id, op, params, parent, color_dependent):
+        self.id = node_id
+        self.op = op
+        self.params = params
+        self.parent = parent
+        self.color_dependent = color_dependent
+
+
+def _normalize(stage):
+    """补全默认参数，返回 (op, 参数字典)"""
+    stage = dict(stage)
+    op = stage.pop("op", None)
+    if op == "cvt":
+        code = stage.get("code", "HSV")
+        if code not in CVT_CODES:
+            raise ValueError(f"不支持的颜色空间 {code}，可用: {', '.join(CVT_CODES)}")
+        return op, {"code": code}
+    if op == "threshold":
+        return op, {"color": stage.get("color")}
+    if op in MORPH_OPS:
+        shape = stage.get("shape", "rect")
+        if shape not in KERNEL_SHAPES:
+            raise ValueError(f"不支持的核形状 {shape}，可用: {', '.join(KERNEL_SHAPES)}")
+        return op, {"kernel": int(stage.get("kernel", 3)), "shape": shape}
+    if op in FINAL_DEFAULTS:
+        return op, dict(FINAL_DEFAULTS[op], **stage)
+    raise ValueError(f"未知的处理阶段: {op}")
+
+
+def _fuse_morphology(stages):
+    """合并形态学阶段，直到不能再合并为止"""
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(stages) - 1):
+            (op1, p1), (op2, p2) = stages[i], stages[i + 1]
+            if p1 != p2:
+                continue
+            if op1 == op2 and op1 in ("open", "close"):
+                # 开/闭运算是幂等的，重复做结果不变
+                stages[i:i + 2] = [(op1, p1)]
+            elif (op1, op2) == ("erode", "dilate"):
+                stages[i:i + 2] = [("open", p1)]
+            elif (op1, op2) == ("dilate", "erode"):
+                stages[i:i + 2] = [("close", p1)]
+            else:
+                continue
+            changed = True
+            break
+    return stages
+
+
+def _check(target, stages):
+    ops = [op for op, _ in stages]
+    final = FINAL_OPS[target]
+    if len(ops) < 3 or ops[0] != "cvt" or ops[1] != "threshold" or ops[-1] != final:
+        raise ValueError(f"流程 {target} 必须以 cvt、threshold 开头，以 {final} 结尾，当前为: {ops}")
+    middle = [op for op in ops[2:-1] if op not in MORPH_OPS]
+    if middle:
+        raise ValueError(f"流程 {target} 的 threshold 和 {final} 之间只能是形态学阶段，当前有: {middle}")
+    if target == "zone" and stages[1][1]["color"] is None:
+        raise ValueError("流程 zone 的 threshold 需要指定围栏颜色，如 \"color\": \"purple\"")
+
+
+class CompiledPipelines:
+    """编译后的处理树：各流程共享相同的前缀阶段"""
+
+    def __init__(self, pipelines):
+        self.nodes = []
+        self.chains = {}
+        self.finals = {}
+        self.stage_count = 0
+        self.fused = 0
+        index = {}
+        for target in FINAL_OPS:
+            raw = pipelines.get(target, DEFAULT_PIPELINES[target])
+            stages = [_normalize(stage) for stage in raw]
+            _check(target, stages)
+            self.stage_count += len(stages)
+            body = _fuse_morphology(stages[:-1])
+            self.fused += len(stages) - 1 - len(body)
+
+            parent = None
+            chain = []
+            for op, params in body:
+                key = (parent.id if parent else None, op, tuple(sorted(params.items())))
+                node = index.get(key)
+                if node is None:
+                    color_dependent = (op == "threshold" and params["color"] is None) or \
+                        bool(parent and parent.color_dependent)
+                    node = _Node(len(self.nodes), op, params, parent, color_dependent)
+                    self.nodes.append(node)
+                    index[key] = node
+                chain.append(node)
+                parent = node
+            self.chains[target] = chain
+            self.finals[target] = stages[-1][1]
+
+    def summary(self):
+        shared = sum(len(chain) for chain in self.chains.values()) - len(self.nodes)
+        return (f"检测流程: {self.stage_count} 个阶段，合并 {self.fused} 个，"
+                f"共享 {shared} 个，每帧最多执行 {len(self.nodes)} 个中间阶段")
+
+
+def compile_pipelines(config):
+    """config: config.json 中的 pipelines（可以只写其中一种目标类型，其余使用默认流程）"""
+    return CompiledPipelines(config)
+
+
+def _frame_key(frame):
+    """用内存地址、形状和步长标识一块输入图像（同一帧内内容不变）"""
+    return frame.__array_interface__["data"][0], frame.shape, frame.strides
+
+
+class PipelineDetector:
+    """
+    按编译后的流程检测，每个摄像头一个
+    每帧开始时调用 new_frame()；同一帧内与颜色无关的阶段（HSV转换、围栏掩码）只计算一次
+    backend: 提供颜色掩码、轮廓筛选和安全区判断的检测器（vision.Detector 或 vision 模块）
+    """
+
+    def __init__(self, compiled, pool=None, backend=vision):
+        self.compiled = compiled
+        self.pool = pool
+        self.backend = backend
+        self._memo = {}
+        self.stages_run = 0
+        self.stages_reused = 0
+
+    def new_frame(self):
+        self._memo.clear()
+
+    def _run(self, chain, frame, color_name, base_shape=None, trace=None):
+        """执行一条流程的中间阶段，返回 (最后的掩码, HSV图像)；trace 见 vision.Detector.ball_mask"""
+        pool = self.pool if self.pool is not None else vision.get_buffer_pool()
+        h, w = frame.shape[:2]
+        if base_shape is None:
+            base_shape = (h, w)
+        key = _frame_key(frame)
+        image = frame
+        hsv = None
+        for node in chain:
+            memo = None if node.color_dependent else self._memo.get(node.id)
+            if memo is not None and memo[0] == key:
+                image = memo[1]
+                self.stages_reused += 1
+            else:
+                image = self._apply(node, image, color_name, pool, (h, w), base_shape)
+                self.stages_run += 1
+                if not node.color_dependent:
+                    self._memo[node.id] = (key, image)
+            if node.op == "cvt":
+                hsv = image
+            if trace:
+                trace(TRACE_NAMES.get(node.op, node.op), image)
+        return image, hsv
+
+    def _apply(self, node, image, color_name, pool, shape, base_shape):
+        name = f"pipeline{node.id}"
+        if node.op == "cvt":
+            return cv2.cvtColor(image, CVT_CODES[node.params["code"]],
+                                dst=pool.view(name, shape + (3,), base_shape))
+        if node.op == "threshold":
+            return self.backend.create_color_mask(image, node.params["color"] or color_name,
+                                                  dst=pool.view(name, shape, base_shape),
+                                                  scratch=pool.view("pipeline_scratch", shape, base_shape))
+        kernel = vision.get_kernel(node.params["kernel"], KERNEL_SHAPES[node.params["shape"]])
+        return cv2.morphologyEx(image, MORPH_OPS[node.op], kernel, dst=pool.view(name, shape, base_shape))
+
+    def create_color_mask(self, hsv, color_name, dst=None, scratch=None):
+        return self.backend.create_color_mask(hsv, color_name, dst=dst, scratch=scratch)
+
+    def mask_margin(self, kernel_size=None):
+        """小球流程中形态学阶段的影响范围(像素)；流程由配置决定，kernel_size 只为兼容 vision 的接口"""
+        # 与 vision.mask_margin 一样按核大小保守估计（开/闭运算实际影响 2×(核/2) 像素）
+        return sum(node.params["kernel"] for node in self.compiled.chains["ball"] if node.op in MORPH_OPS)
+
+    def ball_mask(self, frame, color_name, kernel_size=None, pool=None, base_shape=None, trace=None):
+        """小球流程的分割部分，返回的掩码在下一次调用时会被覆盖；kernel_size 由流程配置决定"""
+        mask, _ = self._run(self.compiled.chains["ball"], frame, color_name, base_shape, trace)
+        return mask
+
+    def balls_from_mask(self, mask, **filters):
+        params = dict(self.compiled.finals["ball"], **filters)
+        return self.backend.balls_from_mask(mask, params["min_area"], params["min_circularity"], params["min_radius"])
+
+    def find_balls(self, frame, color_name, min_area=None, min_circularity=None, min_radius=None,
+                   kernel_size=None, trace=None):
+        """与 vision.find_balls 相同；筛选参数为 None 时使用流程配置中的值"""
+        mask = self.ball_mask(frame, color_name, trace=trace)
+        if trace:
+            trace("contours", mask)
+        filters = {"min_area": min_area, "min_circularity": min_circularity, "min_radius": min_radius}
+        return self.balls_from_mask(mask, **{k: v for k, v in filters.items() if v is not None})
+
+    def fence_mask(self, frame, kernel_size=None, trace=None):
+        """安全区流程的中间阶段，返回 (围栏掩码, HSV图像)；kernel_size 由流程配置决定"""
+        return self._run(self.compiled.chains["zone"], frame, None, trace=trace)
+
+    def find_safe_zones(self, frame, safe_zone_color=None, min_area=None, kernel_size=None, trace=None):
+        """与 vision.find_safe_zones 相同；min_area 为 None 时使用流程配置中的值"""
+        fence_mask, hsv = self._run(self.compiled.chains["zone"], frame, safe_zone_color, trace=trace)
+        params = self.compiled.finals["zone"]
+        if min_area is None:
+            min_area = params["min_area"]
+        pool = self.pool if self.pool is not None else vision.get_buffer_pool()
+        return self.backend.zones_in_fences(hsv, fence_mask, safe_zone_color, min_area, params["kernel"], pool,
+                                            trace=trace)
+
+    def filters(self):
+        """流程配置中的筛选参数，格式同 vision.Detector.filters"""
+        ball = self.compiled.finals["ball"]
+        return {"min_area": ball["min_area"], "min_circularity": ball["min_circularity"],
+                "min_radius": ball["min_radius"], "zone_min_area": self.compiled.finals["zone"]["min_area"]}
+
+    def stats(self):
+        return {"stages_run": self.stages_run, "stages_reused": self.stages_reused}
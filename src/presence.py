@@ -0,0 +1,98 @@
+"""
+颜色存在性预筛
+多色识别模式下每种颜色都要跑一遍完整的 掩码→形态学→轮廓 流程，而大多数帧里最多只有一两种目标颜色。
+PresenceFilter 先在按 step 间隔抽取的像素网格上统计该颜色的像素数，少于 min_pixels 时直接返回空结果，
+不再运行完整检测。网格上的HSV转换每帧只做一次，各颜色共用。
+"""
+
+from collections import Counter
+
+import cv2
+
+import vision
+
+
+class PresenceFilter:
+    """
+    包装检测器（vision 模块、增量检测器或检测流程），接口与 vision.find_balls / find_safe_zones 相同
+    step: 抽样间隔(原始画面的像素)，小球最小半径为 5 时 step 不宜超过 4；
+          调度器降低检测分辨率时通过 set_scale 告知缩放比例，在缩小的画面上按 step×比例 抽样，实际间隔不变
+    min_pixels: 网格上至少有多少个像素是该颜色才运行完整检测
+    fence_color: 安全区检测先看围栏颜色是否存在
+    """
+
+    def __init__(self, detector, step=4, min_pixels=2, fence_color="purple"):
+        self.detector = detector
+        self.step = step
+        self.min_pixels = min_pixels
+        self.fence_color = fence_color
+        self.scale = 1.0
+        self._key = None
+        self._hsv = None
+        self.checked = Counter()
+        self.skipped = Counter()
+
+    def new_frame(self):
+        self._key = None
+        if hasattr(self.detector, "new_frame"):
+            self.detector.new_frame()
+
+    def set_scale(self, scale):
+        """之后收到的画面是原始画面按 scale 缩小的"""
+        self.scale = scale
+
+    def filters(self):
+        return self.detector.filters()
+
+    def create_color_mask(self, hsv, color_name, dst=None, scratch=None):
+        return self.detector.create_color_mask(hsv, color_name, dst=dst, scratch=scratch)
+
+    def ball_mask(self, frame, color_name):
+        return self.detector.ball_mask(frame, color_name)
+
+    def fence_mask(self, frame):
+        return self.detector.fence_mask(frame)
+
+    def _grid_hsv(self, frame):
+        # 同一帧（同一块图像）只抽样和转换一次
+        key = (frame.__array_interface__["data"][0], frame.shape)
+        if key != self._key:
+            pool = vision.get_buffer_pool()
+            h, w = frame.shape[:2]
+            step = max(1.0, self.step * self.scale)
+            size = (max(1, int(w / step)), max(1, int(h / step)))
+            # INTER_NEAREST 缩放就是按固定间隔取像素
+            grid = cv2.resize(frame, size, dst=pool.get("presence_grid", (size[1], size[0], 3)),
+                              interpolation=cv2.INTER_NEAREST)
+            self._hsv = cv2.cvtColor(grid, cv2.COLOR_BGR2HSV, dst=pool.get("presence_hsv", grid.shape))
+            self._key = key
+        return self._hsv
+
+    def present(self, frame, color_name, stat_key=None):
+        """抽样网格上该颜色的像素是否达到 min_pixels，并记录统计"""
+        hsv = self._grid_hsv(frame)
+        pool = vision.get_buffer_pool()
+        # 用被包装检测器自己的颜色配置（各摄像头的阈值、直方图模型可能不同）
+        mask = self.detector.create_color_mask(hsv, color_name, dst=pool.get("presence_mask", hsv.shape[:2]),
+                                               scratch=pool.get("presence_scratch", hsv.shape[:2]))
+        stat_key = stat_key or color_name
+        self.checked[stat_key] += 1
+        if cv2.countNonZero(mask) < self.min_pixels:
+            self.skipped[stat_key] += 1
+            return False
+        return True
+
+    def find_balls(self, frame, color_name, **kwargs):
+        if not self.present(frame, color_name):
+            return []
+        return self.detector.find_balls(frame, color_name, **kwargs)
+
+    def find_safe_zones(self, frame, safe_zone_color=None, **kwargs):
+        if not self.present(frame, self.fence_color, "zone"):
+            return []
+        return self.detector.find_safe_zones(frame, safe_zone_color, **kwargs)
+
+    def stats(self):
+        """各颜色的检查次数和跳过比例"""
+        return {key: {"checked": n, "skip_rate": round(self.skipped[key] / n, 3)}
+                for key, n in self.checked.items()}
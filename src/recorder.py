@@ -0,0 +1,148 @@
+"""
+黑匣子录像
+在内存中保留最近 N 秒的帧（后台线程压缩成JPEG）和每帧的检测结果，
+需要时（手动调用、收到 SIGUSR1、或连续多帧“未找到目标”）写到磁盘。
+写出的目录格式与 dataset.py 相同，可直接用 sweep.py 等离线工具回放；
+检测结果写在每帧的 balls/safe_zones 字段里，可作为伪标注，另附 camera/seq 字段。
+"""
+
+import os
+import signal
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+import dataset
+
+
+class BlackBoxRecorder:
+    """
+    seconds: 保留的时长; fps: 每个摄像头的录像帧率上限（超出的帧直接跳过）
+    cameras: 摄像头数量，环形缓冲区按它放大，每个摄像头都保留 seconds 秒
+    no_target_trigger: 连续多少帧没有目标时自动保存，0 表示不自动保存
+    """
+
+    def __init__(self, output_dir="recordings", seconds=10, fps=10, quality=80,
+                 no_target_trigger=0, cooldown=30.0, cameras=1):
+        self.output_dir = output_dir
+        self.interval = 1.0 / fps
+        self.quality = quality
+        self.no_target_trigger = no_target_trigger
+        self.cooldown = cooldown
+
+        self._ring = deque(maxlen=max(1, int(seconds * fps * cameras)))
+        # 摄像头名称 -> 等待压缩的 (图像, 检测结果)
+        self._pending = {}
+        # 每个摄像头两块图像缓冲区轮流使用：一块等待/正在压缩，另一块接收新帧
+        self._buffers = {}
+        self._next = {}
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+        # 录像间隔按摄像头分别计算，各检测线程互不挤占
+        self._last_frame_time = {}
+        self._no_target_count = 0
+        self._last_dump = 0.0
+        self._dump_reason = None
+        self.frames = 0
+        self.skipped = 0
+        self.dumps = 0
+
+    def start(self, install_signal=True):
+        self._running = True
+        self._thread = threading.Thread(target=self._compress_loop, name="recorder", daemon=True)
+        self._thread.start()
+        if install_signal and hasattr(signal, "SIGUSR1"):
+            if threading.current_thread() is threading.main_thread():
+                # 信号处理函数里只做标记，由主循环的 note_result() 触发后台保存
+                signal.signal(signal.SIGUSR1, lambda signum, frame: self.request_dump("signal"))
+            else:
+                # signal.signal 只能在主线程调用（如 main() 在其他线程中运行时）
+                print("警告: 不在主线程中启动，黑匣子不响应 SIGUSR1")
+        print(f"黑匣子录像已启动，保留 {self._ring.maxlen} 帧")
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(1.0)
+            self._thread = None
+
+    def record(self, frame, entry):
+        """
+        检测线程调用：提交一帧和该帧的检测结果（dataset 标注格式的字典，camera 字段区分摄像头）
+        该摄像头到了录像间隔时才复制一份图像交给后台线程压缩，frame 可以是复用的缓冲区
+        """
+        camera = entry.get("camera")
+        now = time.monotonic()
+        if now - self._last_frame_time.get(camera, 0.0) < self.interval:
+            return
+        self._last_frame_time[camera] = now
+        with self._cond:
+            if camera in self._pending:
+                # 后台线程还没压缩完该摄像头的上一帧，跳过这一帧
+                self.skipped += 1
+                return
+            buffers = self._buffers.setdefault(camera, [None, None])
+            index = self._next.get(camera, 0)
+            buf = buffers[index]
+            if buf is None or buf.shape != frame.shape:
+                buf = buffers[index] = np.empty_like(frame)
+            np.copyto(buf, frame)
+            self._next[camera] = index ^ 1
+            self._pending[camera] = (buf, entry)
+            self._cond.notify()
+
+    def note_result(self, target_found):
+        """主循环每帧调用：统计连续无目标帧数，达到阈值时自动保存"""
+        self._no_target_count = 0 if target_found else self._no_target_count + 1
+        if self.no_target_trigger and self._no_target_count == self.no_target_trigger:
+            self.request_dump("no_target")
+        if self._dump_reason is not None:
+            reason, self._dump_reason = self._dump_reason, None
+            if time.monotonic() - self._last_dump >= self.cooldown:
+                self.dump_async(reason)
+
+    def request_dump(self, reason="manual"):
+        """请求保存（可在信号处理函数中调用），由下一次 note_result() 在后台保存"""
+        self._dump_reason = reason
+
+    def _compress_loop(self):
+        while self._running:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or not self._running, timeout=1.0)
+                if not self._pending:
+                    continue
+                # 按提交顺序压缩（dict 保持插入顺序）
+                camera = next(iter(self._pending))
+                frame, entry = self._pending.pop(camera)
+            ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            if ok:
+                with self._cond:
+                    self._ring.append((jpeg.tobytes(), entry))
+                    self.frames += 1
+
+    def snapshot(self):
+        with self._cond:
+            return list(self._ring)
+
+    def dump(self, reason="manual"):
+        """把环形缓冲区写到 output_dir/时间_原因/，返回目录路径"""
+        items = self.snapshot()
+        self._last_dump = time.monotonic()
+        if not items:
+            return None
+        path = os.path.join(self.output_dir, time.strftime("%Y%m%d_%H%M%S") + f"_{reason}")
+        count = dataset.write_dataset(path, items)
+        self.dumps += 1
+        print(f"黑匣子已保存 {count} 帧到: {path}")
+        return path
+
+    def dump_async(self, reason="trigger"):
+        """在后台线程保存，不阻塞控制循环"""
+        self._last_dump = time.monotonic()
+        threading.Thread(target=self.dump, args=(reason,), name="recorder-dump", daemon=True).start()
@@ -0,0 +1,202 @@
+"""
+固定周期的控制循环调度与质量降级
+LoopScheduler 让主循环按固定周期给电控发数据，统计超时(deadline miss)；
+超时过多时降低质量等级，有余量时恢复。
+QualityDetector 按当前等级调整检测：降低检测分辨率、每帧少查几种颜色、减少安全区刷新；
+帧质量门控判定为降级的帧直接按最低等级检测。
+"""
+
+import time
+from collections import deque
+
+import cv2
+
+# 质量等级，从高到低；config.json 中的 scheduler.levels 可以覆盖
+# scale: 检测分辨率缩放; colors_per_frame: 多色模式每帧检查的颜色数; zone_refresh: 每几帧重新检测一次安全区
+DEFAULT_LEVELS = [
+    {"scale": 1.0, "colors_per_frame": 4, "zone_refresh": 1},
+    {"scale": 0.5, "colors_per_frame": 4, "zone_refresh": 1},
+    {"scale": 0.5, "colors_per_frame": 2, "zone_refresh": 1},
+    {"scale": 0.5, "colors_per_frame": 2, "zone_refresh": 3},
+]
+
+
+class LoopScheduler:
+    """
+    period: 循环周期(秒)
+    down_misses/window: 最近 window 帧中超时达到 down_misses 次就降一级
+    up_frames/up_headroom: 连续 up_frames 帧耗时都低于 周期×up_headroom 就升一级
+    """
+
+    def __init__(self, period=1 / 15, levels=None, window=10, down_misses=3, up_frames=60, up_headroom=0.6):
+        self.period = period
+        self.levels = levels or DEFAULT_LEVELS
+        self.window = deque(maxlen=window)
+        self.down_misses = down_misses
+        self.up_frames = up_frames
+        self.up_headroom = up_headroom
+
+        self.level = 0
+        self.frames = 0
+        self.misses = 0
+        self.level_changes = 0
+        self._good_streak = 0
+        self._start = None
+        self._next_deadline = None
+
+    @property
+    def quality(self):
+        return self.levels[self.level]
+
+    def begin(self):
+        """每帧开始时调用"""
+        self._start = time.monotonic()
+        if self._next_deadline is None:
+            self._next_deadline = self._start + self.period
+
+    def end(self):
+        """每帧结束时调用：统计超时、调整质量等级、等到下一个周期"""
+        now = time.monotonic()
+        work = now - self._start
+        self.frames += 1
+        missed = now > self._next_deadline
+        self.window.append(missed)
+        if missed:
+            self.misses += 1
+            self._good_streak = 0
+            # 已经晚了，不补帧，从现在开始重新计时
+            self._next_deadline = now + self.period
+            if sum(self.window) >= self.down_misses and self.level < len(self.levels) - 1:
+                self._set_level(self.level + 1)
+            return
+
+        if work < self.period * self.up_headroom:
+            self._good_streak += 1
+            if self._good_streak >= self.up_frames and self.level > 0:
+                self._set_level(self.level - 1)
+        else:
+            self._good_streak = 0
+        time.sleep(max(0.0, self._next_deadline - time.monotonic()))
+        self._next_deadline += self.period
+
+    def _set_level(self, level):
+        print(f"质量等级 {self.level} -> {level}: {self.levels[level]}")
+        self.level = level
+        self.level_changes += 1
+        self.window.clear()
+        self._good_streak = 0
+
+    def stats(self):
+        return {"frames": self.frames, "misses": self.misses, "level": self.level,
+                "level_changes": self.level_changes}
+
+
+class QualityDetector:
+    """
+    按调度器当前质量等级包装检测器（vision 模块或增量检测器），每个摄像头一个
+    降低分辨率时，被包装检测器的筛选参数（filters()）按缩放比例换算
+    """
+
+    def __init__(self, detector, scheduler):
+        self.detector = detector
+        self.scheduler = scheduler
+        self.degraded = False
+        self._rotation = 0
+        self._last_found = None
+        self._zone_results = {}
+        self._zone_age = {}
+        self._scaled = None
+        self._scaled_source = None
+
+    @property
+    def quality(self):
+        """本帧的质量等级：降级的帧用最低等级，否则用调度器当前等级"""
+        return self.scheduler.levels[-1] if self.degraded else self.scheduler.quality
+
+    def new_frame(self, degraded=False):
+        """degraded: 本帧画面质量差（帧质量门控判定为降级），按最低质量等级检测"""
+        self.degraded = degraded
+        self._scaled_source = None
+        self._rotation += 1
+        if hasattr(self.detector, "new_frame"):
+            self.detector.new_frame()
+        # 存在性预筛等按原始画面像素设定的参数按本帧的缩放比例换算
+        if hasattr(self.detector, "set_scale"):
+            self.detector.set_scale(self.quality["scale"])
+
+    def filters(self):
+        return self.detector.filters()
+
+    def create_color_mask(self, hsv, color_name, dst=None, scratch=None):
+        return self.detector.create_color_mask(hsv, color_name, dst=dst, scratch=scratch)
+
+    def _detection_frame(self, frame):
+        scale = self.quality["scale"]
+        return frame if scale == 1.0 else self._scaled_frame(frame, scale)
+
+    def ball_mask(self, frame, color_name):
+        """本帧实际检测用的分辨率下的小球掩码（调试视频流叠加用）"""
+        return self.detector.ball_mask(self._detection_frame(frame), color_name)
+
+    def fence_mask(self, frame):
+        """本帧实际检测用的分辨率下的围栏掩码，返回 (围栏掩码, HSV图像)"""
+        return self.detector.fence_mask(self._detection_frame(frame))
+
+    def _scaled_frame(self, frame, scale):
+        # 同一帧只缩放一次，缩放结果放在复用的缓冲区里（尺寸变化时 cv2 会重新分配）
+        if self._scaled_source is not frame:
+            size = (int(frame.shape[1] * scale), int(frame.shape[0] * scale))
+            self._scaled = cv2.resize(frame, size, dst=self._scaled, interpolation=cv2.INTER_AREA)
+            self._scaled_source = frame
+        return self._scaled
+
+    def ball_colors(self, colors, keep=None):
+        """
+        本帧要检查的颜色：按轮转取 colors_per_frame 种，上一次找到的颜色始终保留
+        keep: 也要始终检查的颜色（跟踪器已选定目标的颜色），保证选定的目标每帧都能匹配上
+        """
+        count = self.quality["colors_per_frame"]
+        if count >= len(colors):
+            return list(colors)
+        start = (self._rotation * count) % len(colors)
+        subset = [colors[(start + i) % len(colors)] for i in range(count)]
+        for color in (self._last_found, keep):
+            if color in colors and color not in subset:
+                subset.append(color)
+        return sorted(subset, key=colors.index)
+
+    def find_balls(self, frame, color_name):
+        scale = self.quality["scale"]
+        if scale == 1.0:
+            balls = self.detector.find_balls(frame, color_name)
+        else:
+            small = self._scaled_frame(frame, scale)
+            # 检测器自己的面积和半径下限（流程配置或默认值）按缩放比例换算
+            filters = self.detector.filters()
+            balls = [(int(x / scale), int(y / scale), int(r / scale))
+                     for x, y, r in self.detector.find_balls(small, color_name,
+                                                             min_area=filters["min_area"] * scale * scale,
+                                                             min_radius=filters["min_radius"] * scale)]
+        if balls:
+            self._last_found = color_name
+        return balls
+
+    def find_safe_zones(self, frame, safe_zone_color=None):
+        refresh = self.quality["zone_refresh"]
+        age = self._zone_age.get(safe_zone_color, refresh)
+        if age < refresh and safe_zone_color in self._zone_results:
+            self._zone_age[safe_zone_color] = age + 1
+            return list(self._zone_results[safe_zone_color])
+
+        scale = self.quality["scale"]
+        if scale == 1.0:
+            centers = self.detector.find_safe_zones(frame, safe_zone_color)
+        else:
+            small = self._scaled_frame(frame, scale)
+            # 检测器自己的围栏最小面积按面积比例缩小
+            min_area = int(self.detector.filters()["zone_min_area"] * scale * scale)
+            centers = [(int(x / scale), int(y / scale)) for x, y in
+                       self.detector.find_safe_zones(small, safe_zone_color, min_area=min_area)]
+        self._zone_results[safe_zone_color] = centers
+        self._zone_age[safe_zone_color] = 1
+        return centers
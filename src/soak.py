@@ -0,0 +1,337 @@
+"""
+长时间运行的内存泄漏测试(soak test)
+用回放或合成的画面、电控仿真器(ecu_sim.py)的伪终端跑完整的 main 主循环（几个小时），
+定期记录常驻内存(RSS)和 tracemalloc 快照：预热结束时的快照作为基线，之后每次采样都和基线比较，
+按阶段（采集、检测、跟踪、发送、主循环……）列出 Python 分配增长最多的代码行。
+RSS 或 Python 分配的增长超过预算时立即判定失败（退出码 1），比赛前就能发现缓慢的泄漏。
+
+tracemalloc 会让主循环变慢，帧率比实际运行低；OpenCV 内部的 C++ 分配不经过 tracemalloc，
+只体现在 RSS 中（返回给 Python 的图像由 numpy 分配，仍然能统计到调用它的代码行）。
+
+用法:
+    # 合成 60 帧画面循环回放，跑 2 小时，RSS 增长超过 32MB 判定失败
+    python src/soak.py --duration 7200 --rss-budget 32
+
+    # 回放录像或数据集目录（最多读入 300 帧），每 5 分钟采样一次
+    python src/soak.py --replay 录像.mp4 --frames 300 --interval 300 --duration 3600
+"""
+
+import argparse
+import ast
+import contextlib
+import gc
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from functools import lru_cache
+
+import numpy as np
+
+import dataset
+import ecu_sim
+import main as vision_main
+import metrics
+import synth
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+MB = 1024 * 1024
+
+# 模块 -> 阶段，统计增长时按阶段分组
+STAGES = {
+    "camera.py": "采集",
+    "vision.py": "检测",
+    "pipeline.py": "检测",
+    "motion.py": "检测",
+    "presence.py": "检测",
+    "scheduler.py": "检测",
+    "color_hist.py": "检测",
+    "quality.py": "检测",
+    "tracker.py": "跟踪",
+    "UART.py": "发送",
+    "latency.py": "发送",
+    "main.py": "主循环",
+    "ecu_state.py": "主循环",
+    "metrics.py": "监控",
+    "debug_stream.py": "监控",
+    "recorder.py": "黑匣子",
+    # 电控仿真器和本模块在同一进程中运行，单独列出，不计入视觉程序
+    "ecu_sim.py": "测试工具",
+    "soak.py": "测试工具",
+}
+OTHER_STAGE = "其他"
+
+
+@lru_cache(maxsize=None)
+def _functions(path):
+    """文件中每个函数的 (起始行, 结束行, 限定名)"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read())
+    except (OSError, SyntaxError):
+        return ()
+    result = []
+
+    def visit(node, prefix):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                name = prefix + child.name
+                if not isinstance(child, ast.ClassDef):
+                    result.append((child.lineno, child.end_lineno, name))
+                visit(child, name + ".")
+            else:
+                visit(child, prefix)
+
+    visit(tree, "")
+    return tuple(result)
+
+
+def function_at(path, lineno):
+    """行号所在的最内层函数名，不在函数中时为 <模块>"""
+    best = None
+    for start, end, name in _functions(path):
+        if start <= lineno <= end and (best is None or start > best[0]):
+            best = (start, name)
+    return best[1] if best else "<模块>"
+
+
+def _project_frame(traceback):
+    """调用栈中最靠近分配点的本项目代码帧，没有时为 None"""
+    for frame in reversed(traceback):
+        if os.path.dirname(os.path.abspath(frame.filename)) == SRC_DIR:
+            return frame
+    return None
+
+
+def hot_spots(baseline, snapshot, top=5):
+    """
+    比较两个 tracemalloc 快照，把增长归到调用栈中最近的本项目代码行，按阶段分组
+    返回 {阶段: (总增长字节, [(增长字节, 增长块数, "文件:行 函数"), ...])}，每个阶段取增长最多的 top 行；
+    调用栈中没有本项目代码的分配（解释器、标准库线程等）归入"其他"
+    """
+    lines = defaultdict(lambda: [0, 0])
+    for stat in snapshot.compare_to(baseline, "traceback"):
+        frame = _project_frame(stat.traceback)
+        key = (frame.filename, frame.lineno) if frame is not None else None
+        lines[key][0] += stat.size_diff
+        lines[key][1] += stat.count_diff
+
+    stages = defaultdict(lambda: [0, []])
+    for key, (size, count) in lines.items():
+        if key is None:
+            stages[OTHER_STAGE][0] += size
+            continue
+        filename, lineno = key
+        name = os.path.basename(filename)
+        stage = stages[STAGES.get(name, OTHER_STAGE)]
+        stage[0] += size
+        if size > 0:
+            stage[1].append((size, count, f"{name}:{lineno} {function_at(filename, lineno)}"))
+    return {name: (total, sorted(items, reverse=True)[:top]) for name, (total, items) in stages.items()}
+
+
+def format_hot_spots(spots):
+    lines = []
+    for stage, (total, items) in sorted(spots.items(), key=lambda kv: -kv[1][0]):
+        lines.append(f"  {stage}: {total / 1024:+.1f}KB")
+        for size, count, where in items:
+            lines.append(f"    {size / 1024:+8.1f}KB {count:+6d}块  {where}")
+    return "\n".join(lines)
+
+
+def _elapsed(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class SoakMonitor:
+    """
+    定期采样 RSS 和 tracemalloc，预热结束时的采样作为基线
+    rss_budget / traced_budget: 相对基线允许的增长(字节)
+    """
+
+    def __init__(self, rss_budget, traced_budget, top=5, out=sys.stdout):
+        self.rss_budget = rss_budget
+        self.traced_budget = traced_budget
+        self.top = top
+        self.out = out
+        self.start = time.monotonic()
+        self.baseline = None
+        self._baseline_snapshot = None
+        self.samples = []  # (运行秒数, RSS字节, Python分配字节)
+        self.failure = None
+        self.finished = False  # 正常跑完或超出预算
+
+    def _take(self):
+        # 先回收循环引用，避免把还没回收的垃圾当成增长
+        gc.collect()
+        traced, _ = tracemalloc.get_traced_memory()
+        return (time.monotonic() - self.start, metrics.rss_bytes() or 0, traced), tracemalloc.take_snapshot()
+
+    def set_baseline(self):
+        self.baseline, self._baseline_snapshot = self._take()
+        self.samples = [self.baseline]
+        _, rss, traced = self.baseline
+        print(f"[soak {_elapsed(self.baseline[0])}] 基线: RSS {rss / MB:.1f}MB, Python分配 {traced / MB:.1f}MB",
+              file=self.out, flush=True)
+
+    def trend(self):
+        """基线之后 RSS 的线性增长趋势(字节/小时)，样本不足时为 None"""
+        if len(self.samples) < 3:
+            return None
+        t = np.array([s[0] for s in self.samples])
+        rss = np.array([s[1] for s in self.samples], dtype=np.float64)
+        return float(np.polyfit(t, rss, 1)[0]) * 3600
+
+    def sample(self, extra=""):
+        """采样一次并与基线比较；超出预算时记录 failure 并返回 False"""
+        current, snapshot = self._take()
+        self.samples.append(current)
+        elapsed, rss, traced = current
+        rss_growth = rss - self.baseline[1]
+        traced_growth = traced - self.baseline[2]
+        trend = self.trend()
+        trend_text = f", 趋势 {trend / MB:+.1f}MB/h" if trend is not None else ""
+        print(f"[soak {_elapsed(elapsed)}] RSS {rss / MB:.1f}MB ({rss_growth / MB:+.1f}/{self.rss_budget / MB:g}MB), "
+              f"Python分配 {traced / MB:.1f}MB ({traced_growth / MB:+.1f}/{self.traced_budget / MB:g}MB)"
+              f"{trend_text}{extra}", file=self.out, flush=True)
+
+        if rss_growth > self.rss_budget:
+            self.failure = f"RSS 增长 {rss_growth / MB:.1f}MB 超过预算 {self.rss_budget / MB:g}MB"
+        elif traced_growth > self.traced_budget:
+            self.failure = f"Python分配增长 {traced_growth / MB:.1f}MB 超过预算 {self.traced_budget / MB:g}MB"
+        if self.failure is not None:
+            self.report(snapshot)
+            return False
+        return True
+
+    def report(self, snapshot=None):
+        """打印相对基线增长最多的代码行"""
+        if self._baseline_snapshot is None:
+            return
+        if snapshot is None:
+            _, snapshot = self._take()
+        print("相对基线的分配增长（按阶段）:", file=self.out)
+        print(format_hot_spots(hot_spots(self._baseline_snapshot, snapshot, self.top)), file=self.out, flush=True)
+
+
+def make_config(replay, port, fps, frames, output_dir):
+    """
+    在 config.json 的基础上只保留一个回放摄像头，串口改为电控仿真器的伪终端
+    黑匣子录像写到临时目录 output_dir，调试视频流和监控指标只监听本机的临时端口，
+    不会写进项目的 recordings/，也不会和正在运行的视觉程序抢端口
+    """
+    config = vision_main.load_config()
+    camera_cfg = next((c for c in config["cameras"] if c.get("enabled", True)), config["cameras"][0])
+    config["cameras"] = [dict(camera_cfg, enabled=True, replay=replay, replay_fps=fps, replay_frames=frames,
+                              measure_frames=0)]
+    config["serial"] = dict(config["serial"], port=port)
+    config["recorder"] = dict(config["recorder"], output_dir=output_dir)
+    for key in ("debug_stream", "metrics"):
+        config[key] = dict(config[key], host="127.0.0.1", port=0)
+    return config
+
+
+def run_soak(replay, duration, warmup, interval, rss_budget, traced_budget, fps=30.0, frames=60, seed=0,
+             trace_depth=10, top=5, verbose=False):
+    """跑完整主循环并采样，返回是否通过"""
+    out = sys.stdout
+    sim = ecu_sim.EcuSimulator(ecu_sim.random_script(int(duration / 0.2) + 1, seed=seed), ack=True)
+    sim.start()
+    recordings = tempfile.TemporaryDirectory(prefix="soak_recordings_")
+    config = make_config(replay, sim.port_name, fps, frames, recordings.name)
+    monitor = SoakMonitor(rss_budget, traced_budget, top, out)
+    stop = threading.Event()
+
+    def watch():
+        """采样线程：预热后记录基线，之后按间隔采样；到时间或超出预算时让主循环退出"""
+        try:
+            deadline = monitor.start + duration
+            next_sample = monitor.start + warmup
+            while not stop.wait(0.5):
+                now = time.monotonic()
+                if now < next_sample and now < deadline:
+                    continue
+                next_sample += interval
+                if monitor.baseline is None:
+                    if now >= deadline:
+                        monitor.finished = True
+                        break
+                    monitor.set_baseline()
+                elif not monitor.sample(f", 电控收包 {sim.packets}"):
+                    monitor.finished = True
+                    break
+                elif now >= deadline:
+                    monitor.report()
+                    monitor.finished = True
+                    break
+        finally:
+            stop.set()
+
+    tracemalloc.start(trace_depth)
+    watcher = threading.Thread(target=watch, name="soak-monitor", daemon=True)
+    watcher.start()
+    error = None
+    try:
+        # 主循环每帧都打印，默认丢弃；本模块的输出直接写 out
+        with open(os.devnull, "w") as devnull, \
+                (contextlib.nullcontext() if verbose else contextlib.redirect_stdout(devnull)):
+            vision_main.main(config, stop)
+    except (Exception, SystemExit) as e:
+        error = e
+    finally:
+        stop.set()
+        watcher.join()
+        sim.stop()
+        recordings.cleanup()
+
+    if not monitor.finished and monitor.failure is None:
+        monitor.failure = (f"主循环提前退出: {error!r}" if error is not None
+                           else "主循环提前退出（用户中断或启动失败，用 --verbose 查看）")
+    print(sim.format_stats(), file=out)
+    tracemalloc.stop()
+
+    if monitor.failure is not None:
+        print(f"soak 测试失败: {monitor.failure}", file=out)
+        return False
+    if monitor.baseline is None:
+        print("soak 测试未完成：运行时间短于预热时间", file=out)
+        return False
+    print("soak 测试通过", file=out)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="长时间运行的内存泄漏测试")
+    parser.add_argument("--replay", help="回放的数据集目录或录像，不给时回放合成画面(synth.py)")
+    parser.add_argument("--frames", type=int, default=60, help="读入内存循环回放的帧数（合成时为生成帧数）")
+    parser.add_argument("--fps", type=float, default=30.0, help="回放帧率，0 表示不限速")
+    parser.add_argument("--duration", type=float, default=3600.0, help="总运行时间(秒)")
+    parser.add_argument("--warmup", type=float, default=300.0,
+                        help="预热时间(秒)，结束时记录基线；各模块的统计窗口(deque)要先填满，不宜太短")
+    parser.add_argument("--interval", type=float, default=60.0, help="采样间隔(秒)")
+    parser.add_argument("--rss-budget", type=float, default=32.0, help="RSS 相对基线允许的增长(MB)")
+    parser.add_argument("--traced-budget", type=float, default=8.0, help="Python分配相对基线允许的增长(MB)")
+    parser.add_argument("--trace-depth", type=int, default=10, help="tracemalloc 记录的调用栈深度")
+    parser.add_argument("--top", type=int, default=5, help="每个阶段列出增长最多的几行")
+    parser.add_argument("--seed", type=int, default=0, help="合成画面和电控指令的随机种子")
+    parser.add_argument("--verbose", action="store_true", help="显示主循环的输出")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="soak_") as tmp:
+        replay = args.replay
+        if replay is None:
+            replay = tmp
+            dataset.write_dataset(tmp, synth.generate(args.frames, seed=args.seed))
+            print(f"已合成 {args.frames} 帧回放画面")
+        ok = run_soak(replay, args.duration, args.warmup, args.interval, args.rss_budget * MB,
+                      args.traced_budget * MB, args.fps, args.frames, args.seed, args.trace_depth, args.top,
+                      args.verbose)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
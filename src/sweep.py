@@ -0,0 +1,227 @@
+"""
+离线参数扫描工具
+在带标注的数据集上(格式见 dataset.py)对一组检测参数和分辨率组合运行
+find_balls / find_safe_zones，用进程池并行评估，输出每组参数的
+精确率、召回率、中心误差和单帧耗时，并标出精度/耗时的帕累托前沿。
+
+用法:
+    python src/sweep.py 数据集目录 [--grid grid.json] [--workers 4] [--csv result.csv]
+
+grid.json 为参数名到候选值列表的映射，未给出的参数使用 DEFAULT_GRID。
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import math
+import multiprocessing
+import time
+
+import cv2
+import numpy as np
+
+import dataset
+import vision
+
+BALL_COLORS = ["red", "blue", "yellow", "black"]
+ZONE_COLORS = ["red", "blue"]
+
+# 默认扫描网格；scale 为检测前对图像的缩放比例，
+# min_area / min_radius / zone_min_area 按原始分辨率给出，缩放后按比例换算（面积按比例的平方）
+DEFAULT_GRID = {
+    "scale": [1.0, 0.75, 0.5],
+    "min_area": [10],
+    "min_circularity": [0.6, 0.7, 0.8],
+    "min_radius": [5],
+    "kernel_size": [3, 5],
+    "zone_min_area": [1000],
+    "zone_kernel_size": [5],
+}
+
+# vision.find_balls / find_safe_zones 的默认参数（原始分辨率）
+VISION_PARAMS = {
+    "scale": 1.0,
+    "min_area": 10,
+    "min_circularity": 0.7,
+    "min_radius": 5,
+    "kernel_size": 3,
+    "zone_min_area": 1000,
+    "zone_kernel_size": 5,
+}
+
+# 检测中心与标注中心的距离在该范围内视为匹配（像素，原始分辨率）
+BALL_MATCH_PX = 15
+ZONE_MATCH_PX = 40
+
+# 子进程中的数据集（由进程池初始化函数加载，避免每个任务重复传图像）
+_frames = None
+
+
+def expand_grid(grid):
+    """把参数网格展开成参数组合列表"""
+    keys = list(grid.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def _init_worker(dataset_dir):
+    global _frames
+    # 每个进程单线程运行OpenCV，保证各组参数的耗时可比
+    cv2.setNumThreads(1)
+    _frames = dataset.load_frames(dataset_dir)
+
+
+def _match(detections, truths, max_dist):
+    """
+    贪心匹配检测结果和标注（按距离从近到远）
+    返回 (匹配数, 中心误差列表)
+    """
+    pairs = []
+    for i, (dx, dy) in enumerate(detections):
+        for j, (tx, ty) in enumerate(truths):
+            d = math.hypot(dx - tx, dy - ty)
+            if d <= max_dist:
+                pairs.append((d, i, j))
+    pairs.sort()
+
+    used_det, used_truth, errors = set(), set(), []
+    for d, i, j in pairs:
+        if i in used_det or j in used_truth:
+            continue
+        used_det.add(i)
+        used_truth.add(j)
+        errors.append(d)
+    return len(errors), errors
+
+
+def evaluate_config(params):
+    """在已加载的数据集上评估一组参数，返回统计结果字典"""
+    return evaluate(_frames, params)
+
+
+def evaluate(frames, params):
+    """在 frames（可迭代的 (图像, 标注)）上评估一组参数，返回统计结果字典"""
+    scale = params["scale"]
+    # 筛选参数换算到缩放后的图像上，不同分辨率比较的是同一组筛选条件
+    min_area = params["min_area"] * scale * scale
+    min_radius = params["min_radius"] * scale
+    zone_min_area = int(params["zone_min_area"] * scale * scale)
+    tp = fp = fn = 0
+    errors = []
+    latencies = []
+
+    for frame, labels in frames:
+        start = time.perf_counter()
+        if scale != 1.0:
+            small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        else:
+            small = frame
+
+        found = {}
+        for color in BALL_COLORS:
+            balls = vision.find_balls(small, color,
+                                      min_area=min_area,
+                                      min_circularity=params["min_circularity"],
+                                      min_radius=min_radius,
+                                      kernel_size=params["kernel_size"])
+            found[("ball", color)] = [(x / scale, y / scale) for x, y, r in balls]
+        for color in ZONE_COLORS:
+            centers = vision.find_safe_zones(small, color,
+                                             min_area=zone_min_area,
+                                             kernel_size=params["zone_kernel_size"])
+            found[("zone", color)] = [(x / scale, y / scale) for x, y in centers]
+        latencies.append(time.perf_counter() - start)
+
+        for (kind, color), detections in found.items():
+            if kind == "ball":
+                truths = [(b["x"], b["y"]) for b in labels.get("balls", []) if b["color"] == color]
+                max_dist = BALL_MATCH_PX
+            else:
+                truths = [(z["x"], z["y"]) for z in labels.get("safe_zones", []) if z["color"] == color]
+                max_dist = ZONE_MATCH_PX
+            matched, errs = _match(detections, truths, max_dist)
+            tp += matched
+            fp += len(detections) - matched
+            fn += len(truths) - matched
+            errors.extend(errs)
+
+    latencies_ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return {
+        "params": params,
+        "precision": precision,
+        "recall": recall,
+        "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        "center_err": float(np.mean(errors)) if errors else float("nan"),
+        "latency_ms": float(np.mean(latencies_ms)),
+        "latency_p95_ms": float(np.percentile(latencies_ms, 95)),
+    }
+
+
+def mark_pareto(results):
+    """标出F1和平均耗时的帕累托前沿（没有其他组合同时更准且更快）"""
+    for r in results:
+        r["pareto"] = not any(
+            o["f1"] >= r["f1"] and o["latency_ms"] <= r["latency_ms"]
+            and (o["f1"] > r["f1"] or o["latency_ms"] < r["latency_ms"])
+            for o in results
+        )
+    return results
+
+
+def run_sweep(dataset_dir, grid, workers=None):
+    """用进程池评估网格中的所有参数组合"""
+    configs = expand_grid(grid)
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(dataset_dir,)) as pool:
+        results = pool.map(evaluate_config, configs, chunksize=1)
+    return mark_pareto(results)
+
+
+def print_table(results):
+    keys = list(results[0]["params"].keys()) if results else []
+    header = keys + ["precision", "recall", "f1", "err_px", "ms", "p95_ms", "pareto"]
+    print(" | ".join(header))
+    for r in sorted(results, key=lambda r: r["latency_ms"]):
+        row = [str(r["params"][k]) for k in keys]
+        row += [f"{r['precision']:.3f}", f"{r['recall']:.3f}", f"{r['f1']:.3f}",
+                f"{r['center_err']:.1f}", f"{r['latency_ms']:.2f}", f"{r['latency_p95_ms']:.2f}",
+                "*" if r["pareto"] else ""]
+        print(" | ".join(row))
+
+
+def write_csv(results, path):
+    keys = list(results[0]["params"].keys()) if results else []
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(keys + ["precision", "recall", "f1", "center_err", "latency_ms",
+                                "latency_p95_ms", "pareto"])
+        for r in results:
+            writer.writerow([r["params"][k] for k in keys] +
+                            [r["precision"], r["recall"], r["f1"], r["center_err"],
+                             r["latency_ms"], r["latency_p95_ms"], int(r["pareto"])])
+    print(f"结果已保存到: {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检测参数离线扫描")
+    parser.add_argument("dataset", help="带 labels.json 的数据集目录")
+    parser.add_argument("--grid", help="参数网格 JSON 文件")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认CPU核数")
+    parser.add_argument("--csv", help="结果另存为CSV")
+    args = parser.parse_args()
+
+    grid = dict(DEFAULT_GRID)
+    if args.grid:
+        with open(args.grid, 'r') as f:
+            grid.update(json.load(f))
+
+    print(f"共 {len(expand_grid(grid))} 组参数")
+    results = run_sweep(args.dataset, grid, args.workers)
+    print_table(results)
+    if args.csv:
+        write_csv(results, args.csv)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+合成比赛场地画面
+按给定分辨率渲染带标注的场地帧：红、蓝、黄、黑小球（已知位置和半径），红、蓝安全区及外面的紫色围栏，
+再叠加光照渐变、噪声、模糊（高斯或运动模糊）和遮挡。标注格式与 dataset.py 相同，
+可以写成数据集给 sweep.py / color_hist.py 用，也可以不写盘直接在生成的帧上评估 vision 的准确率和耗时。
+
+几何尺寸按 640x480 设计，其他分辨率按比例缩放；颜色取在 config 中各颜色HSV阈值的范围内。
+标注中被遮挡的小球带 "visible" 字段（可见部分的比例），每帧的 "synth" 字段记录光照、噪声和模糊参数。
+
+用法:
+    # 生成 1000 帧数据集
+    python src/synth.py 数据集目录 --count 1000 --size 640x480 --seed 0
+
+    # 不写盘，直接评估 vision 在 2000 帧 1280x720 画面上的准确率和单帧耗时
+    python src/synth.py --eval --count 2000 --size 1280x720
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+import dataset
+import sweep
+
+BASE_WIDTH, BASE_HEIGHT = 640, 480
+
+# 各颜色的 BGR 基色（HSV 分别约为 红 H0、蓝 H102、黄 H27、紫 H140）
+# 蓝色的色调避开紫色阈值(H≥106)，否则蓝球也会被当成围栏
+BALL_BGR = {
+    "red": (30, 30, 200),
+    "blue": (220, 140, 20),
+    "yellow": (30, 200, 220),
+    "black": (25, 25, 25),
+}
+ZONE_BGR = {"red": (40, 40, 190), "blue": (210, 130, 30)}
+FENCE_BGR = (160, 40, 120)
+FLOOR_BGR = (165, 175, 180)
+
+# 默认场景参数（尺寸均为 640x480 下的像素）
+DEFAULT_OPTIONS = {
+    "balls": (2, 6),            # 每帧小球个数范围
+    "zones": (0, 2),            # 每帧安全区个数范围
+    "radius": (8, 30),          # 小球半径范围
+    "zone_size": ((120, 200), (90, 150)),  # 围栏外框宽、高范围
+    "fence_width": (5, 9),      # 围栏宽度范围
+    "gradient": 0.35,           # 光照渐变的最大幅度（亮度乘以 1±gradient）
+    "noise": 6.0,               # 高斯噪声标准差上限
+    "blur": 0.3,                # 模糊的概率
+    "motion_blur": (5, 15),     # 运动模糊的长度范围
+    "occlusion": 0.2,           # 每个小球被遮挡的概率
+}
+
+
+def _rects_overlap(a, b, margin):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    return (ax < bx + bw + margin and bx < ax + aw + margin and
+            ay < by + bh + margin and by < ay + ah + margin)
+
+
+def _draw_zones(frame, rng, count, scale, opts, entry):
+    """画安全区和围栏，返回各围栏外框 [(x, y, w, h), ...]"""
+    h, w = frame.shape[:2]
+    (w_lo, w_hi), (h_lo, h_hi) = opts["zone_size"]
+    rects = []
+    for _ in range(count):
+        rect = None
+        # 随机摆放，与已有围栏重叠时重试
+        for _ in range(50):
+            zw = int(rng.uniform(w_lo, w_hi) * scale)
+            zh = int(rng.uniform(h_lo, h_hi) * scale)
+            if zw >= w or zh >= h:
+                continue
+            candidate = (int(rng.integers(0, w - zw)), int(rng.integers(0, h - zh)), zw, zh)
+            if not any(_rects_overlap(candidate, r, 10 * scale) for r in rects):
+                rect = candidate
+                break
+        if rect is None:
+            continue
+        x, y, zw, zh = rect
+        fence = max(2, int(rng.uniform(*opts["fence_width"]) * scale))
+        gap = max(2, int(rng.uniform(4, 10) * scale))
+        color = str(rng.choice(list(ZONE_BGR)))
+        cv2.rectangle(frame, (x, y), (x + zw - 1, y + zh - 1), FENCE_BGR, -1)
+        cv2.rectangle(frame, (x + fence, y + fence), (x + zw - 1 - fence, y + zh - 1 - fence), FLOOR_BGR, -1)
+        inset = fence + gap
+        cv2.rectangle(frame, (x + inset, y + inset), (x + zw - 1 - inset, y + zh - 1 - inset), ZONE_BGR[color], -1)
+        rects.append(rect)
+        entry["safe_zones"].append({"color": color, "x": x + zw // 2, "y": y + zh // 2})
+        entry["samples"].append({"color": "purple", "x": x, "y": y, "w": zw, "h": fence})
+    return rects
+
+
+def _draw_ball(frame, color, x, y, r):
+    """画一个边缘稍暗的小球"""
+    h, w = frame.shape[:2]
+    x0, x1 = max(0, x - r), min(w, x + r + 1)
+    y0, y1 = max(0, y - r), min(h, y + r + 1)
+    yy, xx = np.ogrid[y0 - y:y1 - y, x0 - x:x1 - x]
+    d2 = (xx * xx + yy * yy) / float(r * r)
+    inside = d2 <= 1.0
+    shade = (1.0 - 0.3 * d2)[..., None] * np.array(BALL_BGR[color], np.float32)
+    roi = frame[y0:y1, x0:x1]
+    roi[inside] = shade[inside]
+
+
+def _draw_balls(frame, rng, count, scale, opts, zones, entry):
+    h, w = frame.shape[:2]
+    placed = []
+    for _ in range(count):
+        ball = None
+        # 随机摆放，与其他小球或安全区重叠时重试
+        for _ in range(50):
+            r = max(3, int(rng.uniform(*opts["radius"]) * scale))
+            if 2 * r >= min(w, h):
+                continue
+            x = int(rng.integers(r, w - r))
+            y = int(rng.integers(r, h - r))
+            if any(np.hypot(x - px, y - py) < r + pr + 4 * scale for px, py, pr in placed):
+                continue
+            if any(_rects_overlap((x - r, y - r, 2 * r, 2 * r), z, 4 * scale) for z in zones):
+                continue
+            ball = (x, y, r)
+            break
+        if ball is None:
+            continue
+        x, y, r = ball
+        color = str(rng.choice(list(BALL_BGR)))
+        _draw_ball(frame, color, x, y, r)
+        placed.append((x, y, r))
+        entry["balls"].append({"color": color, "x": x, "y": y, "r": r})
+    return placed
+
+
+def _occlude(frame, rng, balls, opts, entry):
+    """按概率在小球上画一根灰色横杆（机械臂、其他机器人等），记录每个小球的可见比例"""
+    h, w = frame.shape[:2]
+    occluder = np.zeros((h, w), np.uint8)
+    for x, y, r in balls:
+        if rng.random() >= opts["occlusion"]:
+            continue
+        thickness = max(2, int(rng.uniform(0.3, 1.0) * r))
+        offset = int(rng.uniform(-r, r))
+        angle = rng.uniform(0, np.pi)
+        dx, dy = np.cos(angle) * 3 * r, np.sin(angle) * 3 * r
+        cx, cy = x - np.sin(angle) * offset, y + np.cos(angle) * offset
+        p1 = (int(cx - dx), int(cy - dy))
+        p2 = (int(cx + dx), int(cy + dy))
+        cv2.line(occluder, p1, p2, 255, thickness)
+        gray = int(rng.integers(90, 130))
+        cv2.line(frame, p1, p2, (gray, gray, gray), thickness)
+
+    if not cv2.countNonZero(occluder):
+        return
+    for ball in entry["balls"]:
+        x, y, r = ball["x"], ball["y"], ball["r"]
+        disk = np.zeros((2 * r + 1, 2 * r + 1), np.uint8)
+        cv2.circle(disk, (r, r), r, 255, -1)
+        roi = occluder[y - r:y + r + 1, x - r:x + r + 1]
+        hidden = cv2.countNonZero(cv2.bitwise_and(disk, roi))
+        if hidden:
+            ball["visible"] = round(1 - hidden / cv2.countNonZero(disk), 2)
+
+
+def _blur(frame, rng, scale, opts):
+    """返回 (模糊后的图像, 描述)"""
+    if rng.random() >= opts["blur"]:
+        return frame, None
+    if rng.random() < 0.5:
+        ksize = int(rng.choice([3, 5]))
+        return cv2.GaussianBlur(frame, (ksize, ksize), 0), f"gaussian{ksize}"
+    length = max(3, int(rng.uniform(*opts["motion_blur"]) * scale)) | 1
+    kernel = np.zeros((length, length), np.float32)
+    kernel[length // 2, :] = 1.0 / length
+    angle = float(rng.uniform(0, 180))
+    rot = cv2.getRotationMatrix2D((length / 2 - 0.5, length / 2 - 0.5), angle, 1.0)
+    kernel = cv2.warpAffine(kernel, rot, (length, length))
+    kernel /= kernel.sum()
+    return cv2.filter2D(frame, -1, kernel), f"motion{length}@{angle:.0f}"
+
+
+def render_scene(rng, width=BASE_WIDTH, height=BASE_HEIGHT, **options):
+    """
+    渲染一帧场地画面
+    rng: numpy.random.Generator；options 覆盖 DEFAULT_OPTIONS 中的项
+    返回 (BGR图像, 标注)，标注格式见 dataset.py
+    """
+    opts = dict(DEFAULT_OPTIONS, **options)
+    scale = min(width / BASE_WIDTH, height / BASE_HEIGHT)
+    entry = {"balls": [], "safe_zones": [], "samples": []}
+
+    # 地面只随机改变亮度：偏蓝的灰色饱和度稍高就会落进紫色阈值，整块地面都会被当成围栏
+    floor = np.clip(np.array(FLOOR_BGR) * rng.uniform(0.85, 1.1), 0, 255)
+    frame = np.empty((height, width, 3), np.uint8)
+    frame[:] = floor.astype(np.uint8)
+
+    zones = _draw_zones(frame, rng, int(rng.integers(opts["zones"][0], opts["zones"][1] + 1)), scale, opts, entry)
+    balls = _draw_balls(frame, rng, int(rng.integers(opts["balls"][0], opts["balls"][1] + 1)), scale, opts,
+                        zones, entry)
+    _occlude(frame, rng, balls, opts, entry)
+    frame, blur = _blur(frame, rng, scale, opts)
+
+    # 光照渐变：亮度沿随机方向线性变化
+    gradient = float(rng.uniform(0, opts["gradient"]))
+    angle = rng.uniform(0, 2 * np.pi)
+    xs = np.linspace(-1, 1, width, dtype=np.float32) * np.float32(np.cos(angle))
+    ys = np.linspace(-1, 1, height, dtype=np.float32) * np.float32(np.sin(angle))
+    gain = 1 + gradient * (xs[None, :] + ys[:, None]) / 2
+    image = frame.astype(np.float32)
+    image *= gain[..., None]
+
+    sigma = float(rng.uniform(0, opts["noise"]))
+    if sigma > 0:
+        image += rng.standard_normal(image.shape, dtype=np.float32) * np.float32(sigma)
+    np.clip(image, 0, 255, out=image)
+
+    entry["synth"] = {"gradient": round(gradient, 3), "noise": round(sigma, 2), "blur": blur}
+    return image.astype(np.uint8), entry
+
+
+def generate(count, width=BASE_WIDTH, height=BASE_HEIGHT, seed=None, **options):
+    """逐帧生成 count 帧 (图像, 标注)，seed 相同时结果相同"""
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        yield render_scene(rng, width, height, **options)
+
+
+def _parse_size(text):
+    w, _, h = text.lower().partition("x")
+    return int(w), int(h)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合成比赛场地画面")
+    parser.add_argument("output", nargs="?", help="写出的数据集目录（格式见 dataset.py），不给时不写盘")
+    parser.add_argument("--count", type=int, default=500)
+    parser.add_argument("--size", default="640x480", help="分辨率，如 1280x720")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--noise", type=float, default=DEFAULT_OPTIONS["noise"])
+    parser.add_argument("--gradient", type=float, default=DEFAULT_OPTIONS["gradient"])
+    parser.add_argument("--blur", type=float, default=DEFAULT_OPTIONS["blur"])
+    parser.add_argument("--occlusion", type=float, default=DEFAULT_OPTIONS["occlusion"])
+    parser.add_argument("--eval", action="store_true", help="用 vision 的默认参数评估准确率和单帧耗时")
+    args = parser.parse_args()
+    if not args.output and not args.eval:
+        parser.error("需要输出目录或 --eval")
+
+    width, height = _parse_size(args.size)
+    options = {"noise": args.noise, "gradient": args.gradient, "blur": args.blur, "occlusion": args.occlusion}
+
+    if args.output:
+        start = time.perf_counter()
+        n = dataset.write_dataset(args.output, generate(args.count, width, height, args.seed, **options))
+        print(f"已生成 {n} 帧 {width}x{height} 到 {args.output}，用时 {time.perf_counter() - start:.1f}s")
+
+    if args.eval:
+        frames = dataset.iter_frames(args.output) if args.output else \
+            generate(args.count, width, height, args.seed, **options)
+        r = sweep.evaluate(frames, sweep.VISION_PARAMS)
+        print(f"精确率 {r['precision']:.3f}  召回率 {r['recall']:.3f}  F1 {r['f1']:.3f}  "
+              f"中心误差 {r['center_err']:.1f}px  单帧耗时 {r['latency_ms']:.2f}ms (p95 {r['latency_p95_ms']:.2f}ms)")
+
+
+if __name__ == "__main__":
+    main()
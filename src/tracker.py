@@ -0,0 +1,151 @@
+"""
+小球多目标跟踪
+在 find_balls 的结果上做帧间关联，给每个小球分配持续的编号；
+选定一个目标后一直跟着它，直到它丢失或被抓取，避免几个大小相近的小球之间来回切换导致底盘摆动。
+"""
+
+import math
+
+
+class Track:
+    """一个被跟踪的小球"""
+
+    def __init__(self, track_id, color, x, y, r):
+        self.id = track_id
+        self.color = color
+        self.x, self.y, self.r = x, y, r
+        self.vx, self.vy = 0.0, 0.0
+        self.hits = 1      # 累计匹配次数
+        self.misses = 0    # 连续未匹配次数
+
+    def predict(self):
+        """按匀速运动预测下一帧的位置"""
+        steps = self.misses + 1
+        return self.x + self.vx * steps, self.y + self.vy * steps
+
+    def update(self, x, y, r, alpha=0.5):
+        steps = self.misses + 1
+        self.vx = alpha * (x - self.x) / steps + (1 - alpha) * self.vx
+        self.vy = alpha * (y - self.y) / steps + (1 - alpha) * self.vy
+        self.x, self.y, self.r = x, y, r
+        self.hits += 1
+        self.misses = 0
+
+
+class BallTracker:
+    """
+    每个摄像头一个跟踪器
+    max_distance: 关联时允许的最大距离(像素)，小球半径较大时按 2 倍半径放宽
+    min_hits: 连续匹配多少次才算确认，确认后才能被选为目标
+    max_misses: 连续多少帧没匹配上就删除
+    """
+
+    def __init__(self, max_distance=80, min_hits=2, max_misses=5):
+        self.max_distance = max_distance
+        self.min_hits = min_hits
+        self.max_misses = max_misses
+        self.tracks = []
+        self.committed = None
+        self._next_id = 1
+        self._grabbed = set()
+        self.created = 0
+        self.switches = 0
+        self.lost = 0
+        self.grabbed = 0
+
+    def update(self, detections, colors, wanted=None):
+        """
+        detections: 本帧检测到的 [(颜色, x, y, r), ...]
+        colors: 本帧检查过的颜色（按优先级排列），没检查的颜色的轨迹不计丢失
+        wanted: 当前指令要找的全部颜色，默认同 colors；调度器每帧只检查其中几种时，
+                已选定目标的颜色本帧没检查不会放弃它，只有不在 wanted 里（电控切换了指令）才放弃
+        返回本帧匹配上的已选定目标 Track，没有时返回 None
+        """
+        wanted = colors if wanted is None else wanted
+        matched = self._associate(detections, colors)
+
+        for track in self.tracks:
+            if track.color in colors and track not in matched:
+                track.misses += 1
+        removed = [t for t in self.tracks if t.misses > self.max_misses]
+        if removed:
+            self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+            self._grabbed.intersection_update(t.id for t in self.tracks)
+            if self.committed in removed:
+                self.committed = None
+                self.lost += 1
+
+        # 已选定的目标不在当前指令要找的颜色里（电控切换了指令），放弃它；
+        # 只是本帧没检查这个颜色时保留，按正常的漏检计数丢失
+        if self.committed is not None and self.committed.color not in wanted:
+            self.committed = None
+
+        if self.committed is None:
+            self._commit(colors)
+        if self.committed is not None and self.committed in matched:
+            return self.committed
+        return None
+
+    def _associate(self, detections, colors):
+        """同颜色内按距离从近到远贪心匹配，返回本帧匹配上的轨迹集合"""
+        pairs = []
+        for di, (color, x, y, r) in enumerate(detections):
+            for track in self.tracks:
+                if track.color != color:
+                    continue
+                px, py = track.predict()
+                dist = math.hypot(x - px, y - py)
+                if dist <= max(self.max_distance, 2 * r):
+                    pairs.append((dist, di, track))
+        pairs.sort(key=lambda p: p[0])
+
+        matched, used = set(), set()
+        for _, di, track in pairs:
+            if di in used or track in matched:
+                continue
+            _, x, y, r = detections[di]
+            track.update(x, y, r)
+            matched.add(track)
+            used.add(di)
+
+        for di, (color, x, y, r) in enumerate(detections):
+            if di not in used:
+                track = Track(self._next_id, color, x, y, r)
+                self._next_id += 1
+                self.created += 1
+                self.tracks.append(track)
+                matched.add(track)
+        return matched
+
+    def _commit(self, colors):
+        """选定新目标：已确认、本帧看得到、没被抓过的轨迹中，颜色优先级最高、半径最大的一个"""
+        candidates = [t for t in self.tracks
+                      if t.color in colors and t.hits >= self.min_hits and t.misses == 0
+                      and t.id not in self._grabbed]
+        if not candidates:
+            return
+        self.committed = min(candidates, key=lambda t: (colors.index(t.color), -t.r))
+        self.switches += 1
+
+    def visible(self, colors):
+        """本帧看得到、已确认、没被抓过的 colors 中的轨迹，按颜色优先级和半径从大到小排列（批量发送候选目标用）"""
+        tracks = [t for t in self.tracks
+                  if t.color in colors and t.hits >= self.min_hits and t.misses == 0
+                  and t.id not in self._grabbed]
+        return sorted(tracks, key=lambda t: (colors.index(t.color), -t.r))
+
+    def confidence(self, track):
+        """轨迹的置信度 0~100：匹配次数达到 2 倍 min_hits 为满分，每次连续漏检按比例扣分"""
+        hits = min(1.0, track.hits / (2 * self.min_hits))
+        return round(100 * hits * (1 - track.misses / (self.max_misses + 1)))
+
+    def mark_grabbed(self):
+        """电控报告已抓到当前目标：放弃它，之后也不再选它（它可能还留在画面里）"""
+        if self.committed is not None:
+            self._grabbed.add(self.committed.id)
+            self.committed = None
+            self.grabbed += 1
+
+    def stats(self):
+        return {"tracks": len(self.tracks), "created": self.created, "switches": self.switches,
+                "lost": self.lost, "grabbed": self.grabbed}
@@ -2,243 +2,551 @@ import cv2
 import numpy as np
 import json
 import os
+import threading
+from functools import lru_cache
 
-# 缓存字典，避免重复加载配置文件
-_color_config_cache = {}
+class BufferPool:
+    """
+    中间图像缓冲池
+    按 (名称, 形状, 类型) 缓存缓冲区，分辨率不变时每帧复用同一块内存，
+    稳定运行后不再产生大块内存分配。allocations 记录实际分配次数。
+    """
 
-def load_color(color_name):
-    # 检查缓存中是否已有该颜色的配置
-    if color_name in _color_config_cache:
-        return _color_config_cache[color_name]
-  
+    def __init__(self):
+        self._buffers = {}
+        self.allocations = 0
+
+    def get(self, name, shape, dtype=np.uint8):
+        key = (name, tuple(shape), np.dtype(dtype))
+        buf = self._buffers.get(key)
+        if buf is None:
+            buf = np.empty(shape, dtype)
+            self._buffers[key] = buf
+            self.allocations += 1
+        return buf
+
+    def view(self, name, shape, base_shape, dtype=np.uint8):
+        """
+        从 base_shape 大小的缓冲区中取左上角 shape 大小的视图
+        用于大小每帧不同的ROI，避免每种大小各分配一块
+        """
+        full_shape = tuple(base_shape[:2]) + tuple(shape[2:])
+        buf = self.get(name, full_shape, dtype)
+        if tuple(shape) == full_shape:
+            return buf
+        return buf[:shape[0], :shape[1]]
+
+    def nbytes(self):
+        """缓冲池当前占用的字节数"""
+        return sum(buf.nbytes for buf in self._buffers.values())
+
+    def clear(self):
+        self._buffers.clear()
+
+
+# 每个线程一个默认缓冲池，多线程调用检测函数时互不干扰
+_thread_local = threading.local()
+
+
+def get_buffer_pool():
+    """返回当前线程的默认缓冲池"""
+    pool = getattr(_thread_local, "pool", None)
+    if pool is None:
+        pool = _thread_local.pool = BufferPool()
+    return pool
+
+
+@lru_cache(maxsize=None)
+def get_kernel(size, shape=cv2.MORPH_RECT):
+    """缓存形态学核，避免每次调用重新创建"""
+    return cv2.getStructuringElement(shape, (size, size))
+
+
+def mask_margin(kernel_size=3):
+    """ball_mask 中开运算+闭运算的影响范围(像素)，分块计算掩码时图块要向外扩展这么多"""
+    return 2 * kernel_size
+
+def _parse_color_config(config):
+    """把阈值文件的内容转换成检测用的颜色配置"""
+    # 检查配置是否为双区间结构
+    if "range1" in config and "range2" in config and "common" in config:
+        # 双区间结构（适用于红色等跨0°的颜色）
+        range1 = {
+            "lower": [config["range1"]["H Min"], config["common"]["S Min"], config["common"]["V Min"]],
+            "upper": [config["range1"]["H Max"], config["common"]["S Max"], config["common"]["V Max"]]
+        }
+        range2 = {
+            "lower": [config["range2"]["H Min"], config["common"]["S Min"], config["common"]["V Min"]],
+            "upper": [config["range2"]["H Max"], config["common"]["S Max"], config["common"]["V Max"]]
+        }
+        for r in (range1, range2):
+            r["lower_np"] = np.array(r["lower"])
+            r["upper_np"] = np.array(r["upper"])
+        return {"range1": range1, "range2": range2, "is_double_range": True}
+    # 单区间结构（适用于大多数颜色）
+    lower = [config["H Min"], config["S Min"], config["V Min"]]
+    upper = [config["H Max"], config["S Max"], config["V Max"]]
+    return {"lower": lower, "upper": upper, "is_double_range": False,
+            "lower_np": np.array(lower), "upper_np": np.array(upper)}
+
+
+def color_config_path(color_name):
+    return os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', f'hsv_thresholds_{color_name}.json')
+
+
+def read_color(color_name):
+    """从阈值文件读取并解析颜色配置"""
     # 使用绝对路径加载配置文件
-    config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', f'hsv_thresholds_{color_name}.json')
-    with open(config_path, 'r') as f:
+    with open(color_config_path(color_name), 'r') as f:
         config = json.load(f)
-            
-        # 检查配置是否为双区间结构
-        if "range1" in config and "range2" in config and "common" in config:
-            # 双区间结构（适用于红色等跨0°的颜色）
-            range1 = {
-                "lower": [config["range1"]["H Min"], config["common"]["S Min"], config["common"]["V Min"]],
-                "upper": [config["range1"]["H Max"], config["common"]["S Max"], config["common"]["V Max"]]
-            }
-            range2 = {
-                "lower": [config["range2"]["H Min"], config["common"]["S Min"], config["common"]["V Min"]],
-                "upper": [config["range2"]["H Max"], config["common"]["S Max"], config["common"]["V Max"]]
-            }
-            color_config = {"range1": range1, "range2": range2, "is_double_range": True}
-        else:
-            # 单区间结构（适用于大多数颜色）
-            lower = [config["H Min"], config["S Min"], config["V Min"]]
-            upper = [config["H Max"], config["S Max"], config["V Max"]]
-            color_config = {"lower": lower, "upper": upper, "is_double_range": False}
-        
-        # 将配置存入缓存
-        _color_config_cache[color_name] = color_config
-        return color_config
-    
-
-def create_color_mask(hsv, color_name):
-    """
-    创建指定颜色的掩码
-    """
-    color_config = load_color(color_name)
-    
-    if color_config["is_double_range"]:
-        # 双区间处理（如红色）
-        lower1 = np.array(color_config["range1"]["lower"])
-        upper1 = np.array(color_config["range1"]["upper"])
-        mask1 = cv2.inRange(hsv, lower1, upper1)
-        
-        lower2 = np.array(color_config["range2"]["lower"])
-        upper2 = np.array(color_config["range2"]["upper"])
-        mask2 = cv2.inRange(hsv, lower2, upper2)
-        
-        mask = cv2.bitwise_or(mask1, mask2)
-    else:
-        # 单区间处理
-        lower = np.array(color_config["lower"])
-        upper = np.array(color_config["upper"])
-        mask = cv2.inRange(hsv, lower, upper)
-    
-    return mask
+    return _parse_color_config(config)
 
-# 检测颜色小球
-def find_balls(frame, color_name):
-    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-    
-    # 创建掩码
-    mask = create_color_mask(hsv, color_name)
 
-    # 形态学操作，去除噪声
-    kernel = np.ones((3, 3), np.uint8)
-    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
-    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
-    
+def balls_from_mask(mask, min_area=10, min_circularity=0.7, min_radius=5):
+    """小球检测的轮廓部分：按面积、圆形度、半径筛选掩码中的轮廓"""
     contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
     
     balls = []
     for cnt in contours:
         area = cv2.contourArea(cnt)
         # 面积筛选范围放宽
-        if 10 < area :  #放开面积的上限1000
+        if min_area < area :  #放开面积的上限1000
             (x, y), radius = cv2.minEnclosingCircle(cnt)
             perimeter = cv2.arcLength(cnt, True)
             if perimeter > 0:
                 circularity = 4 * np.pi * area / (perimeter * perimeter)
                 # 半径范围和圆形度筛选
-                if circularity > 0.7 and 5 < radius :  #放开半径的上限60
+                if circularity > min_circularity and min_radius < radius :  #放开半径的上限60
                     balls.append((int(x), int(y), int(radius)))
     # 如果检测到多个球，选择面积最大的那个返回
     balls = sorted(balls, key=lambda b: b[2], reverse=True)  # 按半径降序排序
     return balls
 
-def find_safe_zones(frame, safe_zone_color=None, min_area=1000):
+class Detector:
     """
-    先找紫色围栏，再判断围栏内部大面积颜色。
-    返回所有符合条件安全区的中心点[(cx,cy), ...]
+    颜色检测器：自己持有颜色配置、掩码方式、缓冲池、距离平滑状态和画面尺寸，
+    多个检测器可以在不同线程、不同进程或不同摄像头上同时运行，互不影响（一个检测器同一时间只在一个线程中使用）。
+    模块级的 find_balls / find_safe_zones / smooth_distance 等函数是默认检测器 default_detector() 的简单包装。
+
+    frame_size: (宽, 高)，计算偏移和按分辨率换算焦距用；None 时使用最近一次检测的画面尺寸
+    base: 从另一个检测器复制已加载的颜色配置和掩码方式（如启动时预加载过的默认检测器）
+    pool: 中间图像缓冲池，默认每个检测器一个
+    window_size: 距离平滑的滑动窗口大小
+    ball_real_diameter / focal_length / calib_width: 小球真实直径(厘米)、标定的焦距(像素)和标定时的画面宽度
     """
-    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-    
-    # 先找紫色围栏  
-    purple_mask = create_color_mask(hsv, "purple")
-    
-    # 形态学操作
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (5,5))
-    purple_mask = cv2.morphologyEx(purple_mask, cv2.MORPH_CLOSE, kernel)
-    purple_mask = cv2.morphologyEx(purple_mask, cv2.MORPH_OPEN, kernel)
-    
-    # 查找紫色围栏轮廓
-    purple_contours, _ = cv2.findContours(purple_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    
-    centers = []
-    
-    # 如果没有找到紫色围栏，直接返回空列表
-    if not purple_contours:
-        return centers
-    
-    # 遍历每个紫色围栏，检查内部区域 
-    for purple_cnt in purple_contours:
-        purple_area = cv2.contourArea(purple_cnt)
+
+    def __init__(self, frame_size=None, base=None, pool=None, window_size=5,
+                 ball_real_diameter=4.0, focal_length=727.8, calib_width=640):
+        # 缓存字典，避免重复加载配置文件
+        self.models = dict(base.models) if base is not None else {}
+        # 颜色名称 -> 替代HSV阈值的掩码函数 engine(hsv, dst=None, scratch=None)，如 color_hist 的直方图反向投影
+        self.engines = dict(base.engines) if base is not None else {}
+        self.pool = pool if pool is not None else BufferPool()
+        self.frame_size = frame_size
+        self.window_size = window_size  # 滑动窗口大小
+        self.ball_real_diameter = ball_real_diameter
+        self.focal_length = focal_length
+        self.calib_width = calib_width
+        # 距离历史记录，用于平滑滤波
+        self.distance_history = []
+        self._last_shape = None
+
+    # 与 pipeline.PipelineDetector 等检测器接口一致
+    balls_from_mask = staticmethod(balls_from_mask)
+    mask_margin = staticmethod(mask_margin)
+
+    # find_balls / find_safe_zones 的默认筛选参数
+    BALL_FILTERS = {"min_area": 10, "min_circularity": 0.7, "min_radius": 5}
+    ZONE_MIN_AREA = 1000
+
+    def filters(self):
+        """
+        不传筛选参数时使用的值：小球 min_area/min_circularity/min_radius 和安全区 zone_min_area
+        scheduler.QualityDetector 降低检测分辨率时按缩放比例换算这些值
+        """
+        return dict(self.BALL_FILTERS, zone_min_area=self.ZONE_MIN_AREA)
+
+    def load_color(self, color_name):
+        # 检查缓存中是否已有该颜色的配置
+        color_config = self.models.get(color_name)
+        if color_config is None:
+            # 将配置存入缓存
+            color_config = self.models[color_name] = read_color(color_name)
+        return color_config
+
+    def set_color_thresholds(self, color_name, config):
+        """用阈值文件格式的字典替换内存中的颜色配置（调参工具实时预览用，不写文件）"""
+        self.models[color_name] = _parse_color_config(config)
+
+    def set_mask_engine(self, color_name, engine):
+        """指定某种颜色的掩码计算方式；engine 为 None 时恢复使用HSV阈值"""
+        if engine is None:
+            self.engines.pop(color_name, None)
+        else:
+            self.engines[color_name] = engine
+
+    def preload_colors(self, color_names, kernel_sizes=(3, 5)):
+        """启动时预先加载所有颜色配置和形态学核，避免第一帧检测时读文件"""
+        for color_name in color_names:
+            self.load_color(color_name)
+        for size in kernel_sizes:
+            get_kernel(size)
+
+    def create_color_mask(self, hsv, color_name, dst=None, scratch=None):
+        """
+        创建指定颜色的掩码（默认按HSV阈值，set_mask_engine 指定了其他方式时用该方式）
+        dst: 可选的输出缓冲区（与hsv同宽高的单通道uint8）
+        scratch: 双区间颜色使用的临时缓冲区，不给则临时分配
+        """
+        engine = self.engines.get(color_name)
+        if engine is not None:
+            return engine(hsv, dst=dst, scratch=scratch)
+
+        color_config = self.load_color(color_name)
         
-        # 过滤过小的紫色围栏
-        if purple_area < min_area:
-            continue
+        if color_config["is_double_range"]:
+            # 双区间处理（如红色）
+            range1 = color_config["range1"]
+            range2 = color_config["range2"]
+            mask = cv2.inRange(hsv, range1["lower_np"], range1["upper_np"], dst=dst)
+            mask2 = cv2.inRange(hsv, range2["lower_np"], range2["upper_np"], dst=scratch)
+            mask = cv2.bitwise_or(mask, mask2, dst=mask)
+        else:
+            # 单区间处理
+            mask = cv2.inRange(hsv, color_config["lower_np"], color_config["upper_np"], dst=dst)
         
-        # 获取紫色围栏的外接矩形
-        x, y, w, h = cv2.boundingRect(purple_cnt)
+        return mask
+
+    # 检测颜色小球
+    def ball_mask(self, frame, color_name, kernel_size=3, pool=None, base_shape=None, trace=None):
+        """
+        小球检测的分割部分：HSV转换、颜色掩码、开闭运算去噪
+        返回缓冲池中的掩码（下次调用会被覆盖）
+        base_shape: 给出时从该大小的缓冲区取左上角视图，用于大小不固定的图块/ROI
+        trace: 可选回调 trace(阶段名, 图像)，每个阶段完成后调用，调参工具用来显示中间结果和计时
+        """
+        if pool is None:
+            pool = self.pool
+        h, w = frame.shape[:2]
+        if base_shape is None:
+            base_shape = (h, w)
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=pool.view("hsv", (h, w, 3), base_shape))
+        if trace:
+            trace("hsv", hsv)
         
-        # 确保矩形在图像范围内
-        if x < 0 or y < 0 or x + w > frame.shape[1] or y + h > frame.shape[0]:
-            continue
+        # 创建掩码
+        mask = self.create_color_mask(hsv, color_name, dst=pool.view("mask", (h, w), base_shape),
+                                      scratch=pool.view("scratch", (h, w), base_shape))
+        if trace:
+            trace("mask", mask)
+
+        # 形态学操作，去除噪声
+        kernel = get_kernel(kernel_size)
+        opened = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel, dst=pool.view("morph", (h, w), base_shape))
+        if trace:
+            trace("open", opened)
+        closed = cv2.morphologyEx(opened, cv2.MORPH_CLOSE, kernel, dst=mask)
+        if trace:
+            trace("close", closed)
+        return closed
+
+    # 检测颜色小球
+    def find_balls(self, frame, color_name, min_area=10, min_circularity=0.7, min_radius=5, kernel_size=3,
+                   pool=None, trace=None):
+        """
+        检测指定颜色的小球，返回按半径降序排列的[(x, y, r), ...]
+        min_area/min_circularity/min_radius/kernel_size 为筛选参数，默认值为实测调好的值
+        pool: 中间图像缓冲池，默认使用本检测器的缓冲池
+        trace: 见 ball_mask
+        """
+        self._last_shape = frame.shape[:2]
+        mask = self.ball_mask(frame, color_name, kernel_size, pool, trace=trace)
+        balls = balls_from_mask(mask, min_area, min_circularity, min_radius)
+        if trace:
+            trace("contours", mask)
+        return balls
+
+    def find_safe_zones(self, frame, safe_zone_color=None, min_area=1000, kernel_size=5, pool=None, trace=None):
+        """
+        先找紫色围栏，再判断围栏内部大面积颜色。
+        返回所有符合条件安全区的中心点[(cx,cy), ...]
+        pool: 中间图像缓冲池，默认使用本检测器的缓冲池
+        trace: 见 ball_mask
+        """
+        if pool is None:
+            pool = self.pool
+        self._last_shape = frame.shape[:2]
+        purple_mask, hsv = self.fence_mask(frame, kernel_size, pool, trace)
+        return self.zones_in_fences(hsv, purple_mask, safe_zone_color, min_area, kernel_size, pool, trace)
+
+    def fence_mask(self, frame, kernel_size=5, pool=None, trace=None):
+        """
+        安全区检测的前半部分：HSV转换、紫色围栏掩码、闭/开运算去噪
+        返回 (围栏掩码, HSV图像)，都在缓冲池中（下次调用会被覆盖）
+        """
+        if pool is None:
+            pool = self.pool
+        frame_h, frame_w = frame.shape[:2]
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=pool.get("hsv", (frame_h, frame_w, 3)))
+        if trace:
+            trace("hsv", hsv)
         
-        # 提取围栏内部区域
-        roi = frame[y:y+h, x:x+w]
-        if roi.size == 0:
-            continue
+        # 先找紫色围栏  
+        purple_mask = self.create_color_mask(hsv, "purple", dst=pool.get("mask", (frame_h, frame_w)))
+        if trace:
+            trace("mask", purple_mask)
         
-        roi_hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
+        # 形态学操作
+        kernel = get_kernel(kernel_size)
+        closed = cv2.morphologyEx(purple_mask, cv2.MORPH_CLOSE, kernel, dst=pool.get("morph", (frame_h, frame_w)))
+        if trace:
+            trace("close", closed)
+        purple_mask = cv2.morphologyEx(closed, cv2.MORPH_OPEN, kernel, dst=purple_mask)
+        if trace:
+            trace("open", purple_mask)
+        return purple_mask, hsv
+
+    def zones_in_fences(self, hsv, fence_mask, safe_zone_color, min_area=1000, kernel_size=5, pool=None, trace=None):
+        """
+        安全区检测的后半部分：在去噪后的紫色围栏掩码中找围栏，再检查每个围栏内部的安全区颜色
+        hsv: 整帧HSV图像；返回安全区中心点[(cx,cy), ...]
+        """
+        if pool is None:
+            pool = self.pool
+        frame_h, frame_w = hsv.shape[:2]
+        kernel = get_kernel(kernel_size)
+
+        # 查找紫色围栏轮廓
+        purple_contours, _ = cv2.findContours(fence_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if trace:
+            trace("contours", fence_mask)
+    
+        centers = []
+    
+        # 如果没有找到紫色围栏，直接返回空列表
+        if not purple_contours:
+            return centers
+
+        # 只检测红色或蓝色安全区，其他颜色内部掩码恒为空
+        if safe_zone_color not in ("red", "blue"):
+            return centers
+
+        # 围栏内部的掩码使用整帧大小缓冲区的左上角视图，避免每个围栏重新分配
+        inner_buf = pool.get("inner", (frame_h, frame_w))
+        inner_closed_buf = pool.get("inner_closed", (frame_h, frame_w))
+        scratch_buf = pool.get("scratch", (frame_h, frame_w))
+    
+        # 遍历每个紫色围栏，检查内部区域 
+        for purple_cnt in purple_contours:
+            purple_area = cv2.contourArea(purple_cnt)
+        
+            # 过滤过小的紫色围栏
+            if purple_area < min_area:
+                continue
         
-        # 检测围栏内部的矩形面积 
-        # 创建一个空白的掩码，用于标记围栏内部的安全区
-        inner_mask = np.zeros_like(roi[:,:,0])
+            # 获取紫色围栏的外接矩形
+            x, y, w, h = cv2.boundingRect(purple_cnt)
         
-        # 检测红色或蓝色安全区
-        if safe_zone_color == "red":
-            red_mask = create_color_mask(roi_hsv, "red")
-            inner_mask = cv2.bitwise_or(inner_mask, red_mask)
+            # 确保矩形在图像范围内
+            if x < 0 or y < 0 or x + w > frame_w or y + h > frame_h:
+                continue
+            if w == 0 or h == 0:
+                continue
         
-        elif safe_zone_color == "blue":
-            blue_mask = create_color_mask(roi_hsv, "blue")
-            inner_mask = cv2.bitwise_or(inner_mask, blue_mask)
+            # 提取围栏内部区域（整帧HSV的视图，与单独转换ROI结果相同）
+            roi_hsv = hsv[y:y+h, x:x+w]
         
-        # 形态学操作
-        inner_mask = cv2.morphologyEx(inner_mask, cv2.MORPH_CLOSE, kernel)
+            # 检测围栏内部的安全区颜色
+            inner_mask = self.create_color_mask(roi_hsv, safe_zone_color, dst=inner_buf[:h, :w],
+                                                scratch=scratch_buf[:h, :w])
+        
+            # 形态学操作
+            inner_mask = cv2.morphologyEx(inner_mask, cv2.MORPH_CLOSE, kernel, dst=inner_closed_buf[:h, :w])
         
-        # 查找内部安全区轮廓
-        inner_contours, _ = cv2.findContours(inner_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            # 查找内部安全区轮廓
+            inner_contours, _ = cv2.findContours(inner_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
-        for inner_cnt in inner_contours:
-            inner_area = cv2.contourArea(inner_cnt)
+            for inner_cnt in inner_contours:
+                inner_area = cv2.contourArea(inner_cnt)
             
-            # 过滤过小的内部区域
-            if inner_area < min_area / 2:
-                continue
+                # 过滤过小的内部区域
+                if inner_area < min_area / 2:
+                    continue
             
-            # 检查轮廓是否近似为矩形
-            epsilon = 0.05 * cv2.arcLength(inner_cnt, True)
-            approx = cv2.approxPolyDP(inner_cnt, epsilon, True)
+                # 检查轮廓是否近似为矩形
+                epsilon = 0.05 * cv2.arcLength(inner_cnt, True)
+                approx = cv2.approxPolyDP(inner_cnt, epsilon, True)
             
-            # 如果轮廓有4个顶点，且是凸的，则认为是矩形
-            if len(approx) >= 4 and len(approx) <= 6 and cv2.isContourConvex(approx):
-                # 计算内部安全区的中心点（相对于原始图像）
-                M = cv2.moments(inner_cnt)   # 计算轮廓的矩
-                if M["m00"] != 0:
-                    cx = int(M["m10"] / M["m00"]) + x  # 计算x坐标，加上ROI偏移
-                    cy = int(M["m01"] / M["m00"]) + y
-                    centers.append((cx, cy))
+                # 如果轮廓有4个顶点，且是凸的，则认为是矩形
+                if len(approx) >= 4 and len(approx) <= 6 and cv2.isContourConvex(approx):
+                    # 计算内部安全区的中心点（相对于原始图像）
+                    M = cv2.moments(inner_cnt)   # 计算轮廓的矩
+                    if M["m00"] != 0:
+                        cx = int(M["m10"] / M["m00"]) + x  # 计算x坐标，加上ROI偏移
+                        cy = int(M["m01"] / M["m00"]) + y
+                        centers.append((cx, cy))
     
-    return centers
+        return centers
+
+    # 计算相对图像中心的偏移量
+    def calculate_offset(self, x, y, frame_width=None, frame_height=None):
+        """frame_width/frame_height 不给时使用 frame_size 或最近一次检测的画面尺寸"""
+        if frame_width is None or frame_height is None:
+            frame_width, frame_height = self.geometry()
+        center_x = frame_width // 2
+        center_y = frame_height // 2
+        x_offset = x - center_x
+        y_offset = y - center_y
+        
+        # 限制在-128到127范围内（1字节有符号）
+        x_offset = max(-128, min(127, x_offset))
+        y_offset = max(-128, min(127, y_offset))
+        
+        return x_offset, y_offset
+
+    def geometry(self):
+        """当前的画面尺寸 (宽, 高)：frame_size，其次最近一次检测的画面，都没有时为 640x480"""
+        if self.frame_size is not None:
+            return tuple(self.frame_size)
+        if self._last_shape is not None:
+            return self._last_shape[1], self._last_shape[0]
+        return 640, 480
+
+    # 计算目标距离（基于相似三角形原理）
+    def calculate_distance(self, ball_radius, ball_real_diameter=None, focal_length=None):
+        """
+        通过小球在图像中的大小估算实际距离
+        ball_radius: 小球在图像中的半径(像素)
+        ball_real_diameter: 小球真实直径(厘米)，默认用本检测器的设置
+        focal_length: 焦距(像素)，不给时把标定的焦距按当前画面宽度与标定宽度之比换算
+        """
+        if ball_radius <= 0:
+            return 100  # 默认距离
+        if ball_real_diameter is None:
+            ball_real_diameter = self.ball_real_diameter
+        if focal_length is None:
+            focal_length = self.focal_length * self.geometry()[0] / self.calib_width
+        
+        pixel_diameter = ball_radius * 2
+        
+        # 使用小孔成像公式：距离 = (实际直径 × 焦距) / 像素直径
+        distance = (ball_real_diameter * focal_length) / pixel_diameter
+        return int(distance)
+
+    # 距离平滑滤波函数
+    def smooth_distance(self, distance):
+        """
+        使用滑动窗口平均法平滑距离值
+        distance: 当前测量的距离值
+        返回:平滑后的距离值
+        """
+        distance_history = self.distance_history
+        
+        # 添加当前距离到历史记录
+        distance_history.append(distance)
+        
+        # 保持历史记录长度不超过窗口大小
+        if len(distance_history) > self.window_size:
+            distance_history.pop(0)
+        
+        return self.current_distance()
+
+    def current_distance(self):
+        """按当前历史记录平滑后的距离，不加入新的测量值（画面质量差的帧用）；还没有历史记录时返回 None"""
+        distance_history = self.distance_history
+        if not distance_history:
+            return None
+
+        # 如果历史记录数量足够，可以去除异常值
+        if len(distance_history) >= 3:
+            dists = sorted(distance_history)
+            # 去除最大最小值
+            dists_filtered = dists[1:-1]  # 去除最大最小
+            smoothed_distance = int(np.mean(dists_filtered))
+            return smoothed_distance
+        else:
+            # 如果数量不足就直接计算平均值
+            smoothed_distance = int(np.mean(distance_history))
+            return smoothed_distance
+
+    def reset_smoothing(self):
+        """清空距离历史（目标切换后不再和上一个目标的距离一起平均时调用）"""
+        self.distance_history.clear()
+
+
+# 模块级函数使用的默认检测器（640x480，各线程使用各自的缓冲池）
+_default = Detector(frame_size=(640, 480))
+
+
+def default_detector():
+    """模块级函数使用的检测器；新建检测器时可作为 base 复制它已加载的颜色配置"""
+    return _default
+
+
+def load_color(color_name):
+    return _default.load_color(color_name)
+
+
+def filters():
+    """见 Detector.filters"""
+    return _default.filters()
+
+
+def set_color_thresholds(color_name, config):
+    """用阈值文件格式的字典替换内存中的颜色配置（调参工具实时预览用，不写文件）"""
+    _default.set_color_thresholds(color_name, config)
+
+
+def set_mask_engine(color_name, engine):
+    """指定某种颜色的掩码计算方式；engine 为 None 时恢复使用HSV阈值"""
+    _default.set_mask_engine(color_name, engine)
+
+
+def preload_colors(color_names, kernel_sizes=(3, 5)):
+    """启动时预先加载所有颜色配置和形态学核，避免第一帧检测时读文件"""
+    _default.preload_colors(color_names, kernel_sizes)
+
+
+def create_color_mask(hsv, color_name, dst=None, scratch=None):
+    """见 Detector.create_color_mask"""
+    return _default.create_color_mask(hsv, color_name, dst, scratch)
+
+
+def ball_mask(frame, color_name, kernel_size=3, pool=None, base_shape=None, trace=None):
+    """见 Detector.ball_mask；pool 默认使用当前线程的缓冲池"""
+    return _default.ball_mask(frame, color_name, kernel_size, pool or get_buffer_pool(), base_shape, trace)
+
+
+def find_balls(frame, color_name, min_area=10, min_circularity=0.7, min_radius=5, kernel_size=3, pool=None,
+               trace=None):
+    """见 Detector.find_balls；pool 默认使用当前线程的缓冲池"""
+    return _default.find_balls(frame, color_name, min_area, min_circularity, min_radius, kernel_size,
+                               pool or get_buffer_pool(), trace)
+
+
+def find_safe_zones(frame, safe_zone_color=None, min_area=1000, kernel_size=5, pool=None, trace=None):
+    """见 Detector.find_safe_zones；pool 默认使用当前线程的缓冲池"""
+    return _default.find_safe_zones(frame, safe_zone_color, min_area, kernel_size, pool or get_buffer_pool(), trace)
+
+
+def zones_in_fences(hsv, fence_mask, safe_zone_color, min_area=1000, kernel_size=5, pool=None, trace=None):
+    """见 Detector.zones_in_fences；pool 默认使用当前线程的缓冲池"""
+    return _default.zones_in_fences(hsv, fence_mask, safe_zone_color, min_area, kernel_size,
+                                    pool or get_buffer_pool(), trace)
+
 
 # 计算相对图像中心的偏移量
 def calculate_offset(x, y, frame_width=640, frame_height=480):
-    center_x = frame_width // 2
-    center_y = frame_height // 2
-    x_offset = x - center_x
-    y_offset = y - center_y
-    
-    # 限制在-128到127范围内（1字节有符号）
-    x_offset = max(-128, min(127, x_offset))
-    y_offset = max(-128, min(127, y_offset))
-    
-    return x_offset, y_offset
+    return _default.calculate_offset(x, y, frame_width, frame_height)
 
-# 距离历史记录，用于平滑滤波
-distance_history = []
-window_size = 5  # 滑动窗口大小
 
 # 计算目标距离（基于相似三角形原理）
 def calculate_distance(ball_radius, ball_real_diameter=4.0, focal_length=727.8):
-    """
-    通过小球在图像中的大小估算实际距离
-    ball_radius: 小球在图像中的半径(像素)
-    ball_real_diameter: 小球真实直径(厘米)
-    focal_length: 标定的焦距(像素) - 727.8
-    """
-    if ball_radius <= 0:
-        return 100  # 默认距离
-    
-    pixel_diameter = ball_radius * 2
-    
-    # 使用小孔成像公式：距离 = (实际直径 × 焦距) / 像素直径
-    distance = (ball_real_diameter * focal_length) / pixel_diameter
-    return int(distance)
+    """见 Detector.calculate_distance；这里的焦距是 640x480 下标定的值"""
+    return _default.calculate_distance(ball_radius, ball_real_diameter, focal_length)
+
 
 # 距离平滑滤波函数
 def smooth_distance(distance):
-    """
-    使用滑动窗口平均法平滑距离值
-    distance: 当前测量的距离值
-    返回:平滑后的距离值
-    """
-    global distance_history
-    
-    # 添加当前距离到历史记录
-    distance_history.append(distance)
-    
-    # 保持历史记录长度不超过窗口大小
-    if len(distance_history) > window_size:
-        distance_history.pop(0)
-    
-    # 如果历史记录数量足够，可以去除异常值
-    if len(distance_history) >= 3:
-        dists = sorted(distance_history)
-        # 去除最大最小值
-        dists_filtered = dists[1:-1]  # 去除最大最小
-        smoothed_distance = int(np.mean(dists_filtered))
-        return smoothed_distance
-    else:
-        # 如果数量不足就直接计算平均值
-        smoothed_distance = int(np.mean(distance_history))
-        return smoothed_distance
\ No newline at end of file
+    """使用默认检测器的滑动窗口平滑距离值，见 Detector.smooth_distance"""
+    return _default.smooth_distance(distance)
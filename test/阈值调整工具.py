@@ -0,0 +1,255 @@
+"""
+统一的颜色阈值调整工具
+按 config.json 构建与 main.py 相同的检测器（启用 pipelines 时用声明式流程，否则直接调用 vision），
+显示各阶段的中间结果和耗时。
+只有阈值或画面变化时才重新检测和拼接显示画面；按空格冻结当前帧后可以反复调整同一帧。
+
+用法:
+    python test/阈值调整工具.py red                 # 摄像头0
+    python test/阈值调整工具.py purple --camera 9
+    python test/阈值调整工具.py blue --image 图片.jpg
+按键: s 保存  p 打印阈值  t 测速(不带中间结果重复检测100次)  空格 冻结/继续  q 退出
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+import main  # noqa: E402
+import pipeline  # noqa: E402
+import vision  # noqa: E402
+
+COLORS = ("red", "blue", "yellow", "black", "purple")
+
+# 滑动条名称 -> (阈值文件中的键路径, 最大值)
+SINGLE_RANGE = {
+    "H Min": (("H Min",), 179), "H Max": (("H Max",), 179),
+    "S Min": (("S Min",), 255), "S Max": (("S Max",), 255),
+    "V Min": (("V Min",), 255), "V Max": (("V Max",), 255),
+}
+DOUBLE_RANGE = {
+    "H1 Min": (("range1", "H Min"), 179), "H1 Max": (("range1", "H Max"), 179),
+    "H2 Min": (("range2", "H Min"), 179), "H2 Max": (("range2", "H Max"), 179),
+    "S Min": (("common", "S Min"), 255), "S Max": (("common", "S Max"), 255),
+    "V Min": (("common", "V Min"), 255), "V Max": (("common", "V Max"), 255),
+}
+
+PANEL_W, PANEL_H = 400, 300
+# 每种检测显示的三个中间阶段（左上角固定显示原图和检测结果）
+BALL_PANELS = ("mask", "open", "close")
+ZONE_PANELS = ("mask", "close", "open")
+BENCH_RUNS = 100
+
+
+class StageTrace:
+    """检测函数的 trace 回调：记录每个阶段的耗时和中间图像副本"""
+
+    def __init__(self):
+        self.stages = []
+        self._t = 0.0
+
+    def start(self):
+        self.stages = []
+        self._t = time.perf_counter()
+
+    def __call__(self, name, image):
+        elapsed = (time.perf_counter() - self._t) * 1000
+        self.stages.append((name, elapsed, image.copy()))
+        # 复制图像的时间不计入下一阶段
+        self._t = time.perf_counter()
+
+    def since_last(self):
+        """最后一个阶段之后到现在的耗时(ms)"""
+        return (time.perf_counter() - self._t) * 1000
+
+
+class Tuner:
+    def __init__(self, color, safe_zone_color=None):
+        self.color = color
+        self.safe_zone_color = safe_zone_color
+        self.window = f"threshold: {color}"
+        with open(vision.color_config_path(color), "r") as f:
+            self.config = json.load(f)
+        self.trackbars = DOUBLE_RANGE if "range1" in self.config else SINGLE_RANGE
+        self.dirty = True
+        self.trace = StageTrace()
+        self.results = []
+        self.total_ms = 0.0
+        self.canvas = np.zeros((PANEL_H * 2 + 30, PANEL_W * 2, 3), np.uint8)
+        # 与 main.py 一样按 pipelines 配置检测；检测器以 vision 模块为后端，滑动条改的阈值直接生效
+        pipeline_cfg = dict(main.load_config()["pipelines"])
+        self.pipeline = None
+        if pipeline_cfg.pop("enabled", False):
+            self.pipeline = pipeline.PipelineDetector(pipeline.compile_pipelines(pipeline_cfg))
+
+        cv2.namedWindow(self.window)
+        for name, (path, maximum) in self.trackbars.items():
+            cv2.createTrackbar(name, self.window, int(round(self._get(path))), maximum,
+                               lambda pos, path=path: self._on_change(path, pos))
+        vision.set_color_thresholds(color, self.config)
+
+    def _get(self, path):
+        node = self.config
+        for key in path:
+            node = node[key]
+        return node
+
+    def _on_change(self, path, pos):
+        node = self.config
+        for key in path[:-1]:
+            node = node[key]
+        # 没动过的滑动条保留文件中的原值（可能是小数）
+        if int(round(node[path[-1]])) != pos:
+            node[path[-1]] = pos
+            vision.set_color_thresholds(self.color, self.config)
+            self.dirty = True
+
+    def detect(self, frame, trace=None):
+        detector = vision
+        if self.pipeline is not None:
+            # 阈值可能刚被修改，不能复用上一次检测缓存的围栏掩码
+            self.pipeline.new_frame()
+            detector = self.pipeline
+        if self.color == "purple":
+            return detector.find_safe_zones(frame, self.safe_zone_color, trace=trace)
+        return detector.find_balls(frame, self.color, trace=trace)
+
+    def update(self, frame):
+        """重新检测并记录各阶段耗时"""
+        self.trace.start()
+        self.results = self.detect(frame, self.trace)
+        # 合计不含 trace 复制图像的时间
+        self.total_ms = sum(ms for _, ms, _ in self.trace.stages) + self.trace.since_last()
+
+    def benchmark(self, frame):
+        """不带 trace 重复检测，得到生产环境中的真实耗时"""
+        self.detect(frame)
+        start = time.perf_counter()
+        for _ in range(BENCH_RUNS):
+            self.detect(frame)
+        ms = (time.perf_counter() - start) * 1000 / BENCH_RUNS
+        print(f"{self.color}: 平均每帧 {ms:.2f} ms（{BENCH_RUNS} 次）")
+
+    def _panel(self, index, image, title):
+        """把图像缩放后写入画布的指定格子，不额外拼接图像"""
+        row, col = divmod(index, 2)
+        cell = self.canvas[row * PANEL_H:(row + 1) * PANEL_H, col * PANEL_W:(col + 1) * PANEL_W]
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        cv2.resize(image, (PANEL_W, PANEL_H), dst=cell, interpolation=cv2.INTER_AREA)
+        cv2.putText(cell, title, (8, 22), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+
+    def compose(self, frame):
+        view = frame.copy()
+        if self.color == "purple":
+            for cx, cy in self.results:
+                cv2.drawMarker(view, (cx, cy), (0, 255, 0), cv2.MARKER_CROSS, 20, 2)
+            stage = dict((name, image) for name, _, image in self.trace.stages).get("contours")
+            if stage is not None:
+                contours, _ = cv2.findContours(stage, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+                cv2.drawContours(view, contours, -1, (255, 0, 255), 2)
+        else:
+            for x, y, r in self.results:
+                cv2.circle(view, (x, y), r, (0, 255, 0), 2)
+                cv2.putText(view, f"r={r} d={vision.calculate_distance(r):.0f}cm", (x + r + 4, y),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+        self._panel(0, view, f"result: {len(self.results)}")
+
+        stages = {name: (ms, image) for name, ms, image in self.trace.stages}
+        for i, name in enumerate(ZONE_PANELS if self.color == "purple" else BALL_PANELS, start=1):
+            if name in stages:
+                ms, image = stages[name]
+                self._panel(i, image, f"{name} {ms:.2f}ms")
+
+        bar = self.canvas[PANEL_H * 2:]
+        bar[:] = 0
+        text = " ".join(f"{name}:{ms:.2f}" for name, ms, _ in self.trace.stages)
+        cv2.putText(bar, f"{text} total:{self.total_ms:.2f}ms", (8, 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        cv2.imshow(self.window, self.canvas)
+
+    def save(self):
+        path = vision.color_config_path(self.color)
+        with open(path, "w") as f:
+            json.dump(self.config, f, indent=2)
+        print(f"阈值配置已保存到: {path}")
+
+    def print_thresholds(self):
+        print(f"当前{self.color}阈值: {json.dumps(self.config, ensure_ascii=False)}")
+        for name, ms, _ in self.trace.stages:
+            print(f"  {name}: {ms:.2f} ms")
+        print(f"  合计: {self.total_ms:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="颜色阈值调整工具（使用主程序的实际检测流程）")
+    parser.add_argument("color", choices=COLORS)
+    parser.add_argument("--camera", type=int, default=0, help="摄像头索引")
+    parser.add_argument("--image", help="使用图片代替摄像头")
+    parser.add_argument("--no-flip", action="store_true", help="不做上下翻转（默认与主摄像头一致翻转）")
+    parser.add_argument("--zone", choices=("red", "blue"), default="red",
+                        help="调紫色围栏时检测的安全区颜色")
+    args = parser.parse_args()
+
+    cap = None
+    frame = None
+    if args.image:
+        frame = cv2.imread(args.image)
+        if frame is None:
+            print(f"无法读取图片: {args.image}")
+            sys.exit(1)
+    else:
+        cap = cv2.VideoCapture(args.camera)
+        if not cap.isOpened():
+            print("无法打开摄像头")
+            sys.exit(1)
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+
+    tuner = Tuner(args.color, args.zone)
+    print("使用说明: s 保存  p 打印阈值  t 测速  空格 冻结/继续  q 退出")
+
+    frozen = cap is None
+    buf = None
+    flipped = None
+    while True:
+        if not frozen:
+            ret, buf = cap.read(buf)
+            if ret:
+                frame = buf if args.no_flip else cv2.flip(buf, 0, dst=flipped)
+                flipped = None if args.no_flip else frame
+                tuner.dirty = True
+        if tuner.dirty and frame is not None:
+            tuner.dirty = False
+            tuner.update(frame)
+            tuner.compose(frame)
+
+        key = cv2.waitKey(1 if not frozen else 30) & 0xFF
+        if key == ord('q'):
+            break
+        elif key == ord('s'):
+            tuner.save()
+        elif key == ord('p'):
+            tuner.print_thresholds()
+        elif key == ord('t') and frame is not None:
+            tuner.benchmark(frame)
+        elif key == ord(' ') and cap is not None:
+            frozen = not frozen
+            if frozen and frame is not None:
+                # 冻结时保留一份副本，采集缓冲区会被下一次读取覆盖
+                frame = frame.copy()
+            print("已冻结当前帧" if frozen else "继续采集")
+
+    if cap is not None:
+        cap.release()
+    cv2.destroyAllWindows()
+
+
+if __name__ == "__main__":
+    main()
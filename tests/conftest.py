@@ -0,0 +1,5 @@
+import os
+import sys
+
+# src/ 下的模块直接按文件名导入（与运行 src/main.py 时相同）
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -0,0 +1,80 @@
+import urllib.error
+import urllib.request
+
+import cv2
+import numpy as np
+import pytest
+
+import debug_stream
+import pipeline
+import scheduler
+import synth
+import vision
+from test_scheduler import FixedLevel
+
+
+@pytest.fixture
+def stream():
+    s = debug_stream.DebugStream(["front", "a&b"], port=0)
+    s.start()
+    yield s
+    s.stop()
+
+
+def _get(stream, path):
+    host, port = stream._server.server_address[:2]
+    with urllib.request.urlopen(f"http://{host}:{port}{path}", timeout=5) as response:
+        return response.read().decode("utf-8")
+
+
+def test_defaults_to_localhost():
+    assert debug_stream.DebugStream(["front"]).host == "127.0.0.1"
+
+
+def test_index_escapes_camera_names(stream):
+    body = _get(stream, "/?cam=a%26b")
+    assert 'src="/stream?cam=a%26b"' in body
+    assert ">a&amp;b</a>" in body
+
+
+def test_unknown_camera_is_rejected(stream):
+    with pytest.raises(urllib.error.HTTPError) as e:
+        _get(stream, '/?cam="><script>alert(1)</script>')
+    assert e.value.code == 404
+
+
+def _scene():
+    frame = np.full((480, 640, 3), synth.FLOOR_BGR, np.uint8)
+    synth._draw_ball(frame, "red", 200, 200, 25)
+    cv2.rectangle(frame, (350, 150), (550, 350), synth.FENCE_BGR, 8)
+    return frame
+
+
+@pytest.mark.parametrize("scale", [1.0, 0.5])
+def test_overlay_shows_detector_masks_and_fence(scale):
+    stream = debug_stream.DebugStream(["front"], scale=0.5)
+    stream._clients = 1
+    detector = scheduler.QualityDetector(
+        pipeline.PipelineDetector(pipeline.compile_pipelines({}), backend=vision.Detector()), FixedLevel(scale))
+    frame = _scene()
+    detector.new_frame()
+    stream.publish("front", frame, [], detector)
+    small, targets, overlay = stream._pending["front"]
+    plain = small.copy()
+    image = stream._draw(small, targets, overlay)
+
+    balls, fences = overlay
+    assert [color for color, _ in balls] == stream.mask_colors
+    assert dict(balls)["red"][100, 100] and not dict(balls)["blue"][100, 100]
+    # 小球处叠加了红色掩码，围栏处画了轮廓，地面不变
+    assert image[100, 100, 2] > plain[100, 100, 2] and image[100, 100, 0] < plain[100, 100, 0]
+    assert len(fences) >= 1
+    assert (np.abs(image.astype(int) - debug_stream.FENCE_COLOR).sum(axis=2) == 0).any()
+    assert (image[20, 20] == plain[20, 20]).all()
+
+
+def test_skipped_frame_draws_targets_only():
+    stream = debug_stream.DebugStream(["front"])
+    stream._clients = 1
+    stream.publish("front", _scene(), [])
+    assert stream._pending["front"][2] is None
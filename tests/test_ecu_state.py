@@ -0,0 +1,92 @@
+import ecu_state
+import main
+import tracker
+
+
+def _machine(timeout=5.0):
+    return ecu_state.EcuStateMachine(timeout, verbose=False, now=0.0)
+
+
+def test_command_latches_until_timeout():
+    ecu = _machine()
+    ecu.update("1", now=1.0)
+    assert ecu.changed and ecu.state.mode == "ball" and ecu.cmd == "1"
+    # 之后几帧没有指令，保持锁存的模式
+    for t in (2.0, 4.0, 6.0):
+        ecu.update(None, now=t)
+        assert not ecu.changed and ecu.cmd == "1"
+    ecu.update(None, now=6.5)
+    assert ecu.changed and ecu.state.mode == "wait" and ecu.cmd is None
+    assert ecu.timeouts == 1
+    assert ecu.transitions[-1].reason == "timeout"
+
+
+def test_repeated_command_rearms_timeout():
+    ecu = _machine()
+    ecu.update("2", now=0.0)
+    ecu.update("2", now=4.0)
+    assert not ecu.changed
+    ecu.update(None, now=8.0)
+    assert ecu.state.mode == "ball" and ecu.timeouts == 0
+    ecu.update(None, now=9.5)
+    assert ecu.state.mode == "wait"
+
+
+def test_zone_command_completes_first_grab():
+    ecu = _machine()
+    assert ecu.first_grab
+    ecu.update("3", now=1.0)
+    assert not ecu.first_grab and ecu.state == ("zone", "red", 1.0)
+    assert [t.reason for t in ecu.transitions] == ["first_grab", "cmd:3"]
+    # 第一次抓取完成后超时回到多目标识别
+    ecu.update(None, now=7.0)
+    assert ecu.state.mode == "multi"
+
+
+def test_zero_timeout_holds_forever():
+    ecu = _machine(timeout=0)
+    ecu.update("4", now=0.0)
+    ecu.update(None, now=1000.0)
+    assert ecu.cmd == "4"
+
+
+def test_unknown_command_is_ignored():
+    ecu = _machine()
+    ecu.update("9", now=1.0)
+    assert not ecu.changed and ecu.state.mode == "wait" and ecu.ignored == 1
+
+
+def _committed_tracker():
+    ball_tracker = tracker.BallTracker(min_hits=2)
+    for x in (100, 104):
+        ball_tracker.update([("red", x, 200, 20)], ["red"])
+    assert ball_tracker.committed is not None
+    return ball_tracker
+
+
+def test_entering_zone_marks_target_grabbed():
+    ecu = _machine()
+    trackers = {"front": _committed_tracker()}
+    ecu.update("1", now=0.0)
+    main.release_grabbed(ecu, trackers)
+    assert trackers["front"].committed is not None
+
+    ecu.update("3", now=1.0)
+    main.release_grabbed(ecu, trackers)
+    assert trackers["front"].committed is None and trackers["front"].grabbed == 1
+    # 抓过的小球还在画面里也不会再被选中
+    trackers["front"].update([("red", 108, 200, 20)], ["red"])
+    assert trackers["front"].committed is None
+
+
+def test_staying_in_zone_does_not_mark_again():
+    ecu = _machine()
+    trackers = {"front": _committed_tracker()}
+    ecu.update("3", now=0.0)
+    main.release_grabbed(ecu, trackers)
+    trackers["front"].update([("blue", 300, 200, 20)], ["blue"])
+    trackers["front"].update([("blue", 302, 200, 20)], ["blue"])
+    ecu.update("3", now=1.0)
+    main.release_grabbed(ecu, trackers)
+    assert trackers["front"].grabbed == 1
+    assert trackers["front"].committed is not None
@@ -0,0 +1,56 @@
+import cv2
+import numpy as np
+import pytest
+
+import motion
+import pipeline
+import synth
+import vision
+
+COLORS = ["red", "blue", "yellow"]
+
+
+def _moving_sequence(count=40):
+    """固定纹理的地面上三个小球每帧移动 4~5 像素"""
+    rng = np.random.default_rng(1)
+    floor = np.empty((480, 640, 3), np.uint8)
+    floor[:] = synth.FLOOR_BGR
+    floor = cv2.add(floor, rng.integers(0, 6, floor.shape, dtype=np.uint8))
+    for i in range(count):
+        frame = floor.copy()
+        synth._draw_ball(frame, "red", 100 + int(4.5 * i), 150 + 2 * i, 18)
+        synth._draw_ball(frame, "blue", 500 - 4 * i, 300, 14)
+        synth._draw_ball(frame, "yellow", 320, 240 - int(4.5 * i), 20)
+        yield frame
+
+
+def _vision():
+    return vision.Detector()
+
+
+def _pipeline():
+    return pipeline.PipelineDetector(pipeline.compile_pipelines({}), backend=vision.Detector())
+
+
+@pytest.mark.parametrize("make_backend", [_vision, _pipeline])
+def test_incremental_matches_full_segmentation(make_backend):
+    incremental = motion.IncrementalSegmenter(motion.MotionGate(), backend=make_backend())
+    full = make_backend()
+    for i, frame in enumerate(_moving_sequence()):
+        incremental.new_frame()
+        if hasattr(full, "new_frame"):
+            full.new_frame()
+        for color in COLORS:
+            assert incremental.find_balls(frame, color) == full.find_balls(frame, color), (i, color)
+    # 只有小球附近的图块重新分割
+    assert incremental.stats()["segmented_ratio"] < 0.5
+
+
+def test_static_frames_reuse_results():
+    frame = next(_moving_sequence(1))
+    incremental = motion.IncrementalSegmenter(motion.MotionGate(), backend=vision.Detector())
+    for _ in range(3):
+        incremental.new_frame()
+        balls = incremental.find_balls(frame, "red")
+    assert balls == vision.Detector().find_balls(frame, "red")
+    assert incremental.stats()["reused"] == 2
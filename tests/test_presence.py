@@ -0,0 +1,34 @@
+import numpy as np
+
+import presence
+import scheduler
+import vision
+from test_scheduler import FixedLevel
+
+
+def _fill(hsv, dst=None, scratch=None):
+    """把整幅画面都当作目标颜色的掩码方式"""
+    if dst is None:
+        dst = np.empty(hsv.shape[:2], np.uint8)
+    dst[:] = 255
+    return dst
+
+
+def test_present_uses_wrapped_detector_colors():
+    frame = np.zeros((120, 160, 3), np.uint8)
+    camera = vision.Detector()
+    camera.set_mask_engine("red", _fill)
+    assert presence.PresenceFilter(camera).present(frame, "red")
+    # 默认检测器的红色阈值在黑色画面上找不到像素
+    assert not presence.PresenceFilter(vision.Detector()).present(frame, "red")
+
+
+def test_downgraded_frame_keeps_sampling_stride():
+    frame = np.zeros((480, 640, 3), np.uint8)
+    for scale in (1.0, 0.5):
+        presence_filter = presence.PresenceFilter(vision.Detector(), step=4)
+        detector = scheduler.QualityDetector(presence_filter, FixedLevel(scale))
+        detector.new_frame()
+        detector.find_balls(frame, "red")
+        # 缩小后的画面上每 2 个像素抽一个，对应原始画面仍是每 4 个像素
+        assert presence_filter._hsv.shape[:2] == (120, 160)
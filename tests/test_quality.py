@@ -0,0 +1,43 @@
+import cv2
+import numpy as np
+
+import quality
+import scheduler
+from test_scheduler import RecordingDetector
+
+
+def _frames():
+    rng = np.random.default_rng(0)
+    sharp = rng.integers(0, 200, (480, 640, 3), dtype=np.uint8)
+    blurred = cv2.GaussianBlur(sharp, (31, 31), 10)
+    return sharp, blurred
+
+
+def test_skipped_frames_stay_out_of_history():
+    sharp, blurred = _frames()
+    gate = quality.QualityGate(min_history=3, max_skips=100)
+    for _ in range(3):
+        assert gate.check(sharp) == quality.RUN
+    reference = list(gate.history)
+    for _ in range(20):
+        assert gate.check(blurred) == quality.SKIP
+    # 连续的模糊帧没有拉低参考中位数
+    assert list(gate.history) == reference
+    assert gate.check(sharp) == quality.RUN
+
+
+def test_degraded_frame_uses_lowest_level():
+    loop_scheduler = scheduler.LoopScheduler(levels=scheduler.DEFAULT_LEVELS)
+    inner = RecordingDetector({"min_area": 10, "min_circularity": 0.7, "min_radius": 5, "zone_min_area": 1000})
+    detector = scheduler.QualityDetector(inner, loop_scheduler)
+    frame = np.zeros((480, 640, 3), np.uint8)
+
+    detector.new_frame()
+    detector.find_balls(frame, "red")
+    assert inner.calls[-1] == ("ball", {})
+
+    detector.new_frame(degraded=True)
+    assert detector.quality == scheduler.DEFAULT_LEVELS[-1]
+    detector.find_balls(frame, "red")
+    assert inner.calls[-1] == ("ball", {"min_area": 2.5, "min_radius": 2.5})
+    assert len(detector.ball_colors(["red", "blue", "yellow", "black"])) < 4
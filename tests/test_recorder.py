@@ -0,0 +1,45 @@
+import threading
+import time
+
+import numpy as np
+
+import recorder
+
+
+def _wait_frames(black_box, count, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while black_box.frames < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_interval_is_per_camera(tmp_path):
+    black_box = recorder.BlackBoxRecorder(str(tmp_path), seconds=1, fps=1, cameras=2)
+    black_box.start(install_signal=False)
+    try:
+        frame = np.zeros((48, 64, 3), np.uint8)
+        black_box.record(frame, {"camera": "front", "balls": [], "safe_zones": []})
+        black_box.record(frame, {"camera": "rear", "balls": [], "safe_zones": []})
+        # 同一摄像头在间隔内的第二帧跳过
+        black_box.record(frame, {"camera": "front", "balls": [], "safe_zones": []})
+        _wait_frames(black_box, 2)
+    finally:
+        black_box.stop()
+    assert sorted(entry["camera"] for _, entry in black_box.snapshot()) == ["front", "rear"]
+    assert black_box.skipped == 0
+
+
+def test_start_off_main_thread(tmp_path):
+    black_box = recorder.BlackBoxRecorder(str(tmp_path))
+    errors = []
+
+    def run():
+        try:
+            black_box.start()
+        except ValueError as e:
+            errors.append(e)
+
+    t = threading.Thread(target=run)
+    t.start()
+    t.join()
+    black_box.stop()
+    assert errors == []
@@ -0,0 +1,71 @@
+import cv2
+import numpy as np
+
+import pipeline
+import scheduler
+import vision
+
+
+class FixedLevel:
+    """只提供 quality 的调度器替身"""
+
+    def __init__(self, scale, colors_per_frame=4):
+        self.quality = {"scale": scale, "colors_per_frame": colors_per_frame, "zone_refresh": 1}
+
+
+class RecordingDetector:
+    def __init__(self, filters):
+        self._filters = filters
+        self.calls = []
+
+    def filters(self):
+        return dict(self._filters)
+
+    def find_balls(self, frame, color_name, **kwargs):
+        self.calls.append(("ball", kwargs))
+        return []
+
+    def find_safe_zones(self, frame, safe_zone_color=None, **kwargs):
+        self.calls.append(("zone", kwargs))
+        return []
+
+
+def test_downgraded_level_scales_configured_filters():
+    inner = RecordingDetector({"min_area": 40, "min_circularity": 0.8, "min_radius": 8, "zone_min_area": 2000})
+    detector = scheduler.QualityDetector(inner, FixedLevel(0.5))
+    frame = np.zeros((480, 640, 3), np.uint8)
+    detector.find_balls(frame, "red")
+    detector.find_safe_zones(frame, "red")
+    assert inner.calls[0] == ("ball", {"min_area": 10.0, "min_radius": 4.0})
+    assert inner.calls[1] == ("zone", {"min_area": 500})
+
+
+def _pipeline_detector(min_radius):
+    config = {"ball": [dict(stage) for stage in pipeline.DEFAULT_PIPELINES["ball"]]}
+    config["ball"][-1]["min_radius"] = min_radius
+    return pipeline.PipelineDetector(pipeline.compile_pipelines(config), backend=vision.Detector())
+
+
+def test_downgraded_frame_honours_pipeline_min_radius():
+    frame = np.full((480, 640, 3), 200, np.uint8)
+    cv2.circle(frame, (150, 240), 10, (0, 0, 255), -1)
+    cv2.circle(frame, (450, 240), 30, (0, 0, 255), -1)
+
+    full = scheduler.QualityDetector(_pipeline_detector(15), FixedLevel(1.0))
+    half = scheduler.QualityDetector(_pipeline_detector(15), FixedLevel(0.5))
+    full.new_frame()
+    half.new_frame()
+    full_balls = full.find_balls(frame, "red")
+    half_balls = half.find_balls(frame, "red")
+
+    # 半径 10 的小球低于配置的 min_radius=15，降级后（半径 5，下限 7.5）同样被过滤
+    assert len(full_balls) == 1 and abs(full_balls[0][0] - 450) <= 2
+    assert len(half_balls) == 1 and abs(half_balls[0][0] - 450) <= 2
+
+
+def test_ball_colors_keeps_committed_color():
+    colors = ["red", "blue", "yellow", "black"]
+    detector = scheduler.QualityDetector(RecordingDetector({}), FixedLevel(1.0, colors_per_frame=1))
+    for _ in range(len(colors)):
+        detector.new_frame()
+        assert "black" in detector.ball_colors(colors, "black")
@@ -0,0 +1,14 @@
+import cv2
+import numpy as np
+
+import sweep
+
+
+def test_scaled_configs_keep_original_filters():
+    # 半径 7 的小球：原始分辨率下满足 min_radius=5，缩小一半后半径约 3.5
+    frame = np.full((240, 320, 3), 200, np.uint8)
+    cv2.circle(frame, (160, 120), 7, (0, 0, 255), -1)
+    labels = {"balls": [{"color": "red", "x": 160, "y": 120, "r": 7}], "safe_zones": []}
+    for scale in (1.0, 0.5):
+        result = sweep.evaluate([(frame, labels)], dict(sweep.VISION_PARAMS, scale=scale))
+        assert result["recall"] == 1.0, scale
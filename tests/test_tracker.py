@@ -0,0 +1,36 @@
+import tracker
+
+COLORS = ["red", "blue", "yellow"]
+
+
+def _commit_blue(ball_tracker):
+    for x in (100, 105):
+        ball_tracker.update([("blue", x, 200, 20)], ["blue"], COLORS)
+    assert ball_tracker.committed is not None and ball_tracker.committed.color == "blue"
+    return ball_tracker.committed
+
+
+def test_commitment_survives_rotation_without_its_color():
+    ball_tracker = tracker.BallTracker(min_hits=2, max_misses=2)
+    committed = _commit_blue(ball_tracker)
+    # 调度器这一帧只轮转到红色：不放弃选定的蓝球，也不把它当作本帧的目标
+    assert ball_tracker.update([("red", 400, 200, 30)], ["red"], COLORS) is None
+    assert ball_tracker.committed is committed
+    assert committed.misses == 0
+    assert ball_tracker.update([("blue", 110, 200, 20)], ["blue"], COLORS) is committed
+
+
+def test_commitment_ages_out_through_misses():
+    ball_tracker = tracker.BallTracker(min_hits=2, max_misses=2)
+    _commit_blue(ball_tracker)
+    for _ in range(3):
+        ball_tracker.update([], ["blue"], COLORS)
+    assert ball_tracker.committed is None
+    assert ball_tracker.lost == 1
+
+
+def test_command_switch_drops_commitment():
+    ball_tracker = tracker.BallTracker(min_hits=2, max_misses=2)
+    _commit_blue(ball_tracker)
+    ball_tracker.update([], ["red"])
+    assert ball_tracker.committed is None
@@ -0,0 +1,92 @@
+import collections
+import time
+
+import serial
+
+import UART
+
+
+class StallingPort:
+    """第一次写只写出半包就超时的串口替身"""
+
+    def __init__(self):
+        self.written = bytearray()
+        self.resets = 0
+        self._stall = True
+
+    def write(self, data):
+        if self._stall:
+            self._stall = False
+            self.written += data[:len(data) // 2]
+            raise serial.SerialTimeoutException("Write timeout")
+        self.written += data
+        return len(data)
+
+    def reset_output_buffer(self):
+        self.resets += 1
+
+
+def test_timeout_resyncs_before_next_packet():
+    port = StallingPort()
+    worker = UART.TxWorker(port)
+    worker.start()
+    worker.submit(b"dx:10 dy:-5 dis:40\n")
+    worker.stop()
+    worker.start()
+    worker.submit(b"dx:11 dy:-4 dis:41\n")
+    worker.stop()
+
+    assert worker.stats() == {"sent": 1, "dropped": 0, "blocked": 1}
+    assert port.resets == 1
+    lines = bytes(port.written).split(b"\n")
+    # 半包自成一行，下一包完整地从新的一行开始
+    assert lines[0] == b"dx:10 dy:"
+    assert lines[1] == b"dx:11 dy:-4 dis:41"
+
+
+class AckPort:
+    """先回一条应答再回一个指令字节的串口替身"""
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.timeout = None
+
+    @property
+    def in_waiting(self):
+        return len(self.chunks[0]) if self.chunks else 0
+
+    def read(self, size=1):
+        if not self.chunks:
+            time.sleep(self.timeout or 0)
+            return b""
+        return self.chunks.pop(0)
+
+
+class RecordingTracker:
+    def __init__(self):
+        self.acks = []
+
+    def record_ack(self, seq, t_ack=None):
+        self.acks.append((seq, t_ack))
+
+
+def test_acks_are_timestamped_on_arrival(monkeypatch):
+    tracker = RecordingTracker()
+    port = AckPort([b"ack:12\n", b"3"])
+    monkeypatch.setattr(UART, "latency_tracker", tracker)
+    monkeypatch.setattr(UART, "_rx_buffer", bytearray())
+    monkeypatch.setattr(UART, "_commands", collections.deque())
+    worker = UART.RxWorker(port, timeout=0.01)
+    before = time.monotonic()
+    worker.start()
+    time.sleep(0.1)
+    worker.stop()
+
+    assert [seq for seq, _ in tracker.acks] == [12]
+    # 到达时就记录了时间，而不是主循环之后读取指令时
+    assert before <= tracker.acks[0][1] < time.monotonic() - 0.05
+    monkeypatch.setattr(UART, "ser", port)
+    port.is_open = True
+    monkeypatch.setattr(UART, "rx_worker", worker)
+    assert UART.read_ecu_command() == "3"
+    assert UART.read_ecu_command() is None